@@ -1,7 +1,10 @@
+using System.Collections.Concurrent;
 using System.CommandLine;
 using System.CommandLine.Invocation;
 using System.CommandLine.Binding;
+using System.Text.Encodings.Web;
 using System.Text.Json;
+using System.Text.Json.Serialization;
 using Microsoft.CodeAnalysis;
 using Microsoft.CodeAnalysis.CSharp;
 using Microsoft.CodeAnalysis.CSharp.Syntax;
@@ -16,18 +19,26 @@ public enum RelationshipKind { InheritsFrom, Implements, Calls }
 
 /// <summary>
 /// Represents a relationship between two code symbols.
+/// LineNumber is the 1-based line of the call site for Calls relationships.
 /// </summary>
-public record SymbolRelationship(string TargetSymbolFullName, RelationshipKind Kind);
+public record SymbolRelationship(
+    string TargetSymbolFullName,
+    RelationshipKind Kind,
+    [property: JsonIgnore(Condition = JsonIgnoreCondition.WhenWritingNull)] int? LineNumber = null
+);
 
 /// <summary>
 /// Represents a single symbol (class, method, etc.) found in the codebase.
+/// LineNumber is the identifier's line; StartLine/EndLine span the whole declaration (1-based, inclusive).
 /// </summary>
 public record CodeSymbol(
     string FullName,
     SymbolKind Kind,
     string FilePath,
     int LineNumber,
-    List<SymbolRelationship> Relationships
+    List<SymbolRelationship> Relationships,
+    int StartLine = 0,
+    int EndLine = 0
 );
 
 /// <summary>
@@ -35,6 +46,12 @@ public record CodeSymbol(
 /// </summary>
 public record CodeGraph(List<CodeSymbol> Symbols);
 
+/// <summary>
+/// Per-document analysis state captured in the symbol pass and reused by the relationship pass,
+/// so syntax trees and semantic models are only materialised once.
+/// </summary>
+record DocumentContext(SyntaxNode Root, SemanticModel SemanticModel);
+
 
 // ------------------------------------------------------------------
 // SET UP THE APPLICATION'S COMMAND-LINE INTERFACE
@@ -54,6 +71,17 @@ class Program
             name: "--output-file",
             description: "The path to save the output graph JSON file.",
             getDefaultValue: () => new FileInfo("codegraph.json"));
+
+        var maxParallelismOption = new Option<int>(
+            name: "--max-parallelism",
+            description: "Maximum number of documents analysed concurrently. Defaults to the number of cores.",
+            getDefaultValue: () => Environment.ProcessorCount);
+
+        var formatOption = new Option<string>(
+            name: "--format",
+            description: "Output format: 'json' (single indented document) or 'ndjson' (compact, one symbol per line).",
+            getDefaultValue: () => "json")
+            .FromAmong("json", "ndjson");
         
         // Options for the query command
         var graphFileOption = new Option<FileInfo>(
@@ -66,31 +94,52 @@ class Program
             description: "A list of seed file paths to start the graph traversal from.")
             { IsRequired = true, Arity = ArgumentArity.OneOrMore };
 
+        var directionOption = new Option<string>(
+            name: "--direction",
+            description: "Which edges to follow: 'dependents' (anything referencing the seeds), 'callers', 'callees' or 'implementors'.",
+            getDefaultValue: () => "dependents")
+            .FromAmong("dependents", "callers", "callees", "implementors");
+
+        var maxDepthOption = new Option<int>(
+            name: "--max-depth",
+            description: "Number of hops to traverse from the seed symbols.",
+            getDefaultValue: () => 1);
+
+        var maxResultsOption = new Option<int>(
+            name: "--max-results",
+            description: "Stop after this many related files have been found (0 = no limit).",
+            getDefaultValue: () => 0);
+
         // Define the 'index' and 'query' commands
         var indexCommand = new Command("index", "Builds a unified code graph from a list of projects in a file.")
         {
             projectsFileOption,
-            outputFileOption
+            outputFileOption,
+            maxParallelismOption,
+            formatOption
         };
         var queryCommand = new Command("query", "Queries the code graph to find related files.")
         {
             graphFileOption,
-            seedFilesOption
+            seedFilesOption,
+            directionOption,
+            maxDepthOption,
+            maxResultsOption
         };
 
         var rootCommand = new RootCommand("C# Code Graph Builder");
         rootCommand.AddCommand(indexCommand);
         rootCommand.AddCommand(queryCommand);
 
-        indexCommand.SetHandler(async (projectsFile, outputFile) =>
+        indexCommand.SetHandler(async (projectsFile, outputFile, maxParallelism, format) =>
         {
-            await BuildGraph(projectsFile.FullName, outputFile.FullName);
-        }, projectsFileOption, outputFileOption);
+            await BuildGraph(projectsFile.FullName, outputFile.FullName, maxParallelism, format);
+        }, projectsFileOption, outputFileOption, maxParallelismOption, formatOption);
         
-        queryCommand.SetHandler(async (graphFile, seedFiles) =>
+        queryCommand.SetHandler(async (graphFile, seedFiles, direction, maxDepth, maxResults) =>
         {
-            await QueryGraph(graphFile.FullName, seedFiles);
-        }, graphFileOption, seedFilesOption);
+            await QueryGraph(graphFile.FullName, seedFiles, direction, maxDepth, maxResults);
+        }, graphFileOption, seedFilesOption, directionOption, maxDepthOption, maxResultsOption);
 
         return await rootCommand.InvokeAsync(args);
     }
@@ -100,13 +149,15 @@ class Program
     //  DEFINE THE CORE LOGIC
     // ------------------------------------------------------------------
 
-   private static async Task BuildGraph(string projectsFilePath, string outputPath)
+   private static async Task BuildGraph(string projectsFilePath, string outputPath, int maxParallelism, string format)
     {
         var projectPaths = await File.ReadAllLinesAsync(projectsFilePath);
         Console.Error.WriteLine($"Starting to build code graph for {projectPaths.Length} projects...");
 
-        var codeSymbols = new Dictionary<string, CodeSymbol>();
-        var symbolCompilations = new Dictionary<Project, Compilation>();
+        // Symbols are discovered from many documents at once, so the lookup must be thread-safe.
+        var codeSymbols = new ConcurrentDictionary<string, CodeSymbol>();
+        var symbolCompilations = new ConcurrentDictionary<ProjectId, Compilation>();
+        var parallelOptions = new ParallelOptions { MaxDegreeOfParallelism = Math.Max(1, maxParallelism) };
 
         try
         {
@@ -149,36 +200,39 @@ class Program
                 }
             }
 
-            foreach (var project in solution.Projects)
+            // Compilations are immutable snapshots, so projects can be compiled side by side.
+            await Parallel.ForEachAsync(solution.Projects, parallelOptions, async (project, cancellationToken) =>
             {
                 Console.Error.WriteLine($"Processing project symbols: {project.Name}");
-                var compilation = await project.GetCompilationAsync();
-                if (compilation == null) continue;
-                symbolCompilations[project] = compilation;
-                
-                foreach (var document in project.Documents)
-                {
-                    var syntaxTree = await document.GetSyntaxTreeAsync();
-                    if (syntaxTree == null) continue;
-                    var semanticModel = compilation.GetSemanticModel(syntaxTree);
-                    var root = await syntaxTree.GetRootAsync();
-                    ProcessClassesAndInterfaces(root, semanticModel, document.FilePath, codeSymbols);
-                }
-            }
+                var compilation = await project.GetCompilationAsync(cancellationToken);
+                if (compilation == null) return;
+                symbolCompilations[project.Id] = compilation;
+            });
+
+            var documents = solution.Projects
+                .Where(p => symbolCompilations.ContainsKey(p.Id))
+                .SelectMany(p => p.Documents)
+                .ToList();
+            Console.Error.WriteLine($"Discovering symbols in {documents.Count} documents (max parallelism {parallelOptions.MaxDegreeOfParallelism})...");
+
+            // Pass 1: discover symbols and keep each document's root + semantic model for pass 2.
+            var documentContexts = new ConcurrentBag<DocumentContext>();
+            await Parallel.ForEachAsync(documents, parallelOptions, async (document, cancellationToken) =>
+            {
+                var syntaxTree = await document.GetSyntaxTreeAsync(cancellationToken);
+                if (syntaxTree == null) return;
+                var semanticModel = symbolCompilations[document.Project.Id].GetSemanticModel(syntaxTree);
+                var root = await syntaxTree.GetRootAsync(cancellationToken);
+                ProcessClassesAndInterfaces(root, semanticModel, document.FilePath, codeSymbols);
+                documentContexts.Add(new DocumentContext(root, semanticModel));
+            });
             
+            // Pass 2: relationships need the complete symbol table, so this only starts once pass 1 is done.
             Console.Error.WriteLine("Processing relationships...");
-            foreach (var project in solution.Projects)
+            Parallel.ForEach(documentContexts, parallelOptions, context =>
             {
-                if (!symbolCompilations.TryGetValue(project, out var compilation)) continue;
-                foreach (var document in project.Documents)
-                {
-                    var syntaxTree = await document.GetSyntaxTreeAsync();
-                    if (syntaxTree == null) continue;
-                    var semanticModel = compilation.GetSemanticModel(syntaxTree);
-                    var root = await syntaxTree.GetRootAsync();
-                    ProcessRelationships(root, semanticModel, codeSymbols);
-                }
-            }
+                ProcessRelationships(context.Root, context.SemanticModel, codeSymbols);
+            });
         }
         catch (Exception ex)
         {
@@ -186,9 +240,29 @@ class Program
             return;
         }
         
-        var codeGraph = new CodeGraph(codeSymbols.Values.ToList());
-        var jsonOutput = JsonSerializer.Serialize(codeGraph, new JsonSerializerOptions { WriteIndented = true });
-        await File.WriteAllTextAsync(outputPath, jsonOutput);
+        // Sort so the output is stable regardless of the order documents finished in. Relationships
+        // of partial types are added from several documents concurrently, so they are sorted too.
+        var orderedSymbols = codeSymbols.Values
+            .OrderBy(s => s.FullName, StringComparer.Ordinal)
+            .Select(s => s with
+            {
+                Relationships = s.Relationships
+                    .OrderBy(r => r.LineNumber ?? 0)
+                    .ThenBy(r => r.Kind)
+                    .ThenBy(r => r.TargetSymbolFullName, StringComparer.Ordinal)
+                    .ToList()
+            })
+            .ToList();
+        if (format == "ndjson")
+        {
+            await WriteNdjsonGraph(orderedSymbols, outputPath);
+        }
+        else
+        {
+            await using var outputStream = File.Create(outputPath);
+            await JsonSerializer.SerializeAsync(outputStream, new CodeGraph(orderedSymbols),
+                new JsonSerializerOptions { WriteIndented = true });
+        }
         
         Console.Error.WriteLine($"Code graph with {codeSymbols.Count} symbols saved to: {outputPath}");
     }
@@ -200,7 +274,7 @@ class Program
     /// Process all class and interface declarations in the syntax tree
     /// </summary>
     private static void ProcessClassesAndInterfaces(SyntaxNode root, SemanticModel semanticModel,
-                                                    string? filePath,  Dictionary<string, CodeSymbol> symbols)
+                                                    string? filePath, ConcurrentDictionary<string, CodeSymbol> symbols)
     {
         // Process classes
         foreach (var classDecl in root.DescendantNodes().OfType<ClassDeclarationSyntax>())
@@ -211,6 +285,7 @@ class Program
             var location = classDecl.Identifier.GetLocation();
             var lineSpan = location.GetLineSpan();
             var lineNumber = lineSpan.StartLinePosition.Line + 1; // 1-based line number
+            var (startLine, endLine) = GetLineRange(classDecl);
             var fullName = symbol.ToDisplayString();
 
             // Create a new code symbol for this class
@@ -219,10 +294,12 @@ class Program
                 Kind: SymbolKind.Class,
                 FilePath: filePath ?? "unknown",
                 LineNumber: lineNumber,
-                Relationships: new List<SymbolRelationship>()
+                Relationships: new List<SymbolRelationship>(),
+                StartLine: startLine,
+                EndLine: endLine
             );
 
-            symbols.TryAdd(fullName, codeSymbol);
+            AddSymbol(symbols, codeSymbol);
 
             // Process methods inside the class
             foreach (var methodDecl in classDecl.DescendantNodes().OfType<MethodDeclarationSyntax>())
@@ -233,6 +310,7 @@ class Program
                 var methodLocation = methodDecl.Identifier.GetLocation();
                 var methodLineSpan = methodLocation.GetLineSpan();
                 var methodLineNumber = methodLineSpan.StartLinePosition.Line + 1;
+                var (methodStartLine, methodEndLine) = GetLineRange(methodDecl);
                 var methodFullName = methodSymbol.ToDisplayString();
 
                 // Create a symbol for the method
@@ -241,10 +319,12 @@ class Program
                     Kind: SymbolKind.Method,
                     FilePath: filePath ?? "unknown",
                     LineNumber: methodLineNumber,
-                    Relationships: new List<SymbolRelationship>()
+                    Relationships: new List<SymbolRelationship>(),
+                    StartLine: methodStartLine,
+                    EndLine: methodEndLine
                 );
 
-                symbols.TryAdd(methodFullName, methodCodeSymbol);
+                AddSymbol(symbols, methodCodeSymbol);
             }
         }
 
@@ -257,6 +337,7 @@ class Program
             var location = interfaceDecl.Identifier.GetLocation();
             var lineSpan = location.GetLineSpan();
             var lineNumber = lineSpan.StartLinePosition.Line + 1;
+            var (startLine, endLine) = GetLineRange(interfaceDecl);
             var fullName = symbol.ToDisplayString();
 
             // Create a new code symbol for this interface
@@ -265,17 +346,45 @@ class Program
                 Kind: SymbolKind.Interface,
                 FilePath: filePath ?? "unknown",
                 LineNumber: lineNumber,
-                Relationships: new List<SymbolRelationship>()
+                Relationships: new List<SymbolRelationship>(),
+                StartLine: startLine,
+                EndLine: endLine
             );
 
-            symbols.TryAdd(fullName, codeSymbol);
+            AddSymbol(symbols, codeSymbol);
         }
     }
 
+    /// <summary>
+    /// Adds a symbol to the table. Partial declarations in several documents define the same symbol,
+    /// and documents finish in any order, so the declaration with the lowest (FilePath, LineNumber)
+    /// wins; the graph is then the same on every run.
+    /// </summary>
+    private static void AddSymbol(ConcurrentDictionary<string, CodeSymbol> symbols, CodeSymbol symbol)
+    {
+        symbols.AddOrUpdate(symbol.FullName, symbol,
+            (_, existing) => DeclaredBefore(symbol, existing) ? symbol : existing);
+    }
+
+    private static bool DeclaredBefore(CodeSymbol symbol, CodeSymbol other)
+    {
+        var byPath = string.CompareOrdinal(symbol.FilePath, other.FilePath);
+        return byPath < 0 || (byPath == 0 && symbol.LineNumber < other.LineNumber);
+    }
+
+    /// <summary>
+    /// 1-based, inclusive line range of a declaration (attributes and body included, leading trivia excluded).
+    /// </summary>
+    private static (int StartLine, int EndLine) GetLineRange(SyntaxNode node)
+    {
+        var span = node.GetLocation().GetLineSpan();
+        return (span.StartLinePosition.Line + 1, span.EndLinePosition.Line + 1);
+    }
+
     /// <summary>
     /// Process relationships between symbols (inheritance, implementation, method calls)
     /// </summary>
-    private static void ProcessRelationships(SyntaxNode root, SemanticModel semanticModel, Dictionary<string, CodeSymbol> symbols)
+    private static void ProcessRelationships(SyntaxNode root, SemanticModel semanticModel, ConcurrentDictionary<string, CodeSymbol> symbols)
     {
         foreach (var classDecl in root.DescendantNodes().OfType<ClassDeclarationSyntax>())
         {
@@ -285,8 +394,15 @@ class Program
             // --- CHANGE: Use fast Dictionary lookup instead of slow FirstOrDefault ---
             if (!symbols.TryGetValue(classSymbol.ToDisplayString(), out var classCodeSymbol)) continue;
             
-            if (classSymbol.BaseType != null && !classSymbol.BaseType.Name.Equals("Object")) { /* ... */ }
-            foreach (var iface in classSymbol.Interfaces) { /* ... */ }
+            // OriginalDefinition maps constructed generics (Base<Foo>) onto the declared symbol (Base<T>).
+            if (classSymbol.BaseType != null && classSymbol.BaseType.SpecialType != SpecialType.System_Object)
+            {
+                AddTypeRelationship(classCodeSymbol, classSymbol.BaseType.OriginalDefinition.ToDisplayString(), RelationshipKind.InheritsFrom);
+            }
+            foreach (var iface in classSymbol.Interfaces)
+            {
+                AddTypeRelationship(classCodeSymbol, iface.OriginalDefinition.ToDisplayString(), RelationshipKind.Implements);
+            }
         }
         
         foreach (var invocation in root.DescendantNodes().OfType<InvocationExpressionSyntax>())
@@ -304,10 +420,156 @@ class Program
             if (!symbols.TryGetValue(callingMethodSymbol.ToDisplayString(), out var callerSymbol)) continue;
             
             var targetMethod = (IMethodSymbol)symbolInfo.Symbol;
-            callerSymbol.Relationships.Add(new SymbolRelationship(targetMethod.ToDisplayString(), RelationshipKind.Calls));
+            var callSiteLine = invocation.GetLocation().GetLineSpan().StartLinePosition.Line + 1;
+            // Partial declarations can put the same caller in several documents processed concurrently.
+            lock (callerSymbol.Relationships)
+            {
+                callerSymbol.Relationships.Add(new SymbolRelationship(targetMethod.ToDisplayString(), RelationshipKind.Calls, callSiteLine));
+            }
         }
     }
-    private static async Task QueryGraph(string graphPath, string[] seedFiles)
+    // ------------------------------------------------------------------
+    // GRAPH SERIALISATION
+    // ------------------------------------------------------------------
+
+    // NDJSON layout: a header line followed by one compact symbol per line, e.g.
+    //   {"format":"codegraph-ndjson","version":1}
+    //   {"n":"Ns.Type.Method()","k":2,"f":"/src/Type.cs","l":42,"s":41,"e":57,"r":[["Ns.Other.Call()",2,45]]}
+    // "s"/"e" are the declaration's start/end lines and the optional third element of each
+    // relationship is its call-site line. "r" is omitted when a symbol has no relationships.
+    private const string NdjsonFormatName = "codegraph-ndjson";
+    private const int NdjsonFormatVersion = 1;
+
+    /// <summary>
+    /// Streams the symbols to disk one line at a time so the whole graph never has to be
+    /// materialised as a single string.
+    /// </summary>
+    private static async Task WriteNdjsonGraph(IEnumerable<CodeSymbol> symbols, string outputPath)
+    {
+        await using var stream = File.Create(outputPath);
+        var writerOptions = new JsonWriterOptions { Encoder = JavaScriptEncoder.UnsafeRelaxedJsonEscaping };
+        await using var writer = new Utf8JsonWriter(stream, writerOptions);
+
+        writer.WriteStartObject();
+        writer.WriteString("format", NdjsonFormatName);
+        writer.WriteNumber("version", NdjsonFormatVersion);
+        writer.WriteEndObject();
+        await writer.FlushAsync();
+        stream.WriteByte((byte)'\n');
+
+        foreach (var symbol in symbols)
+        {
+            writer.Reset(stream);
+            writer.WriteStartObject();
+            writer.WriteString("n", symbol.FullName);
+            writer.WriteNumber("k", (int)symbol.Kind);
+            writer.WriteString("f", symbol.FilePath);
+            writer.WriteNumber("l", symbol.LineNumber);
+            writer.WriteNumber("s", symbol.StartLine);
+            writer.WriteNumber("e", symbol.EndLine);
+            if (symbol.Relationships.Count > 0)
+            {
+                writer.WriteStartArray("r");
+                foreach (var relationship in symbol.Relationships)
+                {
+                    writer.WriteStartArray();
+                    writer.WriteStringValue(relationship.TargetSymbolFullName);
+                    writer.WriteNumberValue((int)relationship.Kind);
+                    if (relationship.LineNumber is int callSiteLine)
+                    {
+                        writer.WriteNumberValue(callSiteLine);
+                    }
+                    writer.WriteEndArray();
+                }
+                writer.WriteEndArray();
+            }
+            writer.WriteEndObject();
+            await writer.FlushAsync();
+            stream.WriteByte((byte)'\n');
+        }
+    }
+
+    /// <summary>
+    /// Loads a graph written in either the indented JSON or the NDJSON format.
+    /// </summary>
+    private static async Task<CodeGraph?> LoadGraph(string graphPath)
+    {
+        await using var stream = File.OpenRead(graphPath);
+        using var reader = new StreamReader(stream);
+
+        var firstLine = await reader.ReadLineAsync();
+        if (!IsNdjsonHeader(firstLine))
+        {
+            stream.Seek(0, SeekOrigin.Begin);
+            return await JsonSerializer.DeserializeAsync<CodeGraph>(stream);
+        }
+
+        var symbols = new List<CodeSymbol>();
+        string? line;
+        while ((line = await reader.ReadLineAsync()) != null)
+        {
+            if (string.IsNullOrWhiteSpace(line)) continue;
+            using var document = JsonDocument.Parse(line);
+            var element = document.RootElement;
+
+            var relationships = new List<SymbolRelationship>();
+            if (element.TryGetProperty("r", out var relationshipArray))
+            {
+                foreach (var relationship in relationshipArray.EnumerateArray())
+                {
+                    relationships.Add(new SymbolRelationship(
+                        relationship[0].GetString()!,
+                        (RelationshipKind)relationship[1].GetInt32(),
+                        relationship.GetArrayLength() > 2 ? (int?)relationship[2].GetInt32() : null));
+                }
+            }
+
+            symbols.Add(new CodeSymbol(
+                FullName: element.GetProperty("n").GetString()!,
+                Kind: (SymbolKind)element.GetProperty("k").GetInt32(),
+                FilePath: element.GetProperty("f").GetString()!,
+                LineNumber: element.GetProperty("l").GetInt32(),
+                Relationships: relationships,
+                StartLine: element.TryGetProperty("s", out var start) ? start.GetInt32() : 0,
+                EndLine: element.TryGetProperty("e", out var end) ? end.GetInt32() : 0
+            ));
+        }
+        return new CodeGraph(symbols);
+    }
+
+    private static bool IsNdjsonHeader(string? line)
+    {
+        // A legacy graph may be a single (very long) line, so only small lines are probed.
+        if (string.IsNullOrWhiteSpace(line) || line.Length > 1024) return false;
+        try
+        {
+            using var document = JsonDocument.Parse(line);
+            return document.RootElement.ValueKind == JsonValueKind.Object
+                && document.RootElement.TryGetProperty("format", out var format)
+                && format.GetString() == NdjsonFormatName;
+        }
+        catch (JsonException)
+        {
+            return false;
+        }
+    }
+
+    /// <summary>
+    /// Adds an inheritance/implementation edge once, even when a partial class is declared in several documents.
+    /// </summary>
+    private static void AddTypeRelationship(CodeSymbol symbol, string targetFullName, RelationshipKind kind)
+    {
+        var relationship = new SymbolRelationship(targetFullName, kind);
+        lock (symbol.Relationships)
+        {
+            if (!symbol.Relationships.Contains(relationship))
+            {
+                symbol.Relationships.Add(relationship);
+            }
+        }
+    }
+
+    private static async Task QueryGraph(string graphPath, string[] seedFiles, string direction, int maxDepth, int maxResults)
     {
         // 1. Load the pre-built graph
         if (!File.Exists(graphPath))
@@ -315,8 +577,7 @@ class Program
             Console.Error.WriteLine($"Error: Code graph file not found at '{graphPath}'");
             return;
         }
-        var jsonContent = await File.ReadAllTextAsync(graphPath);
-        var codeGraph = JsonSerializer.Deserialize<CodeGraph>(jsonContent);
+        var codeGraph = await LoadGraph(graphPath);
         if (codeGraph == null || !codeGraph.Symbols.Any())
         {
             Console.Error.WriteLine("Error: Code graph is empty or invalid.");
@@ -324,11 +585,38 @@ class Program
         }
 
         // 2. Create fast lookup dictionaries for efficient traversal
-        var symbolsByFullName = codeGraph.Symbols.ToDictionary(s => s.FullName, s => s);
+        var symbolsByFullName = new Dictionary<string, CodeSymbol>();
+        foreach (var symbol in codeGraph.Symbols)
+        {
+            symbolsByFullName.TryAdd(symbol.FullName, symbol);
+        }
         var symbolsByFilePath = codeGraph.Symbols
             .GroupBy(s => s.FilePath)
             .ToDictionary(g => g.Key, g => g.ToList());
 
+        // Reverse-edge index: target symbol -> symbols whose relationships point at it
+        var reverseEdges = new Dictionary<string, List<(string Source, RelationshipKind Kind)>>();
+        foreach (var symbol in codeGraph.Symbols)
+        {
+            foreach (var relationship in symbol.Relationships)
+            {
+                if (!reverseEdges.TryGetValue(relationship.TargetSymbolFullName, out var sources))
+                {
+                    sources = new List<(string Source, RelationshipKind Kind)>();
+                    reverseEdges[relationship.TargetSymbolFullName] = sources;
+                }
+                sources.Add((symbol.FullName, relationship.Kind));
+            }
+        }
+
+        var (followIncoming, edgeKinds) = direction switch
+        {
+            "callers" => (true, new HashSet<RelationshipKind> { RelationshipKind.Calls }),
+            "callees" => (false, new HashSet<RelationshipKind> { RelationshipKind.Calls }),
+            "implementors" => (true, new HashSet<RelationshipKind> { RelationshipKind.InheritsFrom, RelationshipKind.Implements }),
+            _ => (true, Enum.GetValues<RelationshipKind>().ToHashSet())
+        };
+
         // 3. Find all symbols within the seed files
         var seedSymbolNames = new HashSet<string>();
         foreach (var seedFile in seedFiles)
@@ -342,24 +630,47 @@ class Program
             }
         }
 
-        // 4. Traverse the graph to find all related files
-        var finalFilePaths = new HashSet<string>(seedFiles);
+        // 4. Breadth-first traversal up to maxDepth hops; only the visited neighbourhood is touched
+        var seenFilePaths = new HashSet<string>(seedFiles);
+        var finalFilePaths = new List<string>(seenFilePaths);
+        var relatedFileCount = 0;
+        var visited = new HashSet<string>(seedSymbolNames);
+        var frontier = new Queue<(string Name, int Depth)>(seedSymbolNames.Select(name => (name, 0)));
 
-        // --- NEW: Perform a reverse search to find what USES the seed symbols ---
-        foreach (var symbol in codeGraph.Symbols)
+        while (frontier.Count > 0 && (maxResults <= 0 || relatedFileCount < maxResults))
         {
-            foreach (var relationship in symbol.Relationships)
+            var (name, depth) = frontier.Dequeue();
+            if (depth >= maxDepth) continue;
+
+            IEnumerable<string> neighbours;
+            if (followIncoming)
+            {
+                neighbours = reverseEdges.TryGetValue(name, out var sources)
+                    ? sources.Where(e => edgeKinds.Contains(e.Kind)).Select(e => e.Source)
+                    : Enumerable.Empty<string>();
+            }
+            else
             {
-                // If any symbol has a relationship pointing to one of our seeds...
-                if (seedSymbolNames.Contains(relationship.TargetSymbolFullName))
+                neighbours = symbolsByFullName.TryGetValue(name, out var current)
+                    ? current.Relationships.Where(r => edgeKinds.Contains(r.Kind)).Select(r => r.TargetSymbolFullName)
+                    : Enumerable.Empty<string>();
+            }
+
+            foreach (var neighbour in neighbours)
+            {
+                if (!visited.Add(neighbour)) continue;
+                frontier.Enqueue((neighbour, depth + 1));
+
+                if (symbolsByFullName.TryGetValue(neighbour, out var neighbourSymbol) && seenFilePaths.Add(neighbourSymbol.FilePath))
                 {
-                    // ...then that symbol's file is also relevant.
-                    finalFilePaths.Add(symbol.FilePath);
+                    finalFilePaths.Add(neighbourSymbol.FilePath);
+                    relatedFileCount++;
+                    if (maxResults > 0 && relatedFileCount >= maxResults) break;
                 }
             }
         }
         
-        // 5. Output the final list of related files as JSON
+        // 5. Output the final list of related files as JSON, nearest first
         var jsonOutput = JsonSerializer.Serialize(finalFilePaths);
         Console.WriteLine(jsonOutput);
     }
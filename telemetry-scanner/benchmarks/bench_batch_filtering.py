@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serial vs concurrent LLM batch filtering against a local mock Azure OpenAI server.
+
+The mock is the offline stand-in server (scanner.llm_standin) with a computed response: it answers
+every chat completion after a fixed latency (standing in for o3's 20-60 s round trips) and
+"selects" the first file of each batch, so the merged selection can be compared between runs.
+Run from the telemetry-scanner directory:
+
+    python benchmarks/bench_batch_filtering.py --candidates 100 --latency 2 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scanner.advanced_llm_reasoning import AdvancedLLMReasoner
+from scanner.llm_gateway import configure_llm_gateway
+from scanner.llm_standin import FixtureStore, StandInServer
+from scanner.pipeline_orchestrator import SlidingWindowExecutor
+
+BATCH_SIZE = 15
+
+def select_first_file(request):
+    """Mock answer: the first file listed in the batch prompt."""
+    prompt = request.get("messages", [{}])[-1].get("content", "")
+    files = [line.strip()[2:].split(" ")[0] for line in prompt.splitlines() if line.strip().startswith("- /")]
+    return "\n".join(files[:1]), None
+
+def make_batches(candidates: int):
+    files = [
+        {"path": f"/repo/src/Service{i:03d}/Handler{i:03d}.cs", "relevance_score": 100 - i % 50,
+         "search_strategy": "semantic", "search_reasoning": "mock", "matching_patterns": []}
+        for i in range(candidates)
+    ]
+    intent = {"operation": "add attribute", "category": "tracing", "description": "mock", "operation_type": "add"}
+    return [{"telemetry_intent": intent, "files": files[i:i + BATCH_SIZE]} for i in range(0, len(files), BATCH_SIZE)]
+
+async def run_filtering(reasoner: AdvancedLLMReasoner, batches, concurrency: int, rpm: float):
+    configure_llm_gateway(max_concurrency=concurrency, requests_per_minute=rpm)
+    executor = SlidingWindowExecutor(concurrency)
+    started = time.perf_counter()
+    outcomes = await executor.map(reasoner.afilter_batch_for_telemetry_enhancement, batches)
+    elapsed = time.perf_counter() - started
+    selected = [path for outcome in outcomes if outcome.ok for path in outcome.result.selected_files]
+    return elapsed, selected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=100, help="Search results to filter (batches of 15)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mock LLM latency per call in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Concurrency caps to compare")
+    parser.add_argument("--rpm", type=float, default=0, help="Token-bucket requests per minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = StandInServer(FixtureStore(), port=0, latency=args.latency, responder=select_first_file).start_background()
+    os.environ["AZURE_OPENAI_ENDPOINT"] = server.url
+    os.environ["AZURE_OPENAI_API_KEY"] = "mock"
+
+    batches = make_batches(args.candidates)
+    print(f"{args.candidates} candidates, {len(batches)} batches, mock latency {args.latency}s")
+
+    baseline = None
+    reference = None
+    for concurrency in args.concurrency:
+        reasoner = AdvancedLLMReasoner()
+        elapsed, selected = asyncio.run(run_filtering(reasoner, batches, concurrency, args.rpm))
+        baseline = baseline or elapsed
+        reference = reference if reference is not None else selected
+        print(f"  concurrency {concurrency:>3}: {elapsed:6.2f}s  speedup x{baseline / elapsed:4.1f}  "
+              f"selected {len(selected)}  same result: {selected == reference}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential vs fast intent extraction (EnhancedIntentBuilder modes), latency and parity.
+
+By default the offline stand-in server (scanner.llm_standin) answers every call after a fixed
+latency, deriving its answer deterministically from the ticket. Both modes' answers then come from
+the same mock_analysis, so the comparison is only a mock self-check that the fast mode maps its
+single structured answer onto the same EnhancedIntent, not a measure of parity. With --live the
+calls go to $AZURE_OPENAI_ENDPOINT (or a stand-in replaying recorded fixtures) and the comparison
+reports the parity of the two modes' real answers.
+
+Tickets are requests.jsonl-style JSON lines ("title" and "body", or "ticket"/"text"), or plain text
+files. Run from the telemetry-scanner directory:
+
+    python benchmarks/bench_intent_modes.py --latency 2
+    python benchmarks/bench_intent_modes.py --tickets ../requests.jsonl --limit 5 --live
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scanner.enhanced_intent_builder import EnhancedIntentBuilder, IntentMode
+from scanner.llm_gateway import get_llm_gateway
+from scanner.llm_standin import FixtureStore, StandInServer
+
+SCANNER_DIR = Path(__file__).resolve().parent.parent
+PARITY_FIELDS = ["issue_category", "static_analysis_query", "search_keywords", "telemetry_operation", "complexity_score",
+                 "operation_type", "estimated_files", "confidence", "sub_tasks", "contextual_hints"]
+
+def mock_analysis(ticket: str):
+    """Deterministic intent, complexity and plan for a ticket."""
+    words = list(dict.fromkeys(word.lower() for word in re.findall(r"[A-Za-z][A-Za-z_.]{4,}", ticket)))
+    keywords = words[:6]
+    complexity_score = 2 + len(ticket) % 7
+    intent = {
+        "issue_category": "CONFIGURATION" if "config" in ticket.lower() else "INSTRUMENTATION",
+        "static_analysis_query": None,
+        "semantic_description": " ".join(words[:12]),
+        "search_keywords": keywords,
+        "telemetry_operation": {
+            "type": "span", "target_name": None, "action": "ADD_ATTRIBUTES",
+            "attributes_to_add": [{"name": keyword, "value_source": "ticket"} for keyword in keywords[:2]],
+            "new_span_name": None, "new_metric_details": None
+        },
+        "technical_entities": words[6:9], "primary_goal": " ".join(words[:5]), "secondary_goals": [],
+        "recognized_patterns": ["span_attribute_enrichment"], "scope_indicators": ["multiple_files"]
+    }
+    complexity = {
+        "complexity_score": complexity_score, "operation_type": "multi_file", "estimated_files": complexity_score // 2 + 1,
+        "risk_factors": [], "technical_challenges": [f"locate {keyword}" for keyword in keywords[:2]], "prerequisites": []
+    }
+    plan = {
+        "steps": [
+            {"order": 1, "action": "locate_configuration", "description": "Find telemetry setup",
+             "expected_files": [], "dependencies": [], "validation_criteria": "found"},
+            {"order": 2, "action": "implement_changes", "description": "Add attributes",
+             "expected_files": [], "dependencies": [1], "validation_criteria": "implemented"}
+        ],
+        "alternative_approaches": [], "rollback_strategy": "revert"
+    }
+    return intent, complexity, plan
+
+def mock_responder(combined_latency: float):
+    """Stand-in responder answering each intent call site from mock_analysis; the fast mode's single
+    call takes `combined_latency`, the others the server's latency."""
+    def respond(request):
+        messages = request.get("messages", [])
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        prompt = messages[-1]["content"] if messages else ""
+
+        if system and "In a single pass" in system:
+            intent, complexity, plan = mock_analysis(prompt.split("Analyze this ticket:\n\n", 1)[-1])
+            return json.dumps({"intent": intent, "complexity": complexity, "plan": plan}), combined_latency
+        if system:
+            return json.dumps(mock_analysis(prompt.split("Analyze this ticket:\n\n", 1)[-1])[0]), None
+        match = re.search(r"Ticket: (.*?)\n(?:Basic Intent|Intent):", prompt, re.DOTALL)
+        _, complexity, plan = mock_analysis(match.group(1) if match else "")
+        return json.dumps(complexity if "Analyze the complexity" in prompt else plan), None
+    return respond
+
+def load_tickets(paths, limit):
+    tickets = []
+    for path in paths:
+        path = Path(path)
+        if path.suffix == ".jsonl":
+            for line in path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    text = record.get("ticket") or record.get("text") or f"{record.get('title', '')}\n\n{record.get('body', '')}"
+                    tickets.append((record.get("request_id") or record.get("key") or path.stem, text))
+        else:
+            tickets.append((path.stem, path.read_text(encoding="utf-8")))
+    return tickets[:limit] if limit else tickets
+
+def intent_fields(intent):
+    fields = {}
+    for name in PARITY_FIELDS:
+        value = getattr(intent, name)
+        fields[name] = value.value if hasattr(value, "value") else value
+    return fields
+
+def keyword_overlap(a, b):
+    a, b = {k.lower() for k in a or []}, {k.lower() for k in b or []}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", nargs="+", default=sorted(str(p) for p in SCANNER_DIR.glob("ticket*.txt")),
+                        help="Ticket files: .jsonl (one ticket per line) or plain text (default: ticket*.txt)")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N tickets")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mock latency per sequential-mode call (seconds)")
+    parser.add_argument("--combined-latency", type=float, default=None,
+                        help="Mock latency of the fast mode's single call (default: 1.5x --latency, as it returns more)")
+    parser.add_argument("--live", action="store_true", help="Call $AZURE_OPENAI_ENDPOINT instead of the mock")
+    args = parser.parse_args()
+
+    server = None
+    if not args.live:
+        combined_latency = args.combined_latency if args.combined_latency is not None else args.latency * 1.5
+        server = StandInServer(FixtureStore(), port=0, latency=args.latency,
+                               responder=mock_responder(combined_latency)).start_background()
+        os.environ["AZURE_OPENAI_ENDPOINT"] = server.url
+        os.environ["AZURE_OPENAI_API_KEY"] = "mock"
+
+    tickets = load_tickets(args.tickets, args.limit)
+    gateway = get_llm_gateway()
+    print(f"{len(tickets)} tickets, {'live endpoint' if args.live else f'mock latency {args.latency}s'}")
+
+    results = {}
+    for mode in IntentMode:
+        builder = EnhancedIntentBuilder(mode)
+        calls_before = gateway.get_stats()["requests"]
+        timings, intents = [], {}
+        for name, text in tickets:
+            started = time.perf_counter()
+            intents[name] = intent_fields(builder.extract_enhanced_intent(text))
+            timings.append(time.perf_counter() - started)
+        calls = gateway.get_stats()["requests"] - calls_before
+        results[mode] = intents
+        print(f"  {mode.value:>10}: total {sum(timings):6.2f}s  mean {sum(timings) / len(timings):5.2f}s/ticket  "
+              f"max {max(timings):5.2f}s  LLM calls {calls}")
+
+    sequential, fast = results[IntentMode.SEQUENTIAL], results[IntentMode.FAST]
+    if args.live:
+        print("Parity (fast vs sequential):")
+    else:
+        print("Mock self-check (both modes answered from the same mock_analysis; use --live for parity):")
+    for name, _ in tickets:
+        matching = [field for field in PARITY_FIELDS if sequential[name][field] == fast[name][field]]
+        overlap = keyword_overlap(sequential[name]["search_keywords"], fast[name]["search_keywords"])
+        differing = ", ".join(field for field in PARITY_FIELDS if field not in matching) or "none"
+        print(f"  {name}: {len(matching)}/{len(PARITY_FIELDS)} fields equal, keyword overlap {overlap:.2f}; differ: {differing}")
+
+    if server is not None:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,29 @@ Enhanced CLI with advanced orchestration and all new features integrated.
 """
 import argparse
 import asyncio
+import functools
 import json
+import os
 import time
 from pathlib import Path
 from typing import Dict, List, Optional
 
 # Import enhanced modules
-from scanner.pipeline_orchestrator import EnhancedOrchestrator, StageStatus
-from scanner.enhanced_intent_builder import EnhancedIntentBuilder, IntentConfidence
-from scanner.intelligent_search import IntelligentSearchEngine
+from scanner.pipeline_orchestrator import (
+    EnhancedOrchestrator, ExecutorKind, SlidingWindowExecutor, StageSpec, StageStatus, hash_text, hash_values, file_fingerprint,
+    tree_fingerprint
+)
+from scanner.enhanced_intent_builder import EnhancedIntentBuilder, IntentConfidence, IntentMode
+from scanner.profiling import ProfileMode
+from scanner.llm_gateway import LLMCacheMode, configure_llm_gateway, get_llm_gateway
+from scanner.log_config import DEFAULT_SAMPLE_SIZE, LOG_LEVEL_ENV, LOG_LEVELS, configure_logging
+from scanner.tracing import tracer
+from scanner.intelligent_search import IntelligentSearchEngine, build_file_index, compute_file_embeddings, load_file_index
 from scanner.advanced_code_graph import AdvancedCodeGraphAnalyzer
 from scanner.advanced_llm_reasoning import AdvancedLLMReasoner, ReasoningStrategy
+from scanner.context_packer import DEFAULT_CONTEXT_TOKENS
+from scanner.source_compactor import compaction_summary, configure_source_compaction, get_compaction_stats
+from scanner.token_counter import DEFAULT_PROMPT_BUDGETS, configure_prompt_budgets, get_token_counter
 
 # Import existing modules
 from scanner.jira_client import get_formatted_ticket_text, clean_jira_text
@@ -27,18 +39,37 @@ class EnhancedTelemetryAgent:
     def __init__(self, args):
         self.args = args
         self.output_dir = Path(args.output)
+        configure_logging(args.log_level, sample_size=args.log_sample)
+        tracer.reset(enabled=args.trace)
         self.orchestrator = EnhancedOrchestrator(
             self.output_dir,
             max_retries=args.max_retries,
             enable_cache=args.enable_cache,
-            parallel_workers=args.parallel_workers
+            parallel_workers=args.parallel_workers,
+            max_concurrent_stages=args.stage_concurrency,
+            process_workers=args.process_workers,
+            cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+            cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+            cache_ttl_seconds=args.cache_ttl_hours * 3600 if args.cache_ttl_hours > 0 else None,
+            resume=args.resume,
+            profile=args.profile
         )
         
         # Initialize enhanced components
-        self.intent_builder = EnhancedIntentBuilder()
+        self.intent_builder = EnhancedIntentBuilder(IntentMode(args.intent_mode))
         self.search_engine = None  # Will be initialized after repo setup
         self.graph_analyzer = None  # Will be initialized after graph building
-        self.llm_reasoner = AdvancedLLMReasoner()
+        self.llm_reasoner = AdvancedLLMReasoner(context_tokens=args.patch_context_tokens)
+        # Every LLM call of the run shares these limits, so it stays under the deployment's quota
+        configure_llm_gateway(max_concurrency=args.llm_concurrency, requests_per_minute=args.llm_rpm,
+                              max_retries=args.llm_retries).configure_cache(
+            LLMCacheMode(args.llm_cache),
+            cache_dir=Path(args.cache_dir) / "llm" if args.cache_dir else None,
+            ttl_seconds=args.llm_cache_ttl_hours * 3600 if args.llm_cache_ttl_hours > 0 else None,
+            skip_operations=args.llm_cache_skip
+        ).configure_recording(Path(args.llm_record) if args.llm_record else None)
+        configure_prompt_budgets(dict(args.prompt_budget))
+        configure_source_compaction(args.compact_sources)
     
     async def run_enhanced_pipeline(self) -> None:
         """Run the enhanced telemetry refactoring pipeline."""
@@ -47,102 +78,109 @@ class EnhancedTelemetryAgent:
         print(f"Output directory: {self.output_dir}")
         
         try:
-            # Stage 1: Ticket Processing and Intent Extraction
-            await self._stage_ticket_processing()
-            
-            # Stage 2: Repository Analysis and Graph Building
-            await self._stage_repository_analysis()
-            
-            # Stage 3: Enhanced Multi-Modal Search
-            await self._stage_intelligent_search()
+            # Stages run as a dependency graph: ticket/intent extraction and project
+            # parsing/graph building are independent, so they overlap
+            with tracer.start_span("pipeline.run", attributes={
+                "pipeline.ticket": self.args.ticket_key,
+                "pipeline.build_graph_only": self.args.build_graph_only,
+                "pipeline.max_candidates": self.args.max_candidates
+            }):
+                await self.orchestrator.run_graph(
+                    self._build_stage_graph(),
+                    initial_values={
+                        "ticket_args": self.args,
+                        "dirs_proj_path": self.args.dirs_proj_path,
+                        "repo_root": self.args.repo_root
+                    },
+                    on_output=self._publish_stage_output
+                )
+                if not self.args.build_graph_only:
+                    await self._run_report_generation()
             
-            # Stage 4: Batch-Based LLM Selection and Patch Generation
-            await self._stage_reasoning_and_generation()
-                    
-            # Stage 5 : Report Generation
-            await self._stage_report_generation()
+            if self.args.build_graph_only:
+                print("✅ Enhanced code graph built successfully")
+            else:
+                print(f"\n🎉 Enhanced pipeline completed successfully!")
+                print(f"📁 All outputs saved to: {self.output_dir}")
             
         except Exception as e:
             print(f"Pipeline failed: {e}")
             raise
         finally:
+            llm_stats = get_llm_gateway().get_stats()
+            if llm_stats["requests"]:
+                print(f"LLM calls: {llm_stats['requests']} ({llm_stats['cache_hits']} from cache, "
+                      f"{llm_stats['retries']} retries, {llm_stats['throttled']} throttled, {llm_stats['failed']} failed)")
+                if llm_stats["recorded"] is not None:
+                    print(f"Recorded {llm_stats['recorded']} LLM fixtures to {self.args.llm_record}")
+                token_stats = get_token_counter().get_stats()
+                if token_stats["splits"]:
+                    print(f"Split {token_stats['splits']} oversized LLM batches to fit their prompt budgets")
+            compaction = compaction_summary()
+            if compaction:
+                print(compaction)
+                self.orchestrator.record_stage_metrics("llm_prompts", {"source_compaction": get_compaction_stats()})
+
             # Save execution report
             self.orchestrator.save_stage_report()
             print(f"Execution report saved to {self.output_dir / 'pipeline_report.json'}")
+            trace_files = tracer.export(self.output_dir)
+            if trace_files:
+                print(f"Trace saved to {trace_files['otlp_json']} and {trace_files['chrome_trace']}")
+            if self.orchestrator.profiler is not None:
+                print(f"Stage profiles (collapsed stacks) saved to {self.orchestrator.profiler.output_dir}")
     
-    # ...existing code for stages 1-3...
-    async def _stage_ticket_processing(self) -> None:
-        """Stage 1: Enhanced ticket processing and intent extraction."""
-        
-        def process_ticket(args):
-            if args.local_ticket:
-                ticket_path = Path(args.ticket_key)
-                if not ticket_path.exists():
-                    raise FileNotFoundError(f"Local ticket file not found: {args.ticket_key}")
-                raw_text = ticket_path.read_text(encoding="utf-8")
-            else:
-                raw_text = get_formatted_ticket_text(args.ticket_key)
-                if not raw_text:
-                    raise ValueError("Could not retrieve ticket text")
-                raw_text = clean_jira_text(raw_text)
-            
-            return raw_text
-        
-        def extract_enhanced_intent(ticket_text):
-            # Build contextual information for better intent extraction
-            context = {
-                "timestamp": time.time(),
-                "ticket_source": "local" if self.args.local_ticket else "jira",
-                "agent_version": "enhanced_v1.0"
-            }
-            
-            enhanced_intent = self.intent_builder.extract_enhanced_intent(ticket_text, context)
-            return enhanced_intent
-        
-        # Execute ticket processing with orchestration
-        ticket_result = await self.orchestrator.execute_stage(
-            "ticket_processing",
-            process_ticket,
-            self.args
-        )
-        
-        if ticket_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Ticket processing failed: {ticket_result.error}")
-        
-        ticket_text = ticket_result.result
-        (self.output_dir / "cleaned_ticket.txt").write_text(ticket_text, encoding="utf-8")
+    def _publish_stage_output(self, name, value) -> None:
+        """Mirror stage outputs onto the agent and write their artifacts, so later stages and the
+        output directory see them even when the stage was served from cache or a checkpoint."""
+        if name == "selection":
+            self.selected_files, self.reasoning_chain = value
+        else:
+            setattr(self, name, value)
         
-        # Extract enhanced intent
-        intent_result = await self.orchestrator.execute_stage(
-            "intent_extraction",
-            extract_enhanced_intent,
-            ticket_text,
-            dependencies=["ticket_processing"]
+        if name == "ticket_text":
+            (self.output_dir / "cleaned_ticket.txt").write_text(value, encoding="utf-8")
+        elif name == "enhanced_intent":
+            self._save_enhanced_intent(value)
+        elif name == "search_metrics":
+            self._save_search_results(self.search_results, value)
+        elif name == "generation_result":
+            self._save_batch_summary(value)
+    
+    async def _run_report_generation(self) -> None:
+        """Report generation runs after the graph; a failure only warns, the patch is already saved."""
+        report_result = await self.orchestrator.execute_stage(
+            "report_generation",
+            self._stage_report_generation,
+            self.generation_result,
+            dependencies=["patch_generation"]
         )
         
-        if intent_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Intent extraction failed: {intent_result.error}")
-        
-        self.enhanced_intent = intent_result.result
-        
-        # Save enhanced intent
+        if report_result.status == StageStatus.COMPLETED:
+            report_info = report_result.result
+            print(f"📄 Generated {report_info['report_type']} report")
+            print(f"📊 Report saved to {self.output_dir}")
+        else:
+            print(f"⚠️  Report generation failed: {report_result.error}")
+    
+    def _save_enhanced_intent(self, enhanced_intent) -> None:
         intent_data = {
             "basic_intent": {
-                "issue_category": self.enhanced_intent.issue_category,
-                "static_analysis_query": self.enhanced_intent.static_analysis_query,
-                "semantic_description": self.enhanced_intent.semantic_description,
-                "search_keywords": self.enhanced_intent.search_keywords,
-                "telemetry_operation": self.enhanced_intent.telemetry_operation
+                "issue_category": enhanced_intent.issue_category,
+                "static_analysis_query": enhanced_intent.static_analysis_query,
+                "semantic_description": enhanced_intent.semantic_description,
+                "search_keywords": enhanced_intent.search_keywords,
+                "telemetry_operation": enhanced_intent.telemetry_operation
             },
             "enhanced_analysis": {
-                "confidence": self.enhanced_intent.confidence.value,
-                "operation_type": self.enhanced_intent.operation_type.value,
-                "complexity_score": self.enhanced_intent.complexity_score,
-                "estimated_files": self.enhanced_intent.estimated_files,
-                "validation_issues": self.enhanced_intent.validation_result.issues,
-                "suggestions": self.enhanced_intent.validation_result.suggestions,
-                "sub_tasks": self.enhanced_intent.sub_tasks,
-                "contextual_hints": self.enhanced_intent.contextual_hints
+                "confidence": enhanced_intent.confidence.value,
+                "operation_type": enhanced_intent.operation_type.value,
+                "complexity_score": enhanced_intent.complexity_score,
+                "estimated_files": enhanced_intent.estimated_files,
+                "validation_issues": enhanced_intent.validation_result.issues,
+                "suggestions": enhanced_intent.validation_result.suggestions,
+                "sub_tasks": enhanced_intent.sub_tasks,
+                "contextual_hints": enhanced_intent.contextual_hints
             }
         }
         
@@ -150,187 +188,275 @@ class EnhancedTelemetryAgent:
             json.dumps(intent_data, indent=2), encoding="utf-8"
         )
         
-        print(f"✅ Intent extracted with {self.enhanced_intent.confidence.value} confidence")
-        print(f"📊 Complexity Score: {self.enhanced_intent.complexity_score}/10")
-        print(f"📁 Estimated Files: {self.enhanced_intent.estimated_files}")
+        print(f"✅ Intent extracted with {enhanced_intent.confidence.value} confidence")
+        print(f"📊 Complexity Score: {enhanced_intent.complexity_score}/10")
+        print(f"📁 Estimated Files: {enhanced_intent.estimated_files}")
     
-    async def _stage_repository_analysis(self) -> None:
-        """Stage 2: Repository analysis and advanced graph building."""
-        
-        def parse_projects(dirs_proj_path):
-            project_paths = parse_dirs_proj(Path(dirs_proj_path))
-            if not project_paths:
-                raise ValueError("Could not find any projects in dirs.proj")
-            return project_paths
-        
-        def build_enhanced_graph(project_paths):
-            print(f"Building code graph for {len(project_paths)} projects...")
-            build_monorepo_graph(project_paths)
-            
-            from scanner.static_analyzer import CODE_GRAPH_PATH
-            
-            # Initialize advanced graph analyzer
-            self.graph_analyzer = AdvancedCodeGraphAnalyzer(
-                CODE_GRAPH_PATH,
-                "~/Documents/TRA/CodeGraphBuilder/bin/Release/net9.0/CodeGraphBuilder.dll"
-            )
-            self.graph_analyzer.load_and_analyze_graph()
-            
-            return {"projects_count": len(project_paths), "graph_loaded": True}
-        
-        # Parse projects
-        projects_result = await self.orchestrator.execute_stage(
-            "project_parsing",
-            parse_projects,
-            self.args.dirs_proj_path
-        )
-        
-        if projects_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Project parsing failed: {projects_result.error}")
-        
-        project_paths = projects_result.result
-        print(f"📁 Found {len(project_paths)} projects")
+    def _save_search_results(self, search_results, search_metrics) -> None:
+        """Save search results, with what each strategy cost and contributed."""
+        self.orchestrator.record_stage_metrics("intelligent_search", {"search": search_metrics})
+        search_data = {
+            "results": [
+                {
+                    "file_path": str(result.file_path),
+                    "strategy": result.strategy.value,
+                    "relevance_score": result.relevance_score,
+                    "reasoning": result.reasoning,
+                    "matching_patterns": result.matching_patterns,
+                    "confidence": result.confidence
+                }
+                for result in search_results
+            ],
+            "metrics": search_metrics
+        }
         
-        # Build enhanced graph (always needed for analysis)
-        graph_result = await self.orchestrator.execute_stage(
-            "graph_building",
-            build_enhanced_graph,
-            project_paths,
-            dependencies=["project_parsing"]
+        (self.output_dir / "search_results.json").write_text(
+            json.dumps(search_data, indent=2), encoding="utf-8"
         )
         
-        if graph_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Graph building failed: {graph_result.error}")
-        
-        # If only building graph, exit here
-        if self.args.build_graph_only:
-            print("✅ Enhanced code graph built successfully")
-            return
+        print(f"🔍 Found {len(search_results)} candidate files")
+        for strategy in search_metrics.get("strategies", []):
+            print(f"   {strategy['strategy']}: {strategy['wall_time']:.2f}s, {strategy['files_scanned']} files scanned, "
+                  f"{strategy['candidates']} candidates, {strategy['surviving']} surviving, {strategy['returned']} returned")
+        if search_results:
+            print(f"🎯 Top result: {search_results[0].file_path.name} (score: {search_results[0].relevance_score})")
+    
+    def _save_batch_summary(self, generation_result) -> None:
+        batch_summary = {
+            "total_search_results": len(self.search_results),
+            "promising_files_found": len(self.promising_files),
+            "final_files_selected": len(self.selected_files),
+            "strategy_used": generation_result.get("strategy_used", "direct"),
+            "selection_efficiency": f"{len(self.selected_files)/max(len(self.search_results), 1)*100:.1f}%",
+            "files_selected": [str(f) for f in generation_result.get("selected_files", [])],
+            "diff_length": len(generation_result.get("diff", "")),
+            "explanation_length": len(generation_result.get("explanation", ""))
+        }
         
-        # Initialize search engine with proper code graph path
-        from scanner.static_analyzer import CODE_GRAPH_PATH
-        self.search_engine = IntelligentSearchEngine(
-            self.args.repo_root,
-            CODE_GRAPH_PATH
+        (self.output_dir / "batch_selection_summary.json").write_text(
+            json.dumps(batch_summary, indent=2), encoding="utf-8"
         )
         
-        print("✅ Repository analysis completed")
-
-    async def _stage_intelligent_search(self) -> None:
-        """Stage 3: Enhanced multi-modal search."""
-        
-        def perform_intelligent_search(intent_data):
-            # Convert enhanced intent back to basic format for search
-            basic_intent = {
-                "issue_category": intent_data.issue_category,
-                "static_analysis_query": intent_data.static_analysis_query,
-                "semantic_description": intent_data.semantic_description,
-                "search_keywords": intent_data.search_keywords,
-                "telemetry_operation": intent_data.telemetry_operation
-            }
-            
-            # Perform multi-modal search
-            search_results = self.search_engine.multi_modal_search(
-                basic_intent, 
-                top_k=self.args.max_candidates
-            )
-            
-            return search_results
-        
-        search_result = await self.orchestrator.execute_stage(
-            "intelligent_search",
-            perform_intelligent_search,
-            self.enhanced_intent,
-            dependencies=["intent_extraction"]
-        )
+        if generation_result.get("selected_files"):
+            print(f" Selected {len(generation_result['selected_files'])} files for direct instrumentation")
+            print(f" Generated patch with {len(generation_result.get('diff', '').splitlines())} lines")
+        else:
+            print(" No files selected for modification")
+    
+    def _build_stage_graph(self) -> List[StageSpec]:
+        """
+        Declare the pipeline stages with the values each one consumes and produces.
         
-        if search_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Intelligent search failed: {search_result.error}")
+        Cache fingerprints are small hashes/versions of the stage inputs (ticket hash, file index
+        version, code graph version, ...). Stages with side effects have none and always run.
+        """
+        repository_stages = [
+            StageSpec("project_parsing", self._stage_project_parsing,
+                      inputs=["dirs_proj_path"], outputs=["project_paths"],
+                      fingerprint=lambda path: {"dirs_proj": file_fingerprint(path)},
+                      serializer="msgpack"),
+            # Side effect: writes the code graph and sets self.graph_analyzer
+            StageSpec("graph_building", self._stage_graph_building,
+                      inputs=["project_paths"], outputs=["code_graph"], checkpoint=False),
+        ]
         
-        self.search_results = search_result.result
+        # If only building graph, nothing else needs to run
+        if self.args.build_graph_only:
+            return repository_stages
         
-        # Save search results
-        search_data = [
-            {
-                "file_path": str(result.file_path),
-                "strategy": result.strategy.value,
-                "relevance_score": result.relevance_score,
-                "reasoning": result.reasoning,
-                "matching_patterns": result.matching_patterns,
-                "confidence": result.confidence
-            }
-            for result in self.search_results
+        return [
+            StageSpec("ticket_processing", self._stage_ticket_processing,
+                      inputs=["ticket_args"], outputs=["ticket_text"],
+                      # Jira tickets can change between runs, so only local ticket files are cached
+                      fingerprint=lambda args: {"ticket_file": file_fingerprint(args.ticket_key)} if args.local_ticket else None,
+                      # Resuming must not restore another ticket's text, cached or not
+                      checkpoint_fingerprint=lambda args: {"ticket_key": args.ticket_key, "local_ticket": args.local_ticket}),
+            StageSpec("intent_extraction", self._stage_intent_extraction,
+                      inputs=["ticket_text"], outputs=["enhanced_intent"],
+                      fingerprint=lambda ticket_text: {"ticket": hash_text(ticket_text), "mode": self.args.intent_mode}),
+            *repository_stages,
+            # CPU-bound: regex indexing runs in a worker process, off the GIL; file contents stay in
+            # a memory-mapped array that the search engine decodes per access, not pickled
+            StageSpec("file_indexing",
+                      functools.partial(build_file_index, contents_path=str(self.output_dir / "shared" / "file_contents.npy")),
+                      inputs=["repo_root"], outputs=["file_index"],
+                      executor=ExecutorKind.PROCESS,
+                      # Resuming must not restore an index of files that changed since
+                      checkpoint_fingerprint=lambda repo_root: {"sources": tree_fingerprint(repo_root, "*.cs")}),
+            # Side effect: sets self.search_engine
+            StageSpec("search_engine_setup", self._stage_search_engine_setup,
+                      inputs=["code_graph", "file_index"], outputs=["search_engine_info"],
+                      checkpoint=False),
+            StageSpec("intelligent_search", self._stage_intelligent_search,
+                      inputs=["enhanced_intent", "search_engine_info"],
+                      outputs=["search_results", "search_metrics"],
+                      fingerprint=lambda inputs: {
+                          "intent": self._intent_fingerprint(inputs["enhanced_intent"]),
+                          **self._repository_fingerprint(),
+                          "top_k": self.args.max_candidates
+                      },
+                      version=2),
+            StageSpec("batch_filtering", self._stage_batch_filtering,
+                      inputs=["search_results"], outputs=["promising_files"],
+                      fingerprint=lambda search_results: {
+                          "intent": self._intent_fingerprint(self.enhanced_intent),
+                          "results": self._results_fingerprint(search_results),
+                          **self._repository_fingerprint()
+                      }),
+            StageSpec("final_selection", self._stage_final_selection,
+                      inputs=["promising_files"], outputs=["selection"],
+                      fingerprint=lambda promising_files: {
+                          "intent": self._intent_fingerprint(self.enhanced_intent),
+                          "promising": self._results_fingerprint(promising_files),
+                          "compact_sources": self.args.compact_sources,
+                          **self._repository_fingerprint()
+                      }),
+            StageSpec("patch_generation", self._stage_patch_generation,
+                      inputs=["selection"], outputs=["generation_result"],
+                      fingerprint=lambda selection: {
+                          "intent": self._intent_fingerprint(self.enhanced_intent),
+                          "files": hash_values(*[(str(f["path"]), hash_text(f["content"])) for f in selection[0]]),
+                          "reasoning": hash_text(selection[1]),
+                          "context_tokens": self.args.patch_context_tokens
+                      }),
         ]
-        
-        (self.output_dir / "search_results.json").write_text(
-            json.dumps(search_data, indent=2), encoding="utf-8"
+    
+    @staticmethod
+    def _intent_fingerprint(intent) -> str:
+        """Hash of the intent fields that drive search, selection and patching."""
+        return hash_values(
+            intent.issue_category,
+            intent.semantic_description,
+            intent.search_keywords,
+            intent.telemetry_operation,
+            intent.operation_type.value
         )
+    
+    @staticmethod
+    def _results_fingerprint(results) -> str:
+        """Hash of search results by identity and score (not content)."""
+        return hash_values(*[(str(r.file_path), r.relevance_score, r.strategy.value) for r in results])
+    
+    def _repository_fingerprint(self) -> Dict[str, str]:
+        """Versions of the file index and code graph the search engine was built from."""
+        return {
+            "index": self.search_engine.get_index_version(),
+            "graph": file_fingerprint(self.search_engine.code_graph_path)
+        }
+    
+    # ------------------------------------------------------------------
+    # Stage 1: Ticket processing and intent extraction
+    # ------------------------------------------------------------------
+    def _stage_ticket_processing(self, args) -> str:
+        """Fetch (or read) and clean the ticket text."""
+        if args.local_ticket:
+            ticket_path = Path(args.ticket_key)
+            if not ticket_path.exists():
+                raise FileNotFoundError(f"Local ticket file not found: {args.ticket_key}")
+            raw_text = ticket_path.read_text(encoding="utf-8")
+        else:
+            raw_text = get_formatted_ticket_text(args.ticket_key)
+            if not raw_text:
+                raise ValueError("Could not retrieve ticket text")
+            raw_text = clean_jira_text(raw_text)
         
-        print(f"🔍 Found {len(self.search_results)} candidate files")
-        print(f"🎯 Top result: {self.search_results[0].file_path.name} (score: {self.search_results[0].relevance_score})")
+        return raw_text
     
-    async def _stage_reasoning_and_generation(self) -> None:
-        """Stage 4: Batch-based LLM file selection and patch generation with direct instrumentation focus."""
-        
-        # Execute batch filtering
-        batch_result = await self.orchestrator.execute_stage(
-            "batch_filtering",
-            self.batch_filter_candidates,
-            self.search_results  # Use ALL search results, not filtered subset
-        )
+    def _stage_intent_extraction(self, ticket_text):
+        """Enhanced intent extraction."""
+        # Build contextual information for better intent extraction
+        context = {
+            "timestamp": time.time(),
+            "ticket_source": "local" if self.args.local_ticket else "jira",
+            "agent_version": "enhanced_v1.0"
+        }
         
-        if batch_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Batch filtering failed: {batch_result.error}")
+        self.enhanced_intent = self.intent_builder.extract_enhanced_intent(ticket_text, context)
+        return self.enhanced_intent
+    
+    # ------------------------------------------------------------------
+    # Stage 2: Repository analysis and graph building
+    # ------------------------------------------------------------------
+    def _stage_project_parsing(self, dirs_proj_path):
+        project_paths = parse_dirs_proj(Path(dirs_proj_path))
+        if not project_paths:
+            raise ValueError("Could not find any projects in dirs.proj")
+        print(f"📁 Found {len(project_paths)} projects")
+        return project_paths
+    
+    def _stage_graph_building(self, project_paths):
+        print(f"Building code graph for {len(project_paths)} projects...")
+        build_monorepo_graph(project_paths)
         
-        promising_files = batch_result.result
+        from scanner.static_analyzer import CODE_GRAPH_PATH
         
-        # Execute final selection
-        selection_result = await self.orchestrator.execute_stage(
-            "final_selection",
-            self.final_selection_with_relationships,
-            promising_files
+        # Initialize advanced graph analyzer
+        self.graph_analyzer = AdvancedCodeGraphAnalyzer(
+            CODE_GRAPH_PATH,
+            "~/Documents/TRA/CodeGraphBuilder/bin/Release/net9.0/CodeGraphBuilder.dll"
         )
+        self.graph_analyzer.load_and_analyze_graph()
         
-        if selection_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Final selection failed: {selection_result.error}")
-        
-        self.selected_files, self.reasoning_chain = selection_result.result
-        
-        # Execute patch generation
-        generation_result = await self.orchestrator.execute_stage(
-            "patch_generation",
-            self.generate_enhanced_patch,
-            (self.selected_files, self.reasoning_chain)
+        return {"projects_count": len(project_paths), "graph_loaded": True}
+    
+    def _stage_search_engine_setup(self, inputs):
+        # Initialize search engine with proper code graph path and the index built in a worker
+        from scanner.static_analyzer import CODE_GRAPH_PATH
+        self.search_engine = IntelligentSearchEngine(
+            self.args.repo_root,
+            CODE_GRAPH_PATH,
+            file_index=load_file_index(inputs["file_index"])
         )
+        # Semantic search is only a fallback, so files are embedded (in a worker) only when it runs.
+        # Only paths go to the worker; the matrix comes back as a memory-mapped file
+        embeddings_path = str(self.output_dir / "shared" / "file_embeddings.npy")
+        self.search_engine.set_file_embedding_provider(lambda paths: self.orchestrator.run_in_process(
+            compute_file_embeddings, {"paths": paths, "output_path": embeddings_path}
+        ))
         
-        if generation_result.status != StageStatus.COMPLETED:
-            raise RuntimeError(f"Patch generation failed: {generation_result.error}")
+        print("✅ Repository analysis completed")
+        return {"indexed_files": len(self.search_engine.file_index), "code_graph_path": CODE_GRAPH_PATH}
 
-        self.generation_result = generation_result.result
+    # ------------------------------------------------------------------
+    # Stage 3: Enhanced multi-modal search
+    # ------------------------------------------------------------------
+    def _stage_intelligent_search(self, inputs):
+        intent_data = inputs["enhanced_intent"]
         
-        # Save results
-        batch_summary = {
-            "total_search_results": len(self.search_results),
-            "promising_files_found": len(promising_files),
-            "final_files_selected": len(self.selected_files),
-            "strategy_used": self.generation_result.get("strategy_used", "direct"),
-            "selection_efficiency": f"{len(self.selected_files)/len(self.search_results)*100:.1f}%",
-            "files_selected": [str(f) for f in self.generation_result.get("selected_files", [])],
-            "diff_length": len(self.generation_result.get("diff", "")),
-            "explanation_length": len(self.generation_result.get("explanation", ""))
+        # Convert enhanced intent back to basic format for search
+        basic_intent = {
+            "issue_category": intent_data.issue_category,
+            "static_analysis_query": intent_data.static_analysis_query,
+            "semantic_description": intent_data.semantic_description,
+            "search_keywords": intent_data.search_keywords,
+            "telemetry_operation": intent_data.telemetry_operation
         }
         
-        (self.output_dir / "batch_selection_summary.json").write_text(
-            json.dumps(batch_summary, indent=2), encoding="utf-8"
+        # Perform multi-modal search
+        self.search_results = self.search_engine.multi_modal_search(
+            basic_intent, 
+            top_k=self.args.max_candidates
         )
         
-        if self.generation_result.get("selected_files"):
-            print(f" Selected {len(self.generation_result['selected_files'])} files for direct instrumentation")
-            print(f" Generated patch with {len(self.generation_result.get('diff', '').splitlines())} lines")
-        else:
-            print(" No files selected for modification")
+        return {"search_results": self.search_results, "search_metrics": self.search_engine.last_search_metrics}
+    
+    # ------------------------------------------------------------------
+    # Stage 4: Batch-based LLM selection and patch generation
+    # ------------------------------------------------------------------
+    async def _stage_batch_filtering(self, search_results):
+        # Use ALL search results, not filtered subset
+        self.promising_files = await self.batch_filter_candidates(search_results)
+        return self.promising_files
+    
+    async def _stage_final_selection(self, promising_files):
+        self.selected_files, self.reasoning_chain = await self.final_selection_with_relationships(promising_files)
+        return self.selected_files, self.reasoning_chain
+    
+    def _stage_patch_generation(self, selection_data):
+        self.generation_result = self.generate_enhanced_patch(selection_data)
+        return self.generation_result
 
-    def batch_filter_candidates(self, search_results):
+    async def batch_filter_candidates(self, search_results):
         """
         Filter search results in batches using LLM reasoning.
         
@@ -352,10 +478,8 @@ class EnhancedTelemetryAgent:
         print(f"🔍 Processing {len(search_results)} search results in {len(batches)} batches of {batch_size}")
         print(f"📊 Using ALL search results (not just high-scoring ones)")
         
-        promising_files = []
-        
-        # Process each batch with LLM reasoning
-        for i, batch in enumerate(batches):
+        async def filter_batch(numbered_batch):
+            i, batch = numbered_batch
             print(f"   Processing batch {i+1}/{len(batches)}...")
             
             # Prepare batch context with telemetry intent
@@ -380,18 +504,33 @@ class EnhancedTelemetryAgent:
             
             # LLM call: Filter this batch for telemetry enhancement potential
             # This is generic for all telemetry types (spans, metrics, logs, custom)
-            batch_promising = self.llm_reasoner.filter_batch_for_telemetry_enhancement(
-                batch_context
-            )
+            return await self.llm_reasoner.afilter_batch_for_telemetry_enhancement(batch_context)
+        
+        # Batch calls share one async client; a sliding window caps how many are in flight and the
+        # token bucket paces them. Outcomes come back in batch order.
+        executor = SlidingWindowExecutor(self.args.llm_concurrency, self.args.item_timeout)
+        started = time.time()
+        outcomes = await executor.map(filter_batch, enumerate(batches))
+        print(f"   {len(batches)} batch calls finished in {time.time() - started:.1f}s "
+              f"(up to {executor.max_concurrency} in flight)")
+        
+        # Merge deterministically: batch order, then search-result order within each batch,
+        # regardless of the order the LLM listed the files in
+        promising_files = []
+        seen = set()
+        for outcome in outcomes:
+            batch_number, batch = outcome.item
+            if not outcome.ok:
+                print(f"     ⚠️  Batch {batch_number+1} failed: {outcome.error}")
+                continue
             
-            # Add promising files from this batch
-            for file_path in batch_promising.selected_files:
-                # Find the original search result to preserve metadata
-                for result in batch:
-                    if str(result.file_path) == file_path:
-                        promising_files.append(result)
-                        print(f"     ✅ Selected: {result.file_path.name} (score: {result.relevance_score})")
-                        break
+            selected = set(outcome.result.selected_files)
+            for result in batch:
+                file_path = str(result.file_path)
+                if file_path in selected and file_path not in seen:
+                    seen.add(file_path)
+                    promising_files.append(result)
+                    print(f"     ✅ Selected: {result.file_path.name} (score: {result.relevance_score})")
         
         print(f" Total promising files from all batches: {len(promising_files)}")
         print(f"Processed {len(search_results)} files, selected {len(promising_files)} ({len(promising_files)/len(search_results)*100:.1f}%)")
@@ -405,7 +544,7 @@ class EnhancedTelemetryAgent:
         
         return promising_files
 
-    def _apply_strategic_llm_filter(self, candidate_files):
+    async def _apply_strategic_llm_filter(self, candidate_files):
         """
         Use LLM to strategically filter candidate files to select the most optimal ones.
         
@@ -469,7 +608,7 @@ REASONING:
 """
 
         try:
-            response = self.llm_reasoner.client.chat.completions.create(
+            response = await self.llm_reasoner.llm.achat_completion(
                 model="o3",
                 messages=[
                     {
@@ -525,7 +664,97 @@ REASONING:
             print("Falling back to top 3 candidate files")
             return candidate_files[:3]
 
-    def final_selection_with_relationships(self, promising_files):
+    def _relationship_group(self, main_file_result, max_related: int = 4):
+        """A promising file plus up to `max_related` existing related files (keeps the batch manageable)."""
+        relationships = self.graph_analyzer.get_file_relationships(
+            main_file_result.file_path,
+            relationship_types=['calls', 'called_by', 'inheritance', 'implements'],
+            max_depth=1
+        )
+        related = []
+        for rel_type, rel_paths in relationships.items():
+            for rel_path_str in rel_paths:
+                if len(related) >= max_related:
+                    break
+                rel_path = Path(rel_path_str)
+                if rel_path.exists():
+                    related.append((rel_path, rel_type))
+        return {'mains': [main_file_result], 'related': related}
+    
+    def _merge_relationship_groups(self, groups, file_sizes: Dict[Path, int]):
+        """
+        Merge overlapping relationship groups into as few evaluation units as the token budget allows.
+        
+        Sibling files of one cluster produce near-identical groups. Two groups overlap when the files
+        they share make up at least --group-overlap of the smaller group; the connected components of
+        that overlap graph are then packed, in original order, into units whose estimated prompt stays
+        within --selection-token-budget. A budget of 0 keeps one unit per group.
+        """
+        def group_files(group):
+            return [result.file_path for result in group['mains']] + [rel_path for rel_path, _ in group['related']]
+        
+        def unit_tokens(paths):
+            return self.llm_reasoner.estimate_final_selection_tokens([file_sizes.get(path, 0) for path in paths])
+        
+        token_budget = self.args.selection_token_budget
+        if token_budget <= 0 or len(groups) < 2:
+            return groups
+        
+        # Connected components over the overlap graph (only groups sharing a file are compared)
+        parent = list(range(len(groups)))
+        
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        file_sets = [set(group_files(group)) for group in groups]
+        groups_by_file = {}
+        for index, files in enumerate(file_sets):
+            for path in files:
+                groups_by_file.setdefault(path, []).append(index)
+        for members in groups_by_file.values():
+            for a in members:
+                for b in members:
+                    if a < b and find(a) != find(b):
+                        shared = len(file_sets[a] & file_sets[b])
+                        if shared / min(len(file_sets[a]), len(file_sets[b])) >= self.args.group_overlap:
+                            parent[find(b)] = find(a)
+        
+        components = {}
+        for index in range(len(groups)):
+            components.setdefault(find(index), []).append(index)
+        
+        # Pack each component into units under the budget (components are ordered by their first group)
+        units = []
+        for members in components.values():
+            unit = None
+            for index in members:
+                group = groups[index]
+                if unit is not None:
+                    merged = self._combine_groups(unit, group)
+                    if unit_tokens(group_files(merged)) <= token_budget:
+                        unit = merged
+                        continue
+                    units.append(unit)
+                unit = group
+            units.append(unit)
+        return units
+    
+    @staticmethod
+    def _combine_groups(unit, group):
+        """Union of two groups: all main files first, then related files not already present."""
+        mains = unit['mains'] + group['mains']
+        seen = {result.file_path for result in mains}
+        related = []
+        for rel_path, rel_type in unit['related'] + group['related']:
+            if rel_path not in seen:
+                seen.add(rel_path)
+                related.append((rel_path, rel_type))
+        return {'mains': mains, 'related': related}
+    
+    async def final_selection_with_relationships(self, promising_files):
             """
             Make final file selection using relationship-aware batch processing.
             
@@ -533,6 +762,12 @@ REASONING:
             as separate batches, allowing focused analysis of related file groups.
             Each batch is analyzed to determine if it can solve the telemetry gap.
             
+            Overlapping groups (siblings sharing related files) are first merged into evaluation
+            units under a token budget, so each cluster costs one LLM call instead of one per file.
+            Units are evaluated concurrently (bounded by --llm-concurrency; --llm-rpm is applied by the LLM gateway) while
+            file contents are prefetched in the background; results are aggregated in the
+            original order, so the selection does not depend on which call finishes first.
+            
             Args:
                 promising_files: Files identified as having telemetry enhancement potential
                 
@@ -544,94 +779,126 @@ REASONING:
             all_selected_files = []
             batch_reasoning = []
             
-            # Process each promising file with its relationships as a separate batch
-            for i, main_file_result in enumerate(promising_files):
-                print(f"Processing relationship batch {i+1}/{len(promising_files)}: {main_file_result.file_path.name}")
+            def build_groups():
+                # Resolve every file's related files up front (bounded graph queries) and size them
+                groups = [self._relationship_group(main_file_result) for main_file_result in promising_files]
+                file_sizes = {}
+                for group in groups:
+                    for path in [result.file_path for result in group['mains']] + [p for p, _ in group['related']]:
+                        if path not in file_sizes:
+                            try:
+                                file_sizes[path] = path.stat().st_size
+                            except OSError:
+                                file_sizes[path] = 0
+                return groups, file_sizes
+            
+            groups, file_sizes = await asyncio.to_thread(build_groups)
+            units = self._merge_relationship_groups(groups, file_sizes)
+            calls_saved = len(groups) - len(units)
+            if calls_saved:
+                print(f"   Merged {len(groups)} overlapping relationship groups into {len(units)} evaluation units "
+                      f"({calls_saved} LLM calls saved)")
+            self.orchestrator.record_stage_metrics("final_selection", {"relationship_batches": {
+                "groups": len(groups),
+                "evaluation_units": len(units),
+                "llm_calls_saved": calls_saved,
+                "token_budget": self.args.selection_token_budget,
+                "overlap_threshold": self.args.group_overlap
+            }})
+            
+            # Prefetch all contents so each file is read once and reading overlaps with the LLM calls
+            contents = {}
+            for path in file_sizes:
+                contents[path] = asyncio.ensure_future(asyncio.to_thread(path.read_text, encoding='utf-8'))
+            
+            async def evaluate_batch(numbered_unit):
+                i, unit = numbered_unit
+                main_names = ", ".join(result.file_path.name for result in unit['mains'])
                 
-                try:
-                    # Read main file content
-                    main_file_content = main_file_result.file_path.read_text(encoding='utf-8')
-                    
-                    # Get relationships for this main file
-                    relationships = self.graph_analyzer.get_file_relationships(
-                        main_file_result.file_path,
-                        relationship_types=['calls', 'called_by', 'inheritance', 'implements'],
-                        max_depth=1  
-                    )
-                    
-                    # Build batch with main file + related files
-                    batch_files = [{
+                # Build batch with main files + related files
+                batch_files = []
+                for main_file_result in unit['mains']:
+                    batch_files.append({
                         'path': main_file_result.file_path,
-                        'content': main_file_content,
+                        'content': await contents[main_file_result.file_path],
                         'search_score': main_file_result.relevance_score,
                         'search_reasoning': main_file_result.reasoning,
                         'search_strategy': main_file_result.strategy.value,
                         'matching_patterns': main_file_result.matching_patterns,
                         'is_main_file': True
-                    }]
-                    
-                    # Add related files to batch (limit to avoid overwhelming LLM)
-                    related_count = 0
-                    max_related = 4  # Keep batch manageable
+                    })
+                unreadable = []
+                for rel_path, rel_type in unit['related']:
+                    try:
+                        rel_content = await contents[rel_path]
+                    except Exception as e:
+                        unreadable.append((rel_path, e))
+                        continue
+                    batch_files.append({
+                        'path': rel_path,
+                        'content': rel_content,
+                        'search_score': 'N/A',
+                        'search_reasoning': f'Related to {main_names} via {rel_type}',
+                        'search_strategy': 'relationship',
+                        'matching_patterns': [],
+                        'is_main_file': False,
+                        'relationship_type': rel_type
+                    })
+                
+                # Analyze this relationship batch with LLM
+                batch_context = {
+                    'main_file': main_names,
+                    'files': batch_files,
+                    'telemetry_intent': self.enhanced_intent
+                }
+                batch_result = await self.llm_reasoner.afinal_telemetry_file_selection(batch_context)
+                return batch_files, unreadable, batch_result
+            
+            executor = SlidingWindowExecutor(self.args.llm_concurrency, self.args.item_timeout)
+            started = time.time()
+            try:
+                outcomes = await executor.map(evaluate_batch, enumerate(units))
+            finally:
+                # Collect reads no batch waited for (e.g. after a failure) so their errors are not lost
+                await asyncio.gather(*contents.values(), return_exceptions=True)
+            print(f"   {len(units)} relationship batches evaluated in {time.time() - started:.1f}s "
+                  f"(up to {executor.max_concurrency} in flight)")
+            
+            for outcome in outcomes:
+                i, unit = outcome.item
+                main_names = ", ".join(result.file_path.name for result in unit['mains'])
+                print(f"Processing relationship batch {i+1}/{len(units)}: {main_names}")
+                
+                if not outcome.ok:
+                    print(f"     ❌ Error processing batch {i+1}: {outcome.error}")
+                    batch_reasoning.append(f"Batch {i+1} ({main_names}): Error - {outcome.error}")
+                    continue
+                
+                batch_files, unreadable, batch_result = outcome.result
+                for rel_path, e in unreadable:
+                    print(f"     ⚠️  Could not read related file {rel_path}: {e}")
+                for file_data in batch_files:
+                    if not file_data['is_main_file']:
+                        print(f" Added related file: {file_data['path'].name} ({file_data['relationship_type']})")
+                main_count = len(unit['mains'])
+                print(f"Batch {i+1}: {len(batch_files)} files ({main_count} main + {len(batch_files) - main_count} related)")
+                
+                # If this batch can solve the telemetry gap, add selected files
+                if batch_result.can_solve_telemetry_gap:
+                    print(f" Batch {i+1} CAN solve telemetry gap - selected {len(batch_result.selected_files)} files")
                     
-                    for rel_type, rel_paths in relationships.items():
-                        if related_count >= max_related:
-                            break
-                            
-                        for rel_path_str in rel_paths:
-                            if related_count >= max_related:
+                    # Find the selected files in our batch and add them
+                    for selected_path in batch_result.selected_files:
+                        for file_data in batch_files:
+                            if str(file_data['path']) == selected_path or file_data['path'].name in selected_path:
+                                all_selected_files.append(file_data)
+                                print(f"       • Selected: {file_data['path'].name}")
                                 break
-                                
-                            try:
-                                rel_path = Path(rel_path_str)
-                                if rel_path.exists():
-                                    rel_content = rel_path.read_text(encoding='utf-8')
-                                    batch_files.append({
-                                        'path': rel_path,
-                                        'content': rel_content,
-                                        'search_score': 'N/A',
-                                        'search_reasoning': f'Related to {main_file_result.file_path.name} via {rel_type}',
-                                        'search_strategy': 'relationship',
-                                        'matching_patterns': [],
-                                        'is_main_file': False,
-                                        'relationship_type': rel_type
-                                    })
-                                    related_count += 1
-                                    print(f" Added related file: {rel_path.name} ({rel_type})")
-                            except Exception as e:
-                                print(f"     ⚠️  Could not read related file {rel_path_str}: {e}")
-                    
-                    print(f"Batch {i+1}: {len(batch_files)} files ({1} main + {related_count} related)")
-                    
-                    # Analyze this relationship batch with LLM
-                    batch_context = {
-                        'main_file': main_file_result.file_path.name,
-                        'files': batch_files,
-                        'telemetry_intent': self.enhanced_intent
-                    }
                     
-                    batch_result = self.llm_reasoner.final_telemetry_file_selection(batch_context)
-                    
-                    # If this batch can solve the telemetry gap, add selected files
-                    if batch_result.can_solve_telemetry_gap:
-                        print(f" Batch {i+1} CAN solve telemetry gap - selected {len(batch_result.selected_files)} files")
-                        
-                        # Find the selected files in our batch and add them
-                        for selected_path in batch_result.selected_files:
-                            for file_data in batch_files:
-                                if str(file_data['path']) == selected_path or file_data['path'].name in selected_path:
-                                    all_selected_files.append(file_data)
-                                    print(f"       • Selected: {file_data['path'].name}")
-                                    break
-                        
-                        batch_reasoning.append(f"Batch {i+1} ({main_file_result.file_path.name}): {batch_result.reasoning}")
-                    else:
-                        print(f"     ⏭️  Batch {i+1} cannot solve telemetry gap - skipping")
-                        batch_reasoning.append(f"Batch {i+1} ({main_file_result.file_path.name}): Cannot solve gap - {batch_result.reasoning}")
-                
-                except Exception as e:
-                    print(f"     ❌ Error processing batch {i+1}: {e}")
-                    batch_reasoning.append(f"Batch {i+1} ({main_file_result.file_path.name}): Error - {e}")
+                    batch_reasoning.append(f"Batch {i+1} ({main_names}): {batch_result.reasoning}")
+                else:
+                    print(f"     ⏭️  Batch {i+1} cannot solve telemetry gap - skipping")
+                    batch_reasoning.append(f"Batch {i+1} ({main_names}): Cannot solve gap - {batch_result.reasoning}")
             
             # Deduplicate selected files (in case multiple batches selected the same file)
             unique_selected_files = []
@@ -645,7 +912,7 @@ REASONING:
             # Apply strategic filtering with LLM if we have multiple files
             if len(unique_selected_files) > 1:
                 print(f"🎯 Applying strategic filtering to {len(unique_selected_files)} candidate files...")
-                strategically_filtered_files = self._apply_strategic_llm_filter(unique_selected_files)
+                strategically_filtered_files = await self._apply_strategic_llm_filter(unique_selected_files)
                 final_files = strategically_filtered_files
             else:
                 print(f"✅ Using single file (no filtering needed)")
@@ -654,7 +921,7 @@ REASONING:
             combined_reasoning = "\n".join(batch_reasoning)
             
             print(f"✅ Relationship-aware selection completed:")
-            print(f"   • Processed {len(promising_files)} relationship batches")
+            print(f"   • Processed {len(units)} relationship batches ({len(promising_files)} promising files)")
             print(f"   • Candidate files: {len(unique_selected_files)}")
             print(f"   • Final strategic selection: {len(final_files)} files")
             
@@ -692,7 +959,8 @@ REASONING:
             basic_intent = {
                 "issue_category": self.enhanced_intent.issue_category,
                 "semantic_description": self.enhanced_intent.semantic_description,
-                "telemetry_operation": self.enhanced_intent.telemetry_operation
+                "telemetry_operation": self.enhanced_intent.telemetry_operation,
+                "search_keywords": self.enhanced_intent.search_keywords
             }
             
             # Force direct strategy per coding instructions
@@ -705,6 +973,13 @@ REASONING:
             diff, explanation, patch_reasoning = self.llm_reasoner.enhanced_patch_generation(
                 basic_intent, selected_files, reasoning_chain, strategy=strategy
             )
+            packed = self.llm_reasoner.last_context_pack
+            if packed is not None:
+                self.orchestrator.record_stage_metrics("patch_generation", {"context_packing": packed.to_report()})
+                if not packed.complete:
+                    report = packed.to_report()
+                    print(f" Packed file contents into ~{report['packed_tokens']:,} tokens "
+                          f"({report['members_omitted']} less relevant sections omitted)")
             
             return {
                 "diff": diff,
@@ -715,7 +990,10 @@ REASONING:
                 "strategy_used": strategy
             }
 
-    async def _stage_report_generation(self) -> None:
+    # ------------------------------------------------------------------
+    # Stage 5: Report generation
+    # ------------------------------------------------------------------
+    def _stage_report_generation(self, generation_result):
         """Stage 5: Generate comprehensive reports."""
         
         def generate_reports(all_data):
@@ -805,26 +1083,14 @@ Found {len(self.search_results)} candidate files, but none were selected for mod
             
             return {"report_type": "comprehensive", "report_length": len(comprehensive_report)}
         
-        report_result = await self.orchestrator.execute_stage(
-            "report_generation",
-            generate_reports,
-            {
-                "intent": self.enhanced_intent,
-                "search_results": self.search_results,
-                "generation_result": self.generation_result
-            },
-            dependencies=["patch_generation"]
-        )
-        
-        if report_result.status == StageStatus.COMPLETED:
-            report_info = report_result.result
-            print(f"📄 Generated {report_info['report_type']} report")
-            print(f"📊 Report saved to {self.output_dir / 'remediation.md'}")
-        else:
-            print(f"⚠️  Report generation failed: {report_result.error}")
-        
-        print(f"\n🎉 Enhanced pipeline completed successfully!")
-        print(f"📁 All outputs saved to: {self.output_dir}")
+        return generate_reports(generation_result)
+
+def parse_prompt_budget(value: str):
+    """OPERATION=TOKENS -> (operation, tokens)."""
+    operation, sep, tokens = value.partition("=")
+    if not sep or not operation or not tokens.isdigit():
+        raise argparse.ArgumentTypeError(f"expected OPERATION=TOKENS, got {value!r}")
+    return operation, int(tokens)
 
 async def main():
     """Enhanced main function with comprehensive argument parsing."""
@@ -873,12 +1139,74 @@ Examples:
                        help="Only build the monorepo graph and exit")
     parser.add_argument("--comprehensive-validation", action='store_true',
                        help="Run comprehensive validation (slower but more thorough)")
-    parser.add_argument("--enable-cache", action='store_true', default=True,
-                       help="Enable caching of intermediate results")
+    parser.add_argument("--enable-cache", action=argparse.BooleanOptionalAction, default=True,
+                       help="Enable caching of intermediate results (disable with --no-enable-cache)")
+    parser.add_argument("--cache-dir",
+                       help="Cache directory shared between runs (default: $TELEMETRY_AGENT_CACHE_DIR or the user cache directory)")
+    parser.add_argument("--cache-max-mb", type=int, default=1024,
+                       help="Disk budget for the cache; least recently used entries are evicted beyond it")
+    parser.add_argument("--cache-ttl-hours", type=float, default=168,
+                       help="Expire cache entries older than this many hours (0 disables expiry)")
+    parser.add_argument("--llm-cache", choices=[mode.value for mode in LLMCacheMode], default="on",
+                       help="Disk cache of LLM responses keyed by model, messages and parameters: on, off, or "
+                            "replay (read-only; uncached prompts fail instead of calling the model)")
+    parser.add_argument("--llm-cache-ttl-hours", type=float, default=168,
+                       help="Expire cached LLM responses older than this many hours (0 disables expiry)")
+    parser.add_argument("--llm-cache-skip", nargs="+", default=[], metavar="OPERATION",
+                       help="Call sites (function names, e.g. enhanced_patch_generation) that always query the model")
+    parser.add_argument("--llm-record", metavar="DIR",
+                       help="Record every LLM request/response pair to DIR as fixtures for the offline "
+                            "stand-in server (python -m scanner.llm_standin --fixtures DIR)")
+    parser.add_argument("--resume", action='store_true',
+                       help="Reuse stage results checkpointed in the output directory by a previous run; "
+                            "only stages whose inputs changed (and their dependents) run again")
+    parser.add_argument("--trace", action=argparse.BooleanOptionalAction, default=True,
+                       help="Record spans for stages, search strategies, LLM calls and Roslyn runs and "
+                            "write trace.otlp.json / trace.chrome.json to the output directory")
+    parser.add_argument("--profile", choices=[mode.value for mode in ProfileMode],
+                       help="Profile every stage: sampled CPU stacks (flame-graph ready), tracemalloc top "
+                            "allocators and peak RSS, reported per stage in pipeline_report.json; "
+                            "stages then run one at a time")
+    parser.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS,
+                       default=os.environ.get(LOG_LEVEL_ENV, "INFO").upper(),
+                       help="Log level for the scanner package (default: $TELEMETRY_AGENT_LOG_LEVEL or INFO)")
+    parser.add_argument("--log-sample", type=int, default=DEFAULT_SAMPLE_SIZE,
+                       help="Per-file debug events of each kind logged before only counts are kept "
+                            "(0 = counts only, -1 = log every event)")
     parser.add_argument("--max-retries", type=int, default=3,
                        help="Maximum number of retries for failed stages")
     parser.add_argument("--parallel-workers", type=int, default=4,
                        help="Number of parallel workers for batch processing")
+    parser.add_argument("--intent-mode", choices=[mode.value for mode in IntentMode], default="sequential",
+                       help="sequential: separate intent, complexity and planning LLM calls; "
+                            "fast: one schema-constrained call returning all three")
+    parser.add_argument("--llm-concurrency", type=int, default=4,
+                       help="Maximum number of LLM calls in flight at once across the run")
+    parser.add_argument("--llm-rpm", type=float, default=0,
+                       help="Token-bucket limit on LLM requests per minute across the run (0 = unlimited)")
+    parser.add_argument("--llm-retries", type=int, default=4,
+                       help="Retries per LLM call on rate limits, server and connection errors (honours Retry-After)")
+    parser.add_argument("--selection-token-budget", type=int, default=6000,
+                       help="Estimated prompt tokens per final-selection call when merging overlapping "
+                            "relationship groups (0 = one call per promising file)")
+    parser.add_argument("--group-overlap", type=float, default=0.5,
+                       help="Share of the smaller relationship group's files two groups must have in common "
+                            "to be merged into one final-selection call")
+    parser.add_argument("--patch-context-tokens", type=int, default=DEFAULT_CONTEXT_TOKENS,
+                       help="Estimated tokens of file content in the patch prompt; larger selections are cut "
+                            "to headers and the most relevant methods (0 = always send whole files)")
+    parser.add_argument("--prompt-budget", nargs="+", default=[], type=parse_prompt_budget, metavar="OPERATION=TOKENS",
+                       help="Prompt token budget of an LLM call site; larger batches are split into concurrent "
+                            f"calls (0 = unlimited). Call sites: {', '.join(DEFAULT_PROMPT_BUDGETS)}")
+    parser.add_argument("--compact-sources", action=argparse.BooleanOptionalAction, default=True,
+                       help="Drop comments, #region markers, common usings and blank-line runs from C# sent to "
+                            "the model (diffs are mapped back to the original lines)")
+    parser.add_argument("--item-timeout", type=float, default=300,
+                       help="Deadline in seconds for each item of a parallel batch (e.g. one LLM batch call)")
+    parser.add_argument("--process-workers", type=int, default=None,
+                       help="Worker processes for CPU-bound stages (default: min(parallel workers, CPU count))")
+    parser.add_argument("--stage-concurrency", type=int, default=4,
+                       help="Maximum number of independent pipeline stages run at the same time")
     
     # Reasoning options
     parser.add_argument("--reasoning-strategy", 
@@ -2,6 +2,7 @@
 Advanced Code Graph Analysis with architectural pattern recognition and dependency analysis.
 """
 import json
+import logging
 import networkx as nx
 from pathlib import Path
 from typing import Dict, List, Set, Tuple, Optional, Any
@@ -9,7 +10,12 @@ from dataclasses import dataclass
 from enum import Enum
 import subprocess
 import tempfile
-from .code_graph_manager import code_graph_manager
+from .code_graph_manager import (
+    code_graph_manager, GraphQueryDirection, REL_INHERITS_FROM, REL_IMPLEMENTS
+)
+from .log_config import EventSampler
+
+logger = logging.getLogger(__name__)
 
 class RelationshipType(Enum):
     INHERITANCE = "inheritance"
@@ -65,23 +71,22 @@ class AdvancedCodeGraphAnalyzer:
         
     def load_and_analyze_graph(self) -> None:
         """Load the code graph and perform advanced analysis."""
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Loading from {self.code_graph_path}")
+        logger.debug("AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Loading from %s", self.code_graph_path)
         self.code_graph_data = code_graph_manager.get_graph_data(self.code_graph_path)
         
         if self.code_graph_data:
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Successfully loaded cached data")
+            logger.debug("AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Successfully loaded cached data")
             # Use cached data from manager
             self.graph = self.code_graph_data.networkx_graph
             self.symbols_by_file = self.code_graph_data.symbols_by_file
             self.call_graph = self.code_graph_data.call_graph
             self.dependency_graph = self.code_graph_data.dependency_graph
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Graph has {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: symbols_by_file has {len(self.symbols_by_file)} files")
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Call graph has {self.call_graph.number_of_nodes()} nodes")
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Dependency graph has {self.dependency_graph.number_of_nodes()} nodes")
+            logger.debug("AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Graph has %s nodes, %s edges", self.graph.number_of_nodes(), self.graph.number_of_edges())
+            logger.debug("AdvancedCodeGraphAnalyzer.load_and_analyze_graph: symbols_by_file has %s files", len(self.symbols_by_file))
+            logger.debug("AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Call graph has %s nodes", self.call_graph.number_of_nodes())
+            logger.debug("AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Dependency graph has %s nodes", self.dependency_graph.number_of_nodes())
         else:
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.load_and_analyze_graph: Warning: Could not load code graph from {self.code_graph_path}")
-            print(f"Warning: Could not load code graph from {self.code_graph_path}")
+            logger.warning("Could not load code graph from %s", self.code_graph_path)
             # Initialize empty structures
             self.graph = nx.DiGraph()
             self.symbols_by_file = {}
@@ -113,7 +118,7 @@ class AdvancedCodeGraphAnalyzer:
     
     def analyze_telemetry_patterns(self, files: List[Path]) -> Dict[str, Any]:
         """Analyze existing telemetry patterns to guide implementation strategy."""
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Analyzing {len(files)} files for telemetry patterns")
+        logger.debug("AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Analyzing %s files for telemetry patterns", len(files))
         
         telemetry_analysis = {
             "existing_enrichment_files": [],
@@ -122,25 +127,27 @@ class AdvancedCodeGraphAnalyzer:
             "extend_files": []
         }
         
+        events = EventSampler(logger, "AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns")
         for file_path in files:
             file_str = str(file_path)
             file_symbols = self.symbols_by_file.get(file_str, [])
             
             if self._is_existing_telemetry_enrichment_pattern(file_symbols, file_str):
                 telemetry_analysis["existing_enrichment_files"].append(file_str)
-                print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Found existing enrichment in {file_str}")
+                events.log("existing_enrichment", "AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Found existing enrichment in %s", file_str)
             
             if self._is_semantic_conventions_pattern(file_symbols, file_str):
                 telemetry_analysis["semantic_convention_files"].append(file_str)
-                print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Found semantic conventions in {file_str}")
+                events.log("semantic_conventions", "AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Found semantic conventions in %s", file_str)
+        events.summary()
         
         # Determine implementation strategy
         if telemetry_analysis["existing_enrichment_files"]:
             telemetry_analysis["implementation_strategy"] = "extend_existing"
             telemetry_analysis["extend_files"] = telemetry_analysis["existing_enrichment_files"]
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Strategy: extend_existing")
+            logger.debug("AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Strategy: extend_existing")
         else:
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Strategy: create_new")
+            logger.debug("AdvancedCodeGraphAnalyzer.analyze_telemetry_patterns: Strategy: create_new")
         
         return telemetry_analysis
     
@@ -183,10 +190,7 @@ class AdvancedCodeGraphAnalyzer:
     
     def _is_existing_telemetry_enrichment_pattern(self, symbols: List[Dict], file_path: str) -> bool:
         """Detect if this file already has telemetry enrichment that should be extended."""
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer._is_existing_telemetry_enrichment_pattern: Checking {file_path}")
-        
         symbol_names = [s.get("FullName", "") for s in symbols]
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer._is_existing_telemetry_enrichment_pattern: Found {len(symbol_names)} symbols")
         
         # Look for existing telemetry calls (various frameworks)
         existing_telemetry_calls = any(
@@ -220,15 +224,10 @@ class AdvancedCodeGraphAnalyzer:
         ])
         
         # Prioritize enrichment patterns, but recognize all telemetry infrastructure
-        result = (has_enrichment_patterns or existing_telemetry_calls) and (has_telemetry_patterns or telemetry_file_indicators)
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer._is_existing_telemetry_enrichment_pattern: existing_calls={existing_telemetry_calls}, enrichment_patterns={has_enrichment_patterns}, telemetry_patterns={has_telemetry_patterns}, file_indicators={telemetry_file_indicators}, result={result}")
-        
-        return result
+        return (has_enrichment_patterns or existing_telemetry_calls) and (has_telemetry_patterns or telemetry_file_indicators)
     
     def _is_semantic_conventions_pattern(self, symbols: List[Dict], file_path: str) -> bool:
         """Detect if this file contains semantic conventions or constants that should be extended."""
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer._is_semantic_conventions_pattern: Checking {file_path}")
-        
         # Check file name patterns
         file_name = file_path.lower()
         is_conventions_file = any(term in file_name for term in [
@@ -249,21 +248,18 @@ class AdvancedCodeGraphAnalyzer:
             for name in symbol_names
         )
         
-        result = is_conventions_file and (has_constants or has_http_constants)
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer._is_semantic_conventions_pattern: conventions_file={is_conventions_file}, has_constants={has_constants}, http_constants={has_http_constants}, result={result}")
-        
-        return result
+        return is_conventions_file and (has_constants or has_http_constants)
     
     def analyze_impact(self, seed_files: List[Path], intent: Dict) -> ImpactAnalysis:
         """Perform comprehensive impact analysis."""
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Analyzing impact for {len(seed_files)} seed files")
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Seed files: {[str(f) for f in seed_files]}")
+        logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Analyzing impact for %s seed files", len(seed_files))
+        logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Seed files: %s", [str(f) for f in seed_files])
         
         if not self.dependency_graph:
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: No dependency graph available, returning empty analysis")
+            logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: No dependency graph available, returning empty analysis")
             return ImpactAnalysis([], [], 0, [], [], [])
         
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Dependency graph has {self.dependency_graph.number_of_nodes()} nodes")
+        logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Dependency graph has %s nodes", self.dependency_graph.number_of_nodes())
         
         direct_impact = set(str(f) for f in seed_files)
         indirect_impact = set()
@@ -271,30 +267,30 @@ class AdvancedCodeGraphAnalyzer:
         # Find all files that depend on seed files
         for seed_file in seed_files:
             seed_str = str(seed_file)
-            print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Processing seed file: {seed_str}")
+            logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Processing seed file: %s", seed_str)
             if seed_str in self.dependency_graph:
-                print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Seed file found in dependency graph")
+                logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Seed file found in dependency graph")
                 # Find predecessors (files that depend on this file)
                 predecessors = set(self.dependency_graph.predecessors(seed_str))
-                print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Found {len(predecessors)} predecessors")
+                logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Found %s predecessors", len(predecessors))
                 indirect_impact.update(predecessors)
                 
                 # Find successors (files this file depends on)
                 successors = set(self.dependency_graph.successors(seed_str))
-                print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Found {len(successors)} successors")
+                logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Found %s successors", len(successors))
                 indirect_impact.update(successors)
             else:
-                print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Seed file NOT found in dependency graph")
+                logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Seed file NOT found in dependency graph")
         
         # Remove direct impact from indirect impact
         indirect_impact -= direct_impact
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Direct impact: {len(direct_impact)} files, Indirect impact: {len(indirect_impact)} files")
+        logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Direct impact: %s files, Indirect impact: %s files", len(direct_impact), len(indirect_impact))
         
         # Calculate risk score based on various factors
         risk_score = self._calculate_risk_score(
             len(direct_impact), len(indirect_impact), intent
         )
-        print(f"[DEBUG] AdvancedCodeGraphAnalyzer.analyze_impact: Calculated risk score: {risk_score}")
+        logger.debug("AdvancedCodeGraphAnalyzer.analyze_impact: Calculated risk score: %s", risk_score)
         
         # Identify affected architectural patterns
         all_affected_files = [Path(f) for f in direct_impact | indirect_impact]
@@ -480,14 +476,27 @@ class AdvancedCodeGraphAnalyzer:
             if any(pattern in str(f).lower() for pattern in config_patterns)
         ]
     
-    def get_file_relationships(self, file_path: Path, relationship_types: List[str] = None, max_depth: int = 1) -> Dict[str, List[str]]:
+    # relationship type -> (query direction, relationship kinds override)
+    _FILE_RELATIONSHIP_QUERIES = {
+        'calls': (GraphQueryDirection.CALLEES, None),
+        'called_by': (GraphQueryDirection.CALLERS, None),
+        'dependencies': (GraphQueryDirection.DEPENDENCIES, None),
+        'inheritance': (GraphQueryDirection.BASE_TYPES, [REL_INHERITS_FROM]),
+        'implements': (GraphQueryDirection.BASE_TYPES, [REL_IMPLEMENTS]),
+        'implementors': (GraphQueryDirection.IMPLEMENTORS, None),
+    }
+
+    def get_file_relationships(self, file_path: Path, relationship_types: List[str] = None, max_depth: int = 1,
+                               max_results_per_type: int = 5) -> Dict[str, List[str]]:
         """
         Get relationships for a specific file from the code graph.
         
         Args:
             file_path: The file to analyze relationships for
-            relationship_types: Types of relationships to include ['calls', 'called_by', 'dependencies', 'inheritance']
-            max_depth: How deep to traverse relationships (currently only depth 1 supported)
+            relationship_types: Types of relationships to include
+                ['calls', 'called_by', 'dependencies', 'inheritance', 'implements', 'implementors']
+            max_depth: How many hops to traverse for each relationship type
+            max_results_per_type: Cap on related files per type, nearest first
             
         Returns:
             Dict with relationship types as keys and lists of related file paths as values
@@ -498,54 +507,29 @@ class AdvancedCodeGraphAnalyzer:
         relationships = {}
         file_str = str(file_path)
         
-        print(f"[DEBUG] get_file_relationships: Analyzing {file_str}")
-        print(f"[DEBUG] get_file_relationships: Call graph has {self.call_graph.number_of_nodes() if self.call_graph else 0} nodes")
-        print(f"[DEBUG] get_file_relationships: Dependency graph has {self.dependency_graph.number_of_nodes() if self.dependency_graph else 0} nodes")
-        
         # Initialize empty lists for all requested relationship types
         for rel_type in relationship_types:
             relationships[rel_type] = []
         
-        if not self.call_graph or not self.dependency_graph:
-            print(f"[DEBUG] get_file_relationships: No graphs available, returning empty relationships")
+        if not self.code_graph_data:
+            logger.debug("get_file_relationships: No graphs available, returning empty relationships")
             return relationships
         
-        # Get direct calls (what this file calls)
-        if 'calls' in relationship_types and file_str in self.call_graph:
-            calls = []
-            for target in self.call_graph.successors(file_str):
-                calls.append(target)
-            relationships['calls'] = calls[:5]  # Limit to avoid overwhelming context
-            print(f"[DEBUG] get_file_relationships: Found {len(calls)} calls, limited to {len(relationships['calls'])}")
-        
-        # Get called_by (what calls this file)  
-        if 'called_by' in relationship_types and file_str in self.call_graph:
-            called_by = []
-            for source in self.call_graph.predecessors(file_str):
-                called_by.append(source)
-            relationships['called_by'] = called_by[:5]  # Limit to avoid overwhelming context
-            print(f"[DEBUG] get_file_relationships: Found {len(called_by)} called_by, limited to {len(relationships['called_by'])}")
-        
-        # Add dependency relationships if requested
-        if 'dependencies' in relationship_types and file_str in self.dependency_graph:
-            deps = []
-            for target in self.dependency_graph.successors(file_str):
-                deps.append(target)
-            relationships['dependencies'] = deps[:5]  # Limit to avoid overwhelming context
-            print(f"[DEBUG] get_file_relationships: Found {len(deps)} dependencies, limited to {len(relationships['dependencies'])}")
-        
-        # Add inheritance relationships if requested
-        if 'inheritance' in relationship_types:
-            # For inheritance, we'd need to analyze the symbols, this is a simplified version
-            inheritance = []
-            file_symbols = self.symbols_by_file.get(file_str, [])
-            for symbol in file_symbols:
-                if symbol.get('kind') == 'class' and 'base_types' in symbol:
-                    # This would require more sophisticated analysis
-                    pass
-            relationships['inheritance'] = inheritance
-        
-        total_related = sum(len(rel_list) for rel_list in relationships.values())
-        print(f"[DEBUG] get_file_relationships: Total relationships found: {total_related}")
+        # Each type is a bounded k-hop query over the symbol adjacency indexes,
+        # so the cost depends on the file's neighbourhood rather than the graph size
+        for rel_type in relationship_types:
+            if rel_type not in self._FILE_RELATIONSHIP_QUERIES:
+                continue
+            direction, kinds = self._FILE_RELATIONSHIP_QUERIES[rel_type]
+            related = self.code_graph_data.query_files(
+                [file_str], direction, max_depth=max_depth,
+                max_results=max_results_per_type, kinds=kinds
+            )
+            relationships[rel_type] = list(related)
+        
+        # Called once per candidate file: a single line, built only when enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("get_file_relationships: %s -> %s", file_str,
+                         {rel_type: len(rel_list) for rel_type, rel_list in relationships.items()})
         
         return relationships
@@ -1,13 +1,29 @@
 """
 Advanced LLM Reasoning System with Chain-of-Thought, validation, and self-correction.
 """
+import asyncio
 import json
-import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from openai import AzureOpenAI
+from .context_packer import DEFAULT_CONTEXT_TOKENS, ContextPacker
+from .llm_gateway import get_llm_gateway
+from .source_compactor import compact_source, record_prompt_compaction
+from .token_counter import get_token_counter, prompt_budget, split_for_prompt
+
+logger = logging.getLogger(__name__)
+
+# Ranks for merging the answers of a final-selection batch that was split to fit its budget
+STRATEGIC_VALUE_RANK = ["SKIP", "TACTICAL", "STRATEGIC", "MOST_STRATEGIC"]
+FINAL_DECISION_RANK = ["SKIP", "SELECT_AS_FALLBACK", "SELECT_AS_PRIMARY"]
+
+# Final-selection prompts show a preview of each file, so their size is bounded per file
+FINAL_SELECTION_PREVIEW_CHARS = 800
+FINAL_SELECTION_FILE_OVERHEAD_CHARS = 250
+FINAL_SELECTION_BASE_TOKENS = 1000
 
 def safe_json_dumps(obj, **kwargs):
     """Safely serialize objects to JSON, handling complex types."""
@@ -51,12 +67,12 @@ class ReasoningChain:
 class AdvancedLLMReasoner:
     """Advanced LLM reasoning system with chain-of-thought and validation."""
     
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=os.environ.get("AZURE_OPENAI_API_KEY"),
-            api_version="2024-12-01-preview", 
-            azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT")
-        )
+    def __init__(self, context_tokens: int = DEFAULT_CONTEXT_TOKENS):
+        # Pooled clients, global limits and retries are shared with every other LLM caller
+        self.llm = get_llm_gateway()
+        # Token budget for the file contents of the patch prompt (0 = always send whole files)
+        self.context_packer = ContextPacker(context_tokens)
+        self.last_context_pack = None
         
     def analyze_with_chain_of_thought(self, 
                                     task: str,
@@ -103,7 +119,7 @@ Only select files that are directly relevant to the telemetry requirement.
 Be thorough and systematic, but prefer simplicity over complexity."""
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat_completion(
                 model="o3",
                 messages=[
                     {"role": "system", "content": "You are an expert software engineer specializing in telemetry implementation."},
@@ -161,6 +177,12 @@ Be thorough and systematic, but prefer simplicity over complexity."""
         rel_files = {_rel(f["path"]): f["content"] for f in selected_files}
         allowed_paths = list(rel_files.keys())
 
+        # Fit the files into the context budget: whole if they fit, else headers plus the most
+        # relevant members. The reasoning pass only gets an outline, so code is sent once.
+        main_paths = [_rel(f["path"]) for f in selected_files if f.get("is_main_file")]
+        packed = self.context_packer.pack(rel_files, intent, main_paths=main_paths)
+        self.last_context_pack = packed
+
         # 2) Decide strategy
         if strategy == "auto":
             strategy_directive = self._get_ai_strategy_decision(intent, selected_files)
@@ -177,7 +199,7 @@ Be thorough and systematic, but prefer simplicity over complexity."""
             
         context = {
             "intent": intent,
-            "files": rel_files,              # repo-relative path -> content
+            "files": packed.outline(),       # repo-relative path -> declarations and telemetry call sites
             "allowed_paths": allowed_paths,  # ONLY these may be edited
             "previous_reasoning": previous_reasoning,
         }
@@ -187,8 +209,14 @@ Be thorough and systematic, but prefer simplicity over complexity."""
             strategy=ReasoningStrategy.CHAIN_OF_THOUGHT,
         )
 
-        # Generate the actual patch
-        patch_prompt = f"""
+        def patch_messages(packed):
+            files_note = "" if packed.complete else (
+                "; code outside the budget is replaced by '... lines A-B omitted ...' markers."
+                " Do not edit omitted lines, and number hunks by the original line numbers"
+            )
+
+            # Generate the actual patch
+            patch_prompt = f"""
 You are to generate a precise, *applicable* unified diff that implements the telemetry changes.
 
 STRATEGY DIRECTIVE:
@@ -197,8 +225,8 @@ STRATEGY DIRECTIVE:
 REASONING PLAN (high level):
 {patch_reasoning.final_conclusion}
 
-FILES (repo-relative path → content):
-{safe_json_dumps(rel_files, indent=2)}
+FILES (repo-relative path → content{files_note}):
+{safe_json_dumps(packed.files, indent=2)}
 
 ALLOWED_PATHS (you may edit ONLY these):
 {safe_json_dumps(allowed_paths, indent=2)}
@@ -252,22 +280,32 @@ Prefer inline attribute additions over architectural changes.
 
 If an enrichment hook already exists, add attributes there instead of duplicating logic.
 """
-
-        # Estimate token count for debugging (rough estimate: 1 token = 4 chars)
-        total_chars = len(patch_prompt)
-        estimated_tokens = total_chars // 4
-        print(f"Debug: Patch prompt is ~{estimated_tokens:,} tokens ({total_chars:,} chars)")
-            
-        if estimated_tokens > 180000:  # Conservative limit below 200K
-            print(f"Warning: Prompt may exceed token limit. Consider reducing file selection.")
+            return [
+                {"role": "system", "content": "You are an expert software engineer specializing in telemetry and observability implementation."},
+                {"role": "user", "content": patch_prompt}
+            ]
+
+        # One diff needs every file in one prompt, so an oversized prompt is packed tighter rather than split
+        messages = patch_messages(packed)
+        budget = prompt_budget("enhanced_patch_generation")
+        prompt_tokens = get_token_counter().count_messages(messages)
+        if budget > 0 and prompt_tokens > budget:
+            context_budget = max(1, packed.tokens - (prompt_tokens - budget))
+            logger.info("Patch prompt is %s tokens, over its %s-token budget; packing the files into %s tokens",
+                        prompt_tokens, budget, context_budget)
+            packed = self.context_packer.pack(rel_files, intent, main_paths=main_paths, token_budget=context_budget)
+            self.last_context_pack = packed
+            messages = patch_messages(packed)
+            prompt_tokens = get_token_counter().count_messages(messages)
+            if prompt_tokens > budget:
+                logger.warning("Patch prompt is still %s tokens (budget %s): the file headers alone exceed it",
+                               prompt_tokens, budget)
+        logger.debug("Patch prompt is %s tokens", format(prompt_tokens, ','))
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat_completion(
                 model="o3",
-                messages=[
-                    {"role": "system", "content": "You are an expert software engineer specializing in telemetry and observability implementation."},
-                    {"role": "user", "content": patch_prompt}
-                ]
+                messages=messages
             )
             
             patch_content = response.choices[0].message.content
@@ -438,7 +476,7 @@ REASONING: [Your explanation]
 """
         
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat_completion(
                 model="o3",
                 messages=[
                     {"role": "system", "content": "You are an expert software architect making strategic decisions about code modification approaches."},
@@ -533,6 +571,41 @@ var activity = source.StartActivityWithContext("operation");
         Returns:
             Object with selected_files list containing paths of promising files
         """
+        parts = self._split_batch("filter_batch_for_telemetry_enhancement", batch_context, self._batch_filter_messages)
+        if len(parts) > 1:
+            with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+                results = list(pool.map(self.filter_batch_for_telemetry_enhancement, parts))
+            return self._merge_batch_filter_results(batch_context, results)
+        try:
+            response = self.llm.chat_completion(
+                model="o3",
+                messages=self._batch_filter_messages(batch_context)
+            )
+            return self._parse_batch_filter_response(batch_context, response.choices[0].message.content)
+        except Exception as e:
+            logger.error("Error in batch filtering: %s", e)
+            return self._batch_filter_fallback(batch_context, e)
+    
+    async def afilter_batch_for_telemetry_enhancement(self, batch_context):
+        """
+        Async variant of filter_batch_for_telemetry_enhancement on the shared async client, so
+        many batches can be in flight at once over one connection pool.
+        """
+        parts = self._split_batch("filter_batch_for_telemetry_enhancement", batch_context, self._batch_filter_messages)
+        if len(parts) > 1:
+            results = await asyncio.gather(*(self.afilter_batch_for_telemetry_enhancement(part) for part in parts))
+            return self._merge_batch_filter_results(batch_context, results)
+        try:
+            response = await self.llm.achat_completion(
+                model="o3",
+                messages=self._batch_filter_messages(batch_context)
+            )
+            return self._parse_batch_filter_response(batch_context, response.choices[0].message.content)
+        except Exception as e:
+            logger.error("Error in batch filtering: %s", e)
+            return self._batch_filter_fallback(batch_context, e)
+    
+    def _batch_filter_messages(self, batch_context) -> List[Dict[str, str]]:
         prompt = f"""
     You are analyzing files for telemetry enhancement opportunities. Given this telemetry requirement:
 
@@ -566,44 +639,73 @@ var activity = source.StartActivityWithContext("operation");
     /path/to/PaymentProcessor.cs
     """
 
-        try:
-            response = self.client.chat.completions.create(
-                model="o3",
-                messages=[
-                    {"role": "system", "content": "You are an expert in telemetry and observability. You understand different telemetry types (spans, metrics, logs) and can identify files where direct instrumentation can be added."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            response_text = response.choices[0].message.content.strip()
-            
-            # Parse file paths from response
-            selected_files = []
-            for line in response_text.split('\n'):
-                line = line.strip()
-                if line and not line.startswith('#') and not line.startswith('//'):
-                    # Extract just the path part (in case LLM adds explanations)
-                    if ' ' in line:
-                        line = line.split(' ')[0]
-                    selected_files.append(line)
-            
-            return type('BatchFilterResult', (), {
-                'selected_files': selected_files,
-                'reasoning': response_text,
-                'total_evaluated': len(batch_context['files']),
-                'selected_count': len(selected_files)
-            })()
-            
-        except Exception as e:
-            print(f"Error in batch filtering: {e}")
-            # Fallback: return all files if LLM fails
-            return type('BatchFilterResult', (), {
-                'selected_files': [file_info['path'] for file_info in batch_context['files']],
-                'reasoning': f"Error occurred: {e}. Returned all files as fallback.",
-                'total_evaluated': len(batch_context['files']),
-                'selected_count': len(batch_context['files'])
-            })()
-
+        return [
+            {"role": "system", "content": "You are an expert in telemetry and observability. You understand different telemetry types (spans, metrics, logs) and can identify files where direct instrumentation can be added."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _parse_batch_filter_response(self, batch_context, response_text: str):
+        response_text = (response_text or "").strip()
+        
+        # Parse file paths from response
+        selected_files = []
+        for line in response_text.split('\n'):
+            line = line.strip()
+            if line and not line.startswith('#') and not line.startswith('//'):
+                # Extract just the path part (in case LLM adds explanations)
+                if ' ' in line:
+                    line = line.split(' ')[0]
+                selected_files.append(line)
+        
+        return type('BatchFilterResult', (), {
+            'selected_files': selected_files,
+            'reasoning': response_text,
+            'total_evaluated': len(batch_context['files']),
+            'selected_count': len(selected_files)
+        })()
+    
+    def _merge_batch_filter_results(self, batch_context, results):
+        selected_files = list(dict.fromkeys(path for result in results for path in result.selected_files))
+        return type('BatchFilterResult', (), {
+            'selected_files': selected_files,
+            'reasoning': "\n\n".join(result.reasoning for result in results),
+            'total_evaluated': len(batch_context['files']),
+            'selected_count': len(selected_files)
+        })()
+    
+    def _batch_filter_fallback(self, batch_context, error: Exception):
+        # Fallback: return all files if LLM fails
+        return type('BatchFilterResult', (), {
+            'selected_files': [file_info['path'] for file_info in batch_context['files']],
+            'reasoning': f"Error occurred: {error}. Returned all files as fallback.",
+            'total_evaluated': len(batch_context['files']),
+            'selected_count': len(batch_context['files'])
+        })()
+
+    @staticmethod
+    def _split_batch(operation: str, batch_context, build_messages, pinned=None) -> List[Dict]:
+        """`[batch_context]` if its prompt fits the call site's token budget, else copies of it
+        with the files split into parts that each fit. Files for which `pinned(file)` is true
+        (e.g. the main file the others relate to) go into every part."""
+        kept = [f for f in batch_context['files'] if pinned and pinned(f)]
+        rest = [f for f in batch_context['files'] if not (pinned and pinned(f))]
+        parts = split_for_prompt(operation, rest,
+                                 lambda files: build_messages(dict(batch_context, files=kept + list(files))))
+        if len(parts) == 1:
+            return [batch_context]
+        return [dict(batch_context, files=kept + files) for files in parts]
+    
+    @staticmethod
+    def _is_main_file(batch_context, file_data) -> bool:
+        # Merged groups have several main files; `main_file` then lists all of them
+        return file_data.get('is_main_file', file_data['path'].name == batch_context['main_file'])
+    
+    @staticmethod
+    def estimate_final_selection_tokens(file_sizes: List[int]) -> int:
+        """Rough prompt size (1 token = 4 chars) of a final-selection batch whose files have these sizes in chars."""
+        chars = sum(min(size, FINAL_SELECTION_PREVIEW_CHARS) + FINAL_SELECTION_FILE_OVERHEAD_CHARS for size in file_sizes)
+        return FINAL_SELECTION_BASE_TOKENS + chars // 4
+    
     def final_telemetry_file_selection(self, batch_context):
         """
         Analyze a single file and its relationships to determine if the telemetry gap can be solved.
@@ -618,18 +720,67 @@ var activity = source.StartActivityWithContext("operation");
         Returns:
             Object with can_solve_telemetry_gap boolean and selected_files list
         """
+        # Related files are judged by how they relate to the main file, so every part keeps it
+        parts = self._split_batch("final_telemetry_file_selection", batch_context, self._final_selection_messages,
+                                  pinned=lambda file_data: self._is_main_file(batch_context, file_data))
+        if len(parts) > 1:
+            with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+                results = list(pool.map(self.final_telemetry_file_selection, parts))
+            return self._merge_final_selection_results(batch_context, results)
+        try:
+            messages = self._final_selection_messages(batch_context)
+            self._record_preview_compaction(batch_context)
+            response = self.llm.chat_completion(
+                model="o3",
+                messages=messages
+            )
+            return self._parse_final_selection_response(batch_context, response.choices[0].message.content)
+        except Exception as e:
+            logger.error("Error in relationship batch analysis: %s", e)
+            return self._final_selection_fallback(batch_context, e)
+    
+    async def afinal_telemetry_file_selection(self, batch_context):
+        """Async variant of final_telemetry_file_selection on the shared async client."""
+        # Related files are judged by how they relate to the main file, so every part keeps it
+        parts = self._split_batch("final_telemetry_file_selection", batch_context, self._final_selection_messages,
+                                  pinned=lambda file_data: self._is_main_file(batch_context, file_data))
+        if len(parts) > 1:
+            results = await asyncio.gather(*(self.afinal_telemetry_file_selection(part) for part in parts))
+            return self._merge_final_selection_results(batch_context, results)
+        try:
+            messages = self._final_selection_messages(batch_context)
+            self._record_preview_compaction(batch_context)
+            response = await self.llm.achat_completion(
+                model="o3",
+                messages=messages
+            )
+            return self._parse_final_selection_response(batch_context, response.choices[0].message.content)
+        except Exception as e:
+            logger.error("Error in relationship batch analysis: %s", e)
+            return self._final_selection_fallback(batch_context, e)
+    
+    @staticmethod
+    def _record_preview_compaction(batch_context) -> None:
+        # Counted when the prompt is sent, not each time it is built to measure a batch
+        for file_data in batch_context['files']:
+            record_prompt_compaction(compact_source(file_data['content'], file_data['path'].name),
+                                     FINAL_SELECTION_PREVIEW_CHARS)
+    
+    def _final_selection_messages(self, batch_context) -> List[Dict[str, str]]:
         # Prepare files summary for this batch
         main_file_name = batch_context['main_file']
         files_summary = []
         
         for i, file_data in enumerate(batch_context['files']):
-            is_main = file_data['path'].name == main_file_name
+            is_main = self._is_main_file(batch_context, file_data)
             relationship_indicator = "🎯 MAIN FILE" if is_main else "🔗 Related"
+            # Without comments and boilerplate the preview shows more of the actual code
+            preview = compact_source(file_data['content'], file_data['path'].name).text[:FINAL_SELECTION_PREVIEW_CHARS]
             
             file_summary = f"""
     {relationship_indicator}: {file_data['path'].name}
     - Search Score: {file_data.get('search_score', 'N/A')}
-    - Content Preview: {file_data['content'][:800]}...
+    - Content Preview: {preview}...
     - Relationship: {'Primary candidate' if is_main else 'Called by or calls main file'}"""
             files_summary.append(file_summary)
         
@@ -690,81 +841,96 @@ var activity = source.StartActivityWithContext("operation");
     [Explain your analysis: can this solve the gap, how strategic it is, and your final decision. If you identify a central utility that other files call, mark it as MOST_STRATEGIC.]
     """
 
-        try:
-            response = self.client.chat.completions.create(
-                model="o3",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a senior telemetry engineer specialized in relationship-aware code analysis. You excel at understanding how files work together and determining whether a group of related files can implement specific telemetry requirements. You focus on direct instrumentation opportunities and avoid unnecessary modifications."
-                    },
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            response_text = response.choices[0].message.content.strip()
+        return [
+            {
+                "role": "system", 
+                "content": "You are a senior telemetry engineer specialized in relationship-aware code analysis. You excel at understanding how files work together and determining whether a group of related files can implement specific telemetry requirements. You focus on direct instrumentation opportunities and avoid unnecessary modifications."
+            },
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _parse_final_selection_response(self, batch_context, response_text: str):
+        response_text = (response_text or "").strip()
+        main_file_name = batch_context['main_file']
+        
+        # Parse response
+        can_solve_gap = False
+        strategic_value = "SKIP"
+        final_decision = "SKIP"
+        selected_files = []
+        reasoning = ""
+        
+        if "CAN_SOLVE_GAP:" in response_text:
+            lines = response_text.split('\n')
             
-            # Parse response
-            can_solve_gap = False
-            strategic_value = "SKIP"
-            final_decision = "SKIP"
-            selected_files = []
-            reasoning = ""
+            for line in lines:
+                line = line.strip()
+                if line.startswith("CAN_SOLVE_GAP:"):
+                    can_solve_gap = "YES" in line.upper()
+                elif line.startswith("STRATEGIC_VALUE:"):
+                    strategic_value = line.split(":", 1)[1].strip()
+                elif line.startswith("FINAL_DECISION:"):
+                    final_decision = line.split(":", 1)[1].strip()
+                elif line.startswith("REASONING:"):
+                    # Find reasoning section
+                    reasoning_start = response_text.find("REASONING:")
+                    if reasoning_start != -1:
+                        reasoning = response_text[reasoning_start + 10:].strip()
             
-            if "CAN_SOLVE_GAP:" in response_text:
-                lines = response_text.split('\n')
-                
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith("CAN_SOLVE_GAP:"):
-                        can_solve_gap = "YES" in line.upper()
-                    elif line.startswith("STRATEGIC_VALUE:"):
-                        strategic_value = line.split(":", 1)[1].strip()
-                    elif line.startswith("FINAL_DECISION:"):
-                        final_decision = line.split(":", 1)[1].strip()
-                    elif line.startswith("REASONING:"):
-                        # Find reasoning section
-                        reasoning_start = response_text.find("REASONING:")
-                        if reasoning_start != -1:
-                            reasoning = response_text[reasoning_start + 10:].strip()
+            # Extract selected files if decision is to select
+            if final_decision in ["SELECT_AS_PRIMARY", "SELECT_AS_FALLBACK"] and "SELECTED_FILES:" in response_text:
+                files_start = response_text.find("SELECTED_FILES:")
+                reasoning_start = response_text.find("REASONING:")
                 
-                # Extract selected files if decision is to select
-                if final_decision in ["SELECT_AS_PRIMARY", "SELECT_AS_FALLBACK"] and "SELECTED_FILES:" in response_text:
-                    files_start = response_text.find("SELECTED_FILES:")
-                    reasoning_start = response_text.find("REASONING:")
+                if files_start != -1:
+                    files_end = reasoning_start if reasoning_start != -1 else len(response_text)
+                    files_section = response_text[files_start + 15:files_end].strip()
                     
-                    if files_start != -1:
-                        files_end = reasoning_start if reasoning_start != -1 else len(response_text)
-                        files_section = response_text[files_start + 15:files_end].strip()
-                        
-                        for line in files_section.split('\n'):
-                            line = line.strip()
-                            if line and not line.startswith('#') and '/' in line:
-                                selected_files.append(line)
-            
-            return type('RelationshipBatchResult', (), {
-                'can_solve_telemetry_gap': can_solve_gap,
-                'strategic_value': strategic_value,
-                'final_decision': final_decision,
-                'selected_files': selected_files,
-                'reasoning': reasoning,
-                'main_file': main_file_name,
-                'total_files_analyzed': len(batch_context['files']),
-                'raw_response': response_text
-            })()
-            
-        except Exception as e:
-            print(f"Error in relationship batch analysis: {e}")
-            # Fallback: assume this batch cannot solve the gap
-            return type('RelationshipBatchResult', (), {
-                'can_solve_telemetry_gap': False,
-                'selected_files': [],
-                'reasoning': f"Error occurred during analysis: {e}",
-                'main_file': main_file_name,
-                'total_files_analyzed': len(batch_context.get('files', [])),
-                'raw_response': str(e)
-            })()
-
+                    for line in files_section.split('\n'):
+                        line = line.strip()
+                        if line and not line.startswith('#') and '/' in line:
+                            selected_files.append(line)
+        
+        return type('RelationshipBatchResult', (), {
+            'can_solve_telemetry_gap': can_solve_gap,
+            'strategic_value': strategic_value,
+            'final_decision': final_decision,
+            'selected_files': selected_files,
+            'reasoning': reasoning,
+            'main_file': main_file_name,
+            'total_files_analyzed': len(batch_context['files']),
+            'raw_response': response_text
+        })()
+    
+    def _merge_final_selection_results(self, batch_context, results):
+        """One answer for a group evaluated in parts: it can solve the gap if any part can, with the
+        most strategic value and decision any part reached."""
+        strategic_value = max((getattr(result, 'strategic_value', "SKIP") for result in results),
+                              key=lambda value: STRATEGIC_VALUE_RANK.index(value) if value in STRATEGIC_VALUE_RANK else 0)
+        final_decision = max((getattr(result, 'final_decision', "SKIP") for result in results),
+                             key=lambda value: FINAL_DECISION_RANK.index(value) if value in FINAL_DECISION_RANK else 0)
+        return type('RelationshipBatchResult', (), {
+            'can_solve_telemetry_gap': any(result.can_solve_telemetry_gap for result in results),
+            'strategic_value': strategic_value,
+            'final_decision': final_decision,
+            'selected_files': list(dict.fromkeys(path for result in results for path in result.selected_files)),
+            'reasoning': "\n\n".join(result.reasoning for result in results if result.reasoning),
+            'main_file': batch_context['main_file'],
+            'total_files_analyzed': len(batch_context['files']),
+            'raw_response': "\n\n".join(result.raw_response for result in results)
+        })()
+    
+    def _final_selection_fallback(self, batch_context, error: Exception):
+        main_file_name = batch_context['main_file']
+        # Fallback: assume this batch cannot solve the gap
+        return type('RelationshipBatchResult', (), {
+            'can_solve_telemetry_gap': False,
+            'selected_files': [],
+            'reasoning': f"Error occurred during analysis: {error}",
+            'main_file': main_file_name,
+            'total_files_analyzed': len(batch_context.get('files', [])),
+            'raw_response': str(error)
+        })()
 
 # def final_telemetry_file_selection(self, final_context):
 #         """
@@ -846,7 +1012,7 @@ var activity = source.StartActivityWithContext("operation");
 #     """
 
 #         try:
-#             response = self.client.chat.completions.create(
+#             response = self.llm.chat_completion(
 #                 model="o3",
 #                 messages=[
 #                     {
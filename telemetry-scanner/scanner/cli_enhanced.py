@@ -17,6 +17,7 @@ from scanner.context_finder import find_candidate_files
 from scanner.config_finder import find_config_files
 from scanner.static_analyzer import build_monorepo_graph, expand_with_code_graph
 from scanner.patch_composer import select_files_for_edit, compose_patch
+from scanner.source_compactor import compaction_summary
 from scanner.writer import write_markdown
 
 # Enhanced modules
@@ -46,7 +47,8 @@ async def run_enhanced_workflow(args):
         output_dir=out_dir,
         max_retries=args.max_retries,
         enable_cache=False,  # Force disable cache to avoid serialization issues
-        parallel_workers=args.parallel_workers
+        parallel_workers=args.parallel_workers,
+        profile=args.profile
     )
     
     intent_builder = EnhancedIntentBuilder()
@@ -372,6 +374,8 @@ def run_original_workflow(args):
             seed_files[f] = True
     
     print("\nStep 4: Expanding context with Code Graph...")
+    # find_candidate_files keeps no file index, and the graph may be a cached one listing files
+    # deleted since, so expansion checks its results on disk
     candidate_list = expand_with_code_graph(list(seed_files.keys()))
     print(f"Found a total of {len(candidate_list)} unique candidate files to analyze.")
     (out_dir / "candidate_list.txt").write_text("\n".join(str(p) for p in candidate_list))
@@ -414,6 +418,9 @@ def run_original_workflow(args):
     else:
         print("\nCould not find a suitable file to modify after checking all candidates.")
 
+    compaction = compaction_summary()
+    if compaction:
+        print(compaction)
     print("\nScan complete.")
 
 def main():
@@ -434,6 +441,9 @@ def main():
     parser.add_argument("--enable-cache", action='store_true', default=False, help="Enable result caching")
     parser.add_argument("--parallel-workers", type=int, default=4, help="Number of parallel workers")
     parser.add_argument("--max-candidates", type=int, default=50, help="Maximum candidate files to analyze")
+    parser.add_argument("--profile", choices=["cpu", "memory", "both"],
+                        help="Profile each enhanced-workflow stage (collapsed stacks, top allocators, peak RSS); "
+                             "stages then run one at a time")
     
     args = parser.parse_args()
     
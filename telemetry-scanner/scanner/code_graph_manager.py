@@ -2,10 +2,151 @@
 Shared Code Graph Manager to avoid duplicate loading and processing.
 """
 import json
+import logging
+from collections import deque, defaultdict
+from enum import Enum
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Iterable, Iterator, Tuple, Set, Container
 import networkx as nx
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the SymbolKind / RelationshipKind enums in CodeGraphBuilder/Program.cs
+KIND_CLASS, KIND_INTERFACE, KIND_METHOD = 0, 1, 2
+REL_INHERITS_FROM, REL_IMPLEMENTS, REL_CALLS = 0, 1, 2
+
+
+class GraphQueryDirection(Enum):
+    """Which edges a k-hop graph query follows (same names as `CodeGraphBuilder query --direction`)."""
+    DEPENDENTS = "dependents"      # anything referencing the seeds (incoming, all kinds)
+    DEPENDENCIES = "dependencies"  # anything the seeds reference (outgoing, all kinds)
+    CALLERS = "callers"            # incoming Calls
+    CALLEES = "callees"            # outgoing Calls
+    IMPLEMENTORS = "implementors"  # incoming InheritsFrom / Implements
+    BASE_TYPES = "base_types"      # outgoing InheritsFrom / Implements
+
+
+_ALL_RELATIONSHIPS = frozenset({REL_INHERITS_FROM, REL_IMPLEMENTS, REL_CALLS})
+_TYPE_RELATIONSHIPS = frozenset({REL_INHERITS_FROM, REL_IMPLEMENTS})
+
+# direction -> (follow incoming edges?, relationship kinds followed)
+_DIRECTION_EDGES = {
+    GraphQueryDirection.DEPENDENTS: (True, _ALL_RELATIONSHIPS),
+    GraphQueryDirection.DEPENDENCIES: (False, _ALL_RELATIONSHIPS),
+    GraphQueryDirection.CALLERS: (True, frozenset({REL_CALLS})),
+    GraphQueryDirection.CALLEES: (False, frozenset({REL_CALLS})),
+    GraphQueryDirection.IMPLEMENTORS: (True, _TYPE_RELATIONSHIPS),
+    GraphQueryDirection.BASE_TYPES: (False, _TYPE_RELATIONSHIPS),
+}
+
+# NDJSON graph layout written by `CodeGraphBuilder index --format ndjson`: a header line
+# followed by one compact symbol per line:
+#   {"n": name, "k": kind, "f": file, "l": line, "s": start, "e": end, "r": [[target, kind, call_line], ...]}
+# "s"/"e" span the whole declaration and call_line is the invocation line of a Calls relationship.
+NDJSON_FORMAT_NAME = "codegraph-ndjson"
+NDJSON_FORMAT_VERSION = 1
+
+# Legacy graphs can be a single huge line, so only this much of the first line is probed.
+_HEADER_PROBE_LIMIT = 1024
+
+
+def _parse_ndjson_header(line: str) -> Optional[Dict[str, Any]]:
+    """Return the NDJSON header if `line` is one, otherwise None."""
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(header, dict) and header.get("format") == NDJSON_FORMAT_NAME:
+        return header
+    return None
+
+
+def expand_compact_symbol(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a compact NDJSON record into the long-form symbol dict used everywhere else."""
+    return {
+        "FullName": record["n"],
+        "Kind": record["k"],
+        "FilePath": record["f"],
+        "LineNumber": record["l"],
+        "StartLine": record.get("s", 0),
+        "EndLine": record.get("e", 0),
+        "Relationships": [
+            {
+                "TargetSymbolFullName": rel[0],
+                "Kind": rel[1],
+                "LineNumber": rel[2] if len(rel) > 2 else None,
+            }
+            for rel in record.get("r", [])
+        ],
+    }
+
+
+def compact_symbol(symbol: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a long-form symbol dict into its compact NDJSON record."""
+    record = {
+        "n": symbol["FullName"],
+        "k": symbol["Kind"],
+        "f": symbol["FilePath"],
+        "l": symbol["LineNumber"],
+    }
+    if symbol.get("StartLine"):
+        record["s"] = symbol["StartLine"]
+        record["e"] = symbol.get("EndLine") or symbol["StartLine"]
+    relationships = symbol.get("Relationships") or []
+    if relationships:
+        record["r"] = [
+            [rel["TargetSymbolFullName"], rel["Kind"], rel["LineNumber"]]
+            if rel.get("LineNumber") else
+            [rel["TargetSymbolFullName"], rel["Kind"]]
+            for rel in relationships
+        ]
+    return record
+
+
+def iter_graph_symbols(graph_path: Union[Path, str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield long-form symbol dicts from a graph file in either format.
+    NDJSON graphs are read line by line; legacy JSON documents are loaded whole.
+    """
+    with open(graph_path, 'r', encoding='utf-8') as f:
+        first_line = f.readline(_HEADER_PROBE_LIMIT)
+        if _parse_ndjson_header(first_line) is None:
+            f.seek(0)
+            yield from json.load(f).get("Symbols", [])
+            return
+
+        for line in f:
+            line = line.strip()
+            if line:
+                yield expand_compact_symbol(json.loads(line))
+
+
+def write_ndjson_graph(symbols: Iterable[Dict[str, Any]], output_path: Union[Path, str]) -> int:
+    """Write long-form symbols to `output_path` in the NDJSON format. Returns the symbol count."""
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"format": NDJSON_FORMAT_NAME, "version": NDJSON_FORMAT_VERSION}) + "\n")
+        for symbol in symbols:
+            f.write(json.dumps(compact_symbol(symbol), ensure_ascii=False, separators=(',', ':')) + "\n")
+            count += 1
+    return count
+
+
+def read_source_lines(file_path: Union[Path, str], start_line: int, end_line: int) -> Optional[str]:
+    """
+    Read lines `start_line`..`end_line` (1-based, inclusive) of a file without loading the rest of it.
+    Returns None if the file cannot be read.
+    """
+    if start_line < 1 or end_line < start_line:
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return ''.join(islice(f, start_line - 1, end_line))
+    except OSError:
+        return None
+
 
 @dataclass
 class CodeGraphData:
@@ -15,6 +156,174 @@ class CodeGraphData:
     symbols_by_file: Dict[str, list]
     call_graph: nx.DiGraph
     dependency_graph: nx.DiGraph
+    # Adjacency indexes used by the k-hop queries: symbol -> [(neighbour, relationship kind)]
+    symbol_files: Dict[str, str] = field(default_factory=dict)
+    outgoing_edges: Dict[str, List[Tuple[str, int]]] = field(default_factory=dict)
+    incoming_edges: Dict[str, List[Tuple[str, int]]] = field(default_factory=dict)
+
+    def iter_related_symbols(self, seed_symbols: Iterable[str],
+                             direction: Union[GraphQueryDirection, str] = GraphQueryDirection.DEPENDENTS,
+                             max_depth: int = 1,
+                             kinds: Optional[Iterable[int]] = None) -> Iterator[Tuple[str, int]]:
+        """
+        Breadth-first walk from the seed symbols, yielding (symbol, hop) for each newly reached symbol.
+        Lazy, so callers that stop early only pay for the part of the neighbourhood they consumed.
+        `kinds` overrides the relationship kinds implied by `direction`.
+        """
+        follow_incoming, default_kinds = _DIRECTION_EDGES[GraphQueryDirection(direction)]
+        edge_kinds = frozenset(kinds) if kinds is not None else default_kinds
+        edges = self.incoming_edges if follow_incoming else self.outgoing_edges
+
+        visited: Set[str] = set(seed_symbols)
+        frontier = deque((name, 0) for name in visited)
+        while frontier:
+            name, depth = frontier.popleft()
+            if depth >= max_depth:
+                continue
+            for neighbour, kind in edges.get(name, ()):
+                if kind in edge_kinds and neighbour not in visited:
+                    visited.add(neighbour)
+                    frontier.append((neighbour, depth + 1))
+                    yield neighbour, depth + 1
+
+    def query_symbols(self, seed_symbols: Iterable[str],
+                      direction: Union[GraphQueryDirection, str] = GraphQueryDirection.DEPENDENTS,
+                      max_depth: int = 1,
+                      max_results: Optional[int] = None,
+                      kinds: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """Return related symbols mapped to their hop distance, nearest first."""
+        results = {}
+        for name, depth in self.iter_related_symbols(seed_symbols, direction, max_depth, kinds):
+            results[name] = depth
+            if max_results is not None and len(results) >= max_results:
+                break
+        return results
+
+    def query_files(self, seed_files: Iterable[Union[Path, str]],
+                    direction: Union[GraphQueryDirection, str] = GraphQueryDirection.DEPENDENTS,
+                    max_depth: int = 1,
+                    max_results: Optional[int] = None,
+                    kinds: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """
+        File-level k-hop query: starts from every symbol declared in the seed files and returns the
+        other files reached, mapped to their hop distance, nearest first.
+        """
+        seed_file_strs = {str(f) for f in seed_files}
+        seed_symbols = [
+            symbol["FullName"]
+            for file_path in seed_file_strs
+            for symbol in self.symbols_by_file.get(file_path, [])
+        ]
+
+        results = {}
+        for name, depth in self.iter_related_symbols(seed_symbols, direction, max_depth, kinds):
+            file_path = self.symbol_files.get(name)
+            if file_path is None or file_path in seed_file_strs or file_path in results:
+                continue
+            results[file_path] = depth
+            if max_results is not None and len(results) >= max_results:
+                break
+        return results
+
+    def expand_files(self, seed_files: Iterable[Union[Path, str]],
+                     max_depth: int = 2,
+                     max_fanout: Optional[int] = 50,
+                     dependents_weight: float = 1.0,
+                     dependencies_weight: float = 1.0,
+                     decay: float = 0.5,
+                     max_results: Optional[int] = None,
+                     known_files: Optional[Container[str]] = None) -> Dict[str, float]:
+        """
+        Multi-source, level-synchronous BFS over the file dependency graph.
+
+        All seeds expand together one level at a time, so each file is visited at most once no
+        matter how many seeds reach it. A file's score is the sum over its parents of
+        parent_score * direction_weight * decay; seeds score 1.0, and files reachable from many
+        seeds rank higher. A direction weight of 0 disables that direction.
+
+        Args:
+            max_fanout: Neighbours taken per file and direction, so hub files cannot flood the result
+            known_files: Files known to exist (e.g. the search engine's file index); results outside it
+                are dropped without touching the filesystem
+
+        Returns:
+            Dict of file -> score, seeds included, highest score first
+        """
+        graph = self.dependency_graph
+        directions = [
+            (adjacency, weight * decay)
+            for adjacency, weight in ((graph.pred, dependents_weight), (graph.succ, dependencies_weight))
+            if weight > 0
+        ]
+
+        scores = {str(f): 1.0 for f in seed_files}
+        frontier = [f for f in scores if f in graph]
+        for _ in range(max_depth):
+            if not frontier:
+                break
+            level_scores = defaultdict(float)
+            for node in frontier:
+                parent_score = scores[node]
+                for adjacency, factor in directions:
+                    neighbours = adjacency[node]
+                    if max_fanout is not None:
+                        neighbours = islice(neighbours, max_fanout)
+                    contribution = parent_score * factor
+                    for neighbour in neighbours:
+                        if neighbour not in scores:
+                            level_scores[neighbour] += contribution
+            scores.update(level_scores)
+            frontier = list(level_scores)
+
+        ranked = sorted(
+            (item for item in scores.items() if known_files is None or item[0] in known_files),
+            key=lambda item: item[1], reverse=True
+        )
+        if max_results is not None:
+            ranked = ranked[:max_results]
+        return dict(ranked)
+
+    def get_symbol_range(self, symbol_name: str) -> Optional[Tuple[str, int, int]]:
+        """Return (file_path, start_line, end_line) for a symbol, or None if the graph has no range for it."""
+        node = self.networkx_graph.nodes.get(symbol_name)
+        if not node or not node.get("start_line"):
+            return None
+        return node["file_path"], node["start_line"], node["end_line"]
+
+    def get_method_ranges(self, file_path: Union[Path, str]) -> List[Tuple[str, int, int]]:
+        """Return (method_name, start_line, end_line) for every method declared in a file, in line order."""
+        ranges = [
+            (symbol["FullName"], symbol["StartLine"], symbol["EndLine"])
+            for symbol in self.symbols_by_file.get(str(file_path), [])
+            if symbol["Kind"] == 2 and symbol.get("StartLine")
+        ]
+        return sorted(ranges, key=lambda r: r[1])
+
+    def get_call_sites(self, symbol_name: str) -> List[Tuple[str, int]]:
+        """Return (target_symbol, line) for every invocation made from within `symbol_name`."""
+        if symbol_name not in self.networkx_graph:
+            return []
+        sites = []
+        for _, target, data in self.networkx_graph.out_edges(symbol_name, data=True):
+            sites.extend((target, line) for line in data.get("call_sites", []))
+        return sorted(sites, key=lambda s: s[1])
+
+    def get_incoming_call_sites(self, symbol_name: str) -> List[Tuple[str, str, int]]:
+        """Return (caller_symbol, caller_file, line) for every invocation of `symbol_name`."""
+        if symbol_name not in self.networkx_graph:
+            return []
+        sites = []
+        for caller, _, data in self.networkx_graph.in_edges(symbol_name, data=True):
+            caller_file = self.networkx_graph.nodes[caller].get("file_path")
+            sites.extend((caller, caller_file, line) for line in data.get("call_sites", []))
+        return sites
+
+    def get_symbol_source(self, symbol_name: str) -> Optional[str]:
+        """Read just the declaration of a symbol (e.g. a method body) from disk."""
+        symbol_range = self.get_symbol_range(symbol_name)
+        if symbol_range is None:
+            return None
+        return read_source_lines(*symbol_range)
 
 class CodeGraphManager:
     """Singleton manager for code graph data to avoid duplicate loading."""
@@ -32,7 +341,7 @@ class CodeGraphManager:
     
     def get_graph_data(self, graph_path: Union[Path, str]) -> Optional[CodeGraphData]:
         """Get cached graph data for a given path"""
-        print(f"[DEBUG] CodeGraphManager.get_graph_data: Requested path: {graph_path}")
+        logger.debug("CodeGraphManager.get_graph_data: Requested path: %s", graph_path)
         
         # Ensure graph_path is a Path object
         if isinstance(graph_path, str):
@@ -41,120 +350,100 @@ class CodeGraphManager:
         graph_path_str = str(graph_path)
         
         if graph_path_str in self._graph_cache:
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: Found cached data for {graph_path}")
+            logger.debug("CodeGraphManager.get_graph_data: Found cached data for %s", graph_path)
             return self._graph_cache[graph_path_str]
         
-        print(f"[DEBUG] CodeGraphManager.get_graph_data: No cached data, checking file existence")
+        logger.debug("CodeGraphManager.get_graph_data: No cached data, checking file existence")
         if not graph_path.exists():
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: File does not exist: {graph_path}")
+            logger.debug("CodeGraphManager.get_graph_data: File does not exist: %s", graph_path)
             return None
         
         try:
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: Loading graph data from file")
-            # Load and cache the graph data
-            with open(graph_path, 'r') as f:
-                raw_data = json.load(f)
-            
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: Creating CodeGraphData object")
-            # Build all the graph structures
-            networkx_graph = self._build_networkx_graph(raw_data)
-            symbols_by_file = self._group_symbols_by_file(raw_data)
-            call_graph = self._build_call_graph(raw_data)
-            dependency_graph = self._build_dependency_graph(raw_data)
-            
-            graph_data = CodeGraphData(
-                raw_data=raw_data,
-                networkx_graph=networkx_graph,
-                symbols_by_file=symbols_by_file,
-                call_graph=call_graph,
-                dependency_graph=dependency_graph
-            )
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: Caching graph data for {graph_path}")
+            logger.debug("CodeGraphManager.get_graph_data: Loading graph data from file")
+            # NDJSON graphs are streamed symbol by symbol into the indexes
+            graph_data = self._build_graph_data(iter_graph_symbols(graph_path))
+            logger.debug("CodeGraphManager.get_graph_data: Caching graph data for %s", graph_path)
             self._graph_cache[graph_path_str] = graph_data
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: Successfully loaded and cached graph data")
+            logger.debug("CodeGraphManager.get_graph_data: Successfully loaded and cached graph data")
             return graph_data
             
         except Exception as e:
-            print(f"[DEBUG] CodeGraphManager.get_graph_data: Error loading graph from {graph_path}: {e}")
-            print(f"Error loading graph from {graph_path}: {e}")
+            logger.error("Error loading graph from %s: %s", graph_path, e)
             return None
     
-    def _build_networkx_graph(self, graph_data: Dict) -> nx.DiGraph:
-        """Build a NetworkX directed graph from the code graph data."""
-        G = nx.DiGraph()
-        
-        # Add nodes for each symbol
-        for symbol in graph_data.get("Symbols", []):
-            G.add_node(
-                symbol["FullName"],
-                kind=symbol["Kind"],
-                file_path=symbol["FilePath"],
-                line_number=symbol["LineNumber"]
-            )
-        
-        # Add edges for relationships
-        for symbol in graph_data.get("Symbols", []):
-            for relationship in symbol.get("Relationships", []):
-                G.add_edge(
-                    symbol["FullName"],
-                    relationship["TargetSymbolFullName"],
-                    relationship_type=relationship["Kind"]
-                )
-        
-        return G
-    
-    def _group_symbols_by_file(self, graph_data: Dict) -> Dict[str, list]:
-        """Group symbols by their file path."""
-        symbols_by_file = {}
-        for symbol in graph_data.get("Symbols", []):
-            file_path = symbol["FilePath"]
-            if file_path not in symbols_by_file:
-                symbols_by_file[file_path] = []
-            symbols_by_file[file_path].append(symbol)
-        return symbols_by_file
-    
-    def _build_call_graph(self, graph_data: Dict) -> nx.DiGraph:
-        """Build a call graph showing method invocation relationships."""
+    def _build_graph_data(self, symbols: Iterable[Dict[str, Any]]) -> CodeGraphData:
+        """
+        Build every graph structure in a single pass over the symbols, so a streamed graph is
+        consumed as it is read.
+
+        Edges may name symbols that appear later in the stream: networkx creates the node on the
+        edge and fills in its attributes when the symbol arrives, and file dependencies on a symbol
+        not seen yet are resolved once every symbol's file is known.
+        """
+        all_symbols = []
+        networkx_graph = nx.DiGraph()
         call_graph = nx.DiGraph()
-        
-        for symbol in graph_data.get("Symbols", []):
-            if symbol["Kind"] == 2:  # Method kind
-                call_graph.add_node(symbol["FullName"], **symbol)
-                
-                for relationship in symbol.get("Relationships", []):
-                    if relationship["Kind"] == 2:  # Calls relationship
-                        call_graph.add_edge(
-                            symbol["FullName"],
-                            relationship["TargetSymbolFullName"]
-                        )
-        
-        return call_graph
-    
-    def _build_dependency_graph(self, graph_data: Dict) -> nx.DiGraph:
-        """Build a file-level dependency graph."""
+        symbols_by_file: Dict[str, list] = {}
+        symbol_files: Dict[str, str] = {}
+        outgoing_edges: Dict[str, List[Tuple[str, int]]] = {}
+        incoming_edges: Dict[str, List[Tuple[str, int]]] = {}
         dependency_graph = nx.DiGraph()
-        
-        # Group symbols by file
-        symbols_by_file = self._group_symbols_by_file(graph_data)
-        
-        # Add nodes for each file
-        for file_path in symbols_by_file.keys():
+        unresolved: List[Tuple[str, str]] = []  # (file, target symbol) whose target file is not known yet
+
+        for symbol in symbols:
+            all_symbols.append(symbol)
+            source = symbol["FullName"]
+            file_path = symbol["FilePath"]
+            is_method = symbol["Kind"] == KIND_METHOD
+
+            networkx_graph.add_node(
+                source,
+                kind=symbol["Kind"],
+                file_path=file_path,
+                line_number=symbol["LineNumber"],
+                start_line=symbol.get("StartLine", 0),
+                end_line=symbol.get("EndLine", 0)
+            )
+            symbols_by_file.setdefault(file_path, []).append(symbol)
+            symbol_files.setdefault(source, file_path)
             dependency_graph.add_node(file_path)
-        
-        # Add edges based on symbol relationships across files
-        for file_path, symbols in symbols_by_file.items():
-            for symbol in symbols:
-                for relationship in symbol.get("Relationships", []):
-                    # Find the target symbol's file
-                    target_symbol = relationship["TargetSymbolFullName"]
-                    for target_file, target_symbols in symbols_by_file.items():
-                        if target_file != file_path:  # Different file
-                            target_names = [s["FullName"] for s in target_symbols]
-                            if target_symbol in target_names:
-                                dependency_graph.add_edge(file_path, target_file)
-                                break
-        
-        return dependency_graph
+            if is_method:
+                call_graph.add_node(source, **symbol)
+
+            for relationship in symbol.get("Relationships", []):
+                target = relationship["TargetSymbolFullName"]
+                kind = relationship["Kind"]
+                # Repeated calls to the same target share one edge and keep every call-site line
+                if not networkx_graph.has_edge(source, target):
+                    networkx_graph.add_edge(source, target, relationship_type=kind, call_sites=[])
+                if relationship.get("LineNumber"):
+                    networkx_graph[source][target]["call_sites"].append(relationship["LineNumber"])
+                if is_method and kind == REL_CALLS:
+                    call_graph.add_edge(source, target)
+                outgoing_edges.setdefault(source, []).append((target, kind))
+                incoming_edges.setdefault(target, []).append((source, kind))
+                # File-level dependencies: relationships across files, with targets resolved by name
+                target_file = symbol_files.get(target)
+                if target_file is None:
+                    unresolved.append((file_path, target))
+                elif target_file != file_path:
+                    dependency_graph.add_edge(file_path, target_file)
+
+        for file_path, target in unresolved:
+            target_file = symbol_files.get(target)
+            if target_file is not None and target_file != file_path:
+                dependency_graph.add_edge(file_path, target_file)
+
+        return CodeGraphData(
+            raw_data={"Symbols": all_symbols},
+            networkx_graph=networkx_graph,
+            symbols_by_file=symbols_by_file,
+            call_graph=call_graph,
+            dependency_graph=dependency_graph,
+            symbol_files=symbol_files,
+            outgoing_edges=outgoing_edges,
+            incoming_edges=incoming_edges
+        )
     
     def clear_cache(self):
         """Clear cached data to force reload."""
@@ -1,6 +1,9 @@
+import logging
 import os
 from typing import List
 
+logger = logging.getLogger(__name__)
+
 def load_context_from_directory(context_dir: str) -> str:
     """
     Loads all .cs and .tt files from a directory and concatenates them.
@@ -12,10 +15,10 @@ def load_context_from_directory(context_dir: str) -> str:
         A single string containing all context, or an empty string if the
         directory is not found or contains no valid files.
     """
-    print(f"Reading company-specific context from '{context_dir}' folder...")
+    logger.info("Reading company-specific context from '%s' folder...", context_dir)
     context_str = ""
     if not os.path.isdir(context_dir):
-        print(f" Warning: Context directory not found: {context_dir}")
+        logger.warning("Context directory not found: %s", context_dir)
         return ""
 
     context_files: List[str] = [f for f in os.listdir(context_dir) if f.endswith((".cs", ".tt"))]
@@ -28,9 +31,9 @@ def load_context_from_directory(context_dir: str) -> str:
                 context_str += f.read()
                 context_str += "\n\n"
         except Exception as e:
-            print(f" Warning: Could not read context file {filename}. Error: {e}")
+            logger.warning("Could not read context file %s. Error: %s", filename, e)
 
     if not context_str:
-        print(f"️️Warning: No context files were loaded from '{context_dir}'.")
+        logger.warning("No context files were loaded from '%s'.", context_dir)
 
     return context_str.strip()
\ No newline at end of file
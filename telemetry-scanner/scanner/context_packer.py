@@ -0,0 +1,379 @@
+"""
+Token-aware packing of selected source files into LLM prompts.
+
+Patch generation used to embed every selected file in full. `ContextPacker` fits them into a token
+budget instead: files that fit together are kept whole; otherwise each C#/Java file is cut into its
+header (usings, namespace and type declarations, fields) and its members (methods, constructors,
+properties with bodies), other files into fixed windows of lines. Headers are always included;
+members are ranked by telemetry call sites and intent-matching symbols and added until the budget
+is spent. Omitted code is replaced by a marker naming its line range, so the model knows what it
+cannot see and line numbers stay recoverable for the diff.
+
+Every line is emitted at most once, and a file whose content duplicates another selected file is
+replaced by a reference to it.
+"""
+import hashlib
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .token_counter import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_TOKENS = 48000
+
+# Cut into header and members by brace structure; any other file is cut into windows of lines
+SLICEABLE_SUFFIXES = {".cs", ".java"}
+WINDOW_LINES = 40
+
+TELEMETRY_CALL_PATTERN = re.compile(
+    r"\b(?:StartActivity|ActivitySource|Activity\.Current|SetTag|AddTag|SetAttribute|SetBaggage|AddBaggage|AddEvent|"
+    r"SetStatus|RecordException|StartSpan|StartActiveSpan|Enrich\w*|CreateCounter|CreateHistogram|"
+    r"CreateUpDownCounter|CreateObservableGauge|AddOpenTelemetry|WithTracing|WithMetrics)\b"
+)
+TYPE_DECLARATION = re.compile(
+    r"^\s*(?:\[.*\]\s*)?(?:(?:public|private|protected|internal|static|abstract|sealed|partial|readonly|unsafe|"
+    r"file|new|ref|final)\s+)*(?:class|struct|interface|record|enum)\b"
+)
+NAMESPACE_OR_IMPORT = re.compile(r"^\s*(?:namespace|using|package|import)\b")
+MEMBER_NAME = re.compile(r"(\w+)\s*(?:<[^()]*>)?\s*\(|(\w+)\s*(?:\{|=>|=|;)")
+NOT_MEMBER_NAMES = {"if", "for", "foreach", "while", "switch", "catch", "using", "lock", "return", "new", "get", "set",
+                    "init", "base", "this", "typeof", "nameof", "default"}
+
+def estimate_tokens(text: str) -> int:
+    return get_token_counter().count(text) + 1  # +1 for the line break joining it to its neighbours
+
+def intent_terms(intent: Dict[str, Any]) -> Set[str]:
+    """Lower-cased symbols a relevant slice is likely to mention: target, attribute and span names,
+    search keywords, and identifier-like words of the description."""
+    values: List[str] = list(intent.get("search_keywords") or [])
+    operation = intent.get("telemetry_operation") or {}
+    if isinstance(operation, dict):
+        values += [operation.get("target_name") or "", operation.get("new_span_name") or ""]
+        for attribute in operation.get("attributes_to_add") or []:
+            values.append(attribute.get("name", "") if isinstance(attribute, dict) else str(attribute))
+        metric = operation.get("new_metric_details")
+        if isinstance(metric, dict):
+            values += [str(value) for value in metric.values() if isinstance(value, str)]
+    for word in re.findall(r"[A-Za-z_][\w.]{3,}", str(intent.get("semantic_description") or "")):
+        word = word.strip(".")
+        if "_" in word or "." in word or any(c.isupper() for c in word[1:]):
+            values.append(word)
+
+    terms = set()
+    for value in values:
+        value = value.strip().lower()
+        if len(value) < 3:
+            continue
+        terms.add(value)
+        # "HTTP_REFERER" should also match Request.Headers["Referer"]
+        terms.update(part for part in re.split(r"[._\-\s]+", value) if len(part) >= 5)
+    return terms
+
+@dataclass
+class SourceSlice:
+    """A contiguous range of lines of one file (1-based, inclusive)."""
+    path: str
+    start_line: int
+    end_line: int
+    kind: str  # "header", "member" or "window"
+    text: str
+    name: str = ""
+    signature: str = ""
+    score: float = 0.0
+    telemetry_lines: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+@dataclass
+class PackedContext:
+    """Files as they go into the prompt, plus what was left out."""
+    files: Dict[str, str]
+    budget: int
+    tokens: int
+    included: List[SourceSlice] = field(default_factory=list)
+    omitted: List[SourceSlice] = field(default_factory=list)
+    duplicates: Dict[str, str] = field(default_factory=dict)  # path -> path with the same content
+    outlines: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        return not self.omitted
+
+    def outline(self) -> Dict[str, str]:
+        """Per file: type declarations, member signatures and telemetry call sites, for planning
+        prompts that should not carry the code a second time."""
+        return dict(self.outlines)
+
+    def to_report(self) -> Dict[str, Any]:
+        return {
+            "budget_tokens": self.budget,
+            "packed_tokens": self.tokens,
+            "files": len(self.files),
+            "sliced_files": len({s.path for s in self.omitted}),
+            "members_included": sum(1 for s in self.included if s.kind != "header"),
+            "members_omitted": len(self.omitted),
+            "omitted_tokens": sum(s.tokens for s in self.omitted),
+            "duplicate_files": len(self.duplicates)
+        }
+
+class ContextPacker:
+    """Fits file contents into a token budget (0 disables packing: files are always kept whole)."""
+
+    def __init__(self, token_budget: int = DEFAULT_CONTEXT_TOKENS):
+        self.token_budget = token_budget
+
+    def pack(self, files: Dict[str, str], intent: Optional[Dict[str, Any]] = None,
+             main_paths: Iterable[str] = (), token_budget: Optional[int] = None) -> PackedContext:
+        """Pack `files` (path -> content), ranking slices against `intent`; `main_paths` win ties.
+        `token_budget` overrides the packer's budget for this call."""
+        budget = self.token_budget if token_budget is None else token_budget
+        terms = intent_terms(intent or {})
+        main_paths = set(main_paths)
+
+        unique: Dict[str, str] = {}
+        duplicates: Dict[str, str] = {}
+        seen: Dict[str, str] = {}
+        for path, content in files.items():
+            digest = hashlib.sha256(content.encode("utf-8", "replace")).hexdigest()
+            if digest in seen:
+                duplicates[path] = seen[digest]
+            else:
+                seen[digest] = path
+                unique[path] = content
+
+        slices = {path: self._slice_file(path, content, terms, path in main_paths) for path, content in unique.items()}
+        outlines = {path: self._outline(slices[path]) if path in unique else self._duplicate_note(duplicates[path])
+                    for path in files}
+        total = sum(estimate_tokens(content) for content in unique.values())
+
+        if budget <= 0 or total <= budget:
+            packed_files = {path: files[path] if path in unique else self._duplicate_note(duplicates[path])
+                            for path in files}
+            included = [s for file_slices in slices.values() for s in file_slices]
+            return PackedContext(packed_files, budget, total, included, [], duplicates, outlines)
+
+        chosen: Set[int] = set()
+        remaining = budget
+        # Headers first (main files before related ones), then members by relevance
+        headers = [s for path in sorted(slices, key=lambda p: p not in main_paths)
+                   for s in slices[path] if s.kind == "header"]
+        for header in headers:
+            if header.tokens <= remaining:
+                chosen.add(id(header))
+                remaining -= header.tokens
+            else:
+                logger.warning("Context budget of %s tokens cannot hold the header of %s", budget, header.path)
+        members = sorted((s for file_slices in slices.values() for s in file_slices if s.kind != "header"),
+                         key=lambda s: (-s.score, s.path not in main_paths, s.tokens))
+        for member in members:
+            if member.tokens <= remaining:
+                chosen.add(id(member))
+                remaining -= member.tokens
+
+        packed_files, included, omitted = {}, [], []
+        for path in files:
+            if path in duplicates:
+                packed_files[path] = self._duplicate_note(duplicates[path])
+                continue
+            packed_files[path] = self._render(slices[path], chosen, path)
+            for s in slices[path]:
+                (included if id(s) in chosen else omitted).append(s)
+
+        packed = PackedContext(packed_files, budget, budget - remaining,
+                               included, omitted, duplicates, outlines)
+        logger.info("Packed %s files into ~%s of %s tokens (from ~%s): %s slices included, %s omitted",
+                    len(files), packed.tokens, budget, total, len(included), len(omitted))
+        return packed
+
+    # ------------------------------------------------------------------
+    # Slicing
+    # ------------------------------------------------------------------
+    def _slice_file(self, path: str, content: str, terms: Set[str], is_main: bool) -> List[SourceSlice]:
+        lines = content.splitlines()
+        if Path(path).suffix.lower() in SLICEABLE_SUFFIXES:
+            ranges = _member_ranges(lines)
+        else:
+            ranges = [(start, min(start + WINDOW_LINES, len(lines)) - 1, "header" if start == 0 else "window")
+                      for start in range(0, len(lines), WINDOW_LINES)]
+
+        slices = []
+        position = 0
+        for start, end, kind in ranges:
+            if start > position:
+                slices.append(self._make_slice(path, lines, position, start - 1, "header", terms, is_main))
+            slices.append(self._make_slice(path, lines, start, end, kind, terms, is_main))
+            position = end + 1
+        if position < len(lines):
+            slices.append(self._make_slice(path, lines, position, len(lines) - 1, "header", terms, is_main))
+        return slices
+
+    @staticmethod
+    def _make_slice(path: str, lines: List[str], start: int, end: int, kind: str,
+                    terms: Set[str], is_main: bool) -> SourceSlice:
+        body = lines[start:end + 1]
+        text = "\n".join(body)
+        telemetry_lines = [(start + i + 1, line.strip()) for i, line in enumerate(body)
+                           if TELEMETRY_CALL_PATTERN.search(line)]
+        signature = next((line.strip() for line in body
+                          if line.strip() and not line.strip().startswith(("[", "//", "/*", "*", "@"))), "")
+        name = ""
+        if kind == "member":
+            for match in MEMBER_NAME.finditer(signature):
+                candidate = match.group(1) or match.group(2)
+                if candidate not in NOT_MEMBER_NAMES:
+                    name = candidate
+                    break
+
+        lowered = text.lower()
+        matched = sum(1 for term in terms if term in lowered)
+        score = 3 * min(len(telemetry_lines), 5) + 2 * matched
+        if name and name.lower() in terms:
+            score += 2
+        if score and is_main:
+            score += 1
+        return SourceSlice(path, start + 1, end + 1, kind, text, name, signature, score, telemetry_lines)
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _render(slices: List[SourceSlice], chosen: Set[int], path: str) -> str:
+        comment = "//" if Path(path).suffix.lower() in SLICEABLE_SUFFIXES else "#"
+        parts: List[str] = []
+        gap: List[SourceSlice] = []
+
+        def close_gap():
+            if not gap:
+                return
+            first_line = gap[0].text.splitlines()[0] if gap[0].text else ""
+            indent = first_line[:len(first_line) - len(first_line.lstrip())]
+            names = [s.name for s in gap if s.name]
+            what = f": {', '.join(names[:3])}{', ...' if len(names) > 3 else ''}" if names else ""
+            parts.append(f"{indent}{comment} ... lines {gap[0].start_line}-{gap[-1].end_line} omitted{what} ...")
+            gap.clear()
+
+        for s in slices:
+            if id(s) in chosen and not (gap and not s.text.strip()):  # blank lines between omissions join them
+                close_gap()
+                parts.append(s.text)
+            else:
+                gap.append(s)
+        close_gap()
+        return "\n".join(parts)
+
+    @staticmethod
+    def _outline(slices: List[SourceSlice]) -> str:
+        entries = []
+        for s in slices:
+            if s.kind == "header":
+                entries += [line.rstrip() for line in s.text.splitlines()
+                            if TYPE_DECLARATION.match(line) or NAMESPACE_OR_IMPORT.match(line)]
+            elif s.kind == "member":
+                entries.append(f"  L{s.start_line}-{s.end_line}: {s.signature}")
+            for number, line in s.telemetry_lines:
+                entries.append(f"    L{number}: {line}")
+        return "\n".join(entries)
+
+    @staticmethod
+    def _duplicate_note(original: str) -> str:
+        return f"(identical to {original})"
+
+def _member_ranges(lines: List[str]) -> List[Tuple[int, int, str]]:
+    """(start, end, "member") line ranges (0-based, inclusive) of the members of every type body.
+
+    A member starts at a non-blank line directly inside a type body and ends where its block closes
+    (or at the `;` of an expression-bodied member); attributes and doc comments stay attached.
+    Regions without a body (fields, abstract or interface members) and one-liners are left to the header.
+    """
+    before, after, peak = _brace_depths(lines)
+    body_depths: Set[int] = set()
+    ranges = []
+    i = 0
+    while i < len(lines):
+        depth = before[i]
+        if TYPE_DECLARATION.match(lines[i]):
+            # The declaration (base types, constraints) runs up to the brace opening the body
+            body_depths.add(depth + 1)
+            while i < len(lines) and peak[i] == depth and not _strip_comment(lines[i]).endswith(";"):
+                i += 1
+            i += 1
+            continue
+        if depth not in body_depths or not lines[i].strip() or after[i] < depth:
+            i += 1
+            continue
+
+        opened = has_arrow = False
+        end = i
+        for j in range(i, len(lines)):
+            if after[j] < depth:  # the closing brace of the enclosing type
+                end = max(i, j - 1)
+                break
+            if TYPE_DECLARATION.match(lines[j]) and j > i:  # attributes belonged to a nested type
+                end = j - 1
+                break
+            end = j
+            opened = opened or peak[j] > depth
+            code = _strip_comment(lines[j])
+            has_arrow = has_arrow or "=>" in code
+            if after[j] == depth and (opened or code.endswith((";", "}"))):
+                break
+        # One-liners (auto-properties, `=> value`) cost little and read as declarations
+        if end > i and (opened or has_arrow):
+            ranges.append((i, end, "member"))
+        i = end + 1
+    return ranges
+
+def _strip_comment(line: str) -> str:
+    return line.split("//", 1)[0].rstrip()
+
+def _brace_depths(lines: List[str]) -> Tuple[List[int], List[int], List[int]]:
+    """Brace depth before and after each line and the deepest point within it, ignoring braces in
+    comments, string and character literals."""
+    before, after, peak = [], [], []
+    depth = 0
+    in_block_comment = False
+    verbatim = False
+    for line in lines:
+        before.append(depth)
+        deepest = depth
+        quote = '"' if verbatim else None
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            if in_block_comment:
+                if line.startswith("*/", i):
+                    in_block_comment = False
+                    i += 1
+            elif quote:
+                if verbatim and ch == '"':
+                    if line.startswith('""', i):
+                        i += 1
+                    else:
+                        quote, verbatim = None, False
+                elif not verbatim and ch == "\\":
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif line.startswith("//", i):
+                break
+            elif line.startswith("/*", i):
+                in_block_comment = True
+                i += 1
+            elif ch in "\"'":
+                quote = ch
+                verbatim = ch == '"' and "@" in line[max(0, i - 2):i]
+            elif ch == "{":
+                depth += 1
+                deepest = max(deepest, depth)
+            elif ch == "}":
+                depth = max(0, depth - 1)
+            i += 1
+        after.append(depth)
+        peak.append(deepest)
+    return before, after, peak
@@ -1,12 +1,25 @@
 """
 Enhanced Intent Understanding System with multi-step planning and validation.
+
+Two modes:
+- sequential: intent extraction, complexity analysis and planning as three chained LLM calls
+  (each prompt includes the previous answers)
+- fast: one schema-constrained call returns all three sections at once
+Validation is local in both modes.
 """
 import json
-import os
-from typing import Dict, List, Optional, Any, Union
+import logging
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
-from openai import AzureOpenAI
+from openai import BadRequestError
+from .llm_gateway import get_llm_gateway
+
+logger = logging.getLogger(__name__)
+
+class IntentMode(Enum):
+    SEQUENTIAL = "sequential"
+    FAST = "fast"
 
 class IntentConfidence(Enum):
     LOW = "low"
@@ -64,42 +77,7 @@ class EnhancedIntent:
     exact_requirements: ExactRequirements = None
     telemetry_analysis: Dict = None
 
-class EnhancedIntentBuilder:
-    """Advanced intent builder with multi-step reasoning and validation."""
-    
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=os.environ.get("AZURE_OPENAI_API_KEY"),
-            azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
-            api_version="2024-12-01-preview"
-        )
-    
-    def extract_enhanced_intent(self, ticket_text: str, context: Dict = None) -> EnhancedIntent:
-        """Extract intent with enhanced understanding and planning."""
-        
-        # Step 1: Initial intent extraction
-        basic_intent = self._extract_basic_intent(ticket_text)
-        
-        # Step 2: Complexity analysis
-        complexity_analysis = self._analyze_complexity(ticket_text, basic_intent)
-        
-        # Step 3: Multi-step planning
-        planning_result = self._create_multi_step_plan(ticket_text, basic_intent, complexity_analysis)
-        
-        # Step 4: Validation and confidence scoring
-        validation = self._validate_intent(basic_intent, complexity_analysis, planning_result)
-        
-        # Step 5: Enhance with contextual information
-        enhanced_intent = self._enhance_with_context(
-            basic_intent, complexity_analysis, planning_result, validation, ticket_text, context
-        )
-        
-        return enhanced_intent
-    
-    def _extract_basic_intent(self, ticket_text: str) -> Dict:
-        """Extract basic intent using improved prompting."""
-        
-        system_prompt = """
+BASIC_INTENT_PROMPT = """
 You are an expert software architect analyzing software tickets. Your task is to extract structured intent from natural language descriptions.
 
 Follow this enhanced analysis process:
@@ -132,11 +110,178 @@ Output valid JSON following this schema:
   "scope_indicators": ["single_method", "multiple_files", "configuration_change"]
 }
 """
+
+# Used instead of a planning call when the change is simple (complexity score <= 3)
+SIMPLE_PLAN = {"steps": [{"order": 1, "action": "direct_implementation", "description": "Simple single-step implementation"}]}
+
+COMBINED_ANALYSIS_PROMPT = """
+You are an expert software architect analyzing software tickets about telemetry (OpenTelemetry, C#/.NET).
+In a single pass, produce three sections:
+
+1. **intent**: Extract structured intent from the ticket.
+   - Entity Extraction: identify all technical entities (services, attributes, protocols, frameworks)
+   - Goal Synthesis: determine the primary and secondary objectives
+   - Pattern Recognition: identify if this matches common telemetry patterns
+   - Scope Analysis: determine if this is a single-file, multi-file, or cross-cutting change
+   - static_analysis_query: only if a method or class is mentioned or strongly implied, else null
+2. **complexity**: Analyze the complexity of the change described by your intent.
+   - complexity_score from 1-10 based on technical scope, estimated_files from 1-50
+   - risk factors, technical challenges and prerequisites
+3. **plan**: A step-by-step implementation plan consistent with the intent and complexity
+   (for example locate configuration, implement changes, validate), with alternative approaches
+   and a rollback strategy.
+
+Output valid JSON following this schema:
+
+{
+  "intent": {
+    "issue_category": "INSTRUMENTATION|CONFIGURATION",
+    "static_analysis_query": {"find_method_call": "MethodName", "find_class": null} | null,
+    "semantic_description": "One-sentence goal summary",
+    "search_keywords": ["keyword1", "keyword2"],
+    "telemetry_operation": {
+      "type": "span|metric|log",
+      "target_name": "string|null",
+      "action": "CREATE|ADD_ATTRIBUTES|UPDATE_NAME",
+      "attributes_to_add": [{"name": "attr.name", "value_source": "description"}],
+      "new_span_name": "string|null",
+      "new_metric_details": {"name": null, "instrument": null, "unit": null, "description": null} | null
+    },
+    "technical_entities": ["entity1", "entity2"],
+    "primary_goal": "main objective",
+    "secondary_goals": ["goal1", "goal2"],
+    "recognized_patterns": ["pattern1", "pattern2"],
+    "scope_indicators": ["single_method", "multiple_files", "configuration_change"]
+  },
+  "complexity": {
+    "complexity_score": 1-10,
+    "operation_type": "single_file|multi_file|configuration|cross_cutting",
+    "estimated_files": 1-50,
+    "risk_factors": ["factor1", "factor2"],
+    "technical_challenges": ["challenge1", "challenge2"],
+    "prerequisites": ["prereq1", "prereq2"]
+  },
+  "plan": {
+    "steps": [
+      {
+        "order": 1,
+        "action": "locate_configuration",
+        "description": "Find OpenTelemetry configuration files",
+        "expected_files": ["Startup.cs", "*Extensions.cs"],
+        "dependencies": [],
+        "validation_criteria": "Configuration files found and analyzed"
+      }
+    ],
+    "alternative_approaches": ["approach1", "approach2"],
+    "rollback_strategy": "description"
+  }
+}
+"""
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # Structured outputs in strict mode need every property required and no extra properties
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+def _nullable(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"anyOf": [schema, {"type": "null"}]}
+
+_STRING = {"type": "string"}
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+COMBINED_ANALYSIS_SCHEMA = _strict_object({
+    "intent": _strict_object({
+        "issue_category": {"type": "string", "enum": ["INSTRUMENTATION", "CONFIGURATION"]},
+        "static_analysis_query": _nullable(_strict_object({
+            "find_method_call": _NULLABLE_STRING,
+            "find_class": _NULLABLE_STRING
+        })),
+        "semantic_description": _STRING,
+        "search_keywords": _STRING_LIST,
+        "telemetry_operation": _strict_object({
+            "type": {"type": "string", "enum": ["span", "metric", "log"]},
+            "target_name": _NULLABLE_STRING,
+            "action": {"type": "string", "enum": ["CREATE", "ADD_ATTRIBUTES", "UPDATE_NAME"]},
+            "attributes_to_add": {"type": "array", "items": _strict_object({
+                "name": _STRING,
+                "value_source": _STRING
+            })},
+            "new_span_name": _NULLABLE_STRING,
+            "new_metric_details": _nullable(_strict_object({
+                "name": _NULLABLE_STRING,
+                "instrument": _NULLABLE_STRING,
+                "unit": _NULLABLE_STRING,
+                "description": _NULLABLE_STRING
+            }))
+        }),
+        "technical_entities": _STRING_LIST,
+        "primary_goal": _STRING,
+        "secondary_goals": _STRING_LIST,
+        "recognized_patterns": _STRING_LIST,
+        "scope_indicators": _STRING_LIST
+    }),
+    "complexity": _strict_object({
+        "complexity_score": {"type": "integer"},
+        "operation_type": {"type": "string", "enum": ["single_file", "multi_file", "configuration", "cross_cutting"]},
+        "estimated_files": {"type": "integer"},
+        "risk_factors": _STRING_LIST,
+        "technical_challenges": _STRING_LIST,
+        "prerequisites": _STRING_LIST
+    }),
+    "plan": _strict_object({
+        "steps": {"type": "array", "items": _strict_object({
+            "order": {"type": "integer"},
+            "action": _STRING,
+            "description": _STRING,
+            "expected_files": _STRING_LIST,
+            "dependencies": {"type": "array", "items": {"type": "integer"}},
+            "validation_criteria": _STRING
+        })},
+        "alternative_approaches": _STRING_LIST,
+        "rollback_strategy": _STRING
+    })
+})
+
+class EnhancedIntentBuilder:
+    """Advanced intent builder with multi-step reasoning and validation."""
+    
+    def __init__(self, mode: IntentMode = IntentMode.SEQUENTIAL):
+        self.llm = get_llm_gateway()
+        self.mode = IntentMode(mode)
+    
+    def extract_enhanced_intent(self, ticket_text: str, context: Dict = None) -> EnhancedIntent:
+        """Extract intent with enhanced understanding and planning."""
+        
+        if self.mode is IntentMode.FAST:
+            # Steps 1-3 in a single structured call
+            basic_intent, complexity_analysis, planning_result = self._extract_combined_analysis(ticket_text)
+        else:
+            # Step 1: Initial intent extraction
+            basic_intent = self._extract_basic_intent(ticket_text)
+            
+            # Step 2: Complexity analysis
+            complexity_analysis = self._analyze_complexity(ticket_text, basic_intent)
+            
+            # Step 3: Multi-step planning
+            planning_result = self._create_multi_step_plan(ticket_text, basic_intent, complexity_analysis)
         
-        response = self.client.chat.completions.create(
+        # Step 4: Validation and confidence scoring
+        validation = self._validate_intent(basic_intent, complexity_analysis, planning_result)
+        
+        # Step 5: Enhance with contextual information
+        enhanced_intent = self._enhance_with_context(
+            basic_intent, complexity_analysis, planning_result, validation, ticket_text, context
+        )
+        
+        return enhanced_intent
+    
+    def _extract_basic_intent(self, ticket_text: str) -> Dict:
+        """Extract basic intent using improved prompting."""
+        
+        response = self.llm.chat_completion(
             model="o3",
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": BASIC_INTENT_PROMPT},
                 {"role": "user", "content": f"Analyze this ticket:\n\n{ticket_text}"}
             ],
             response_format={"type": "json_object"}
@@ -144,6 +289,36 @@ Output valid JSON following this schema:
         
         return json.loads(response.choices[0].message.content)
     
+    def _extract_combined_analysis(self, ticket_text: str) -> Tuple[Dict, Dict, Dict]:
+        """Intent, complexity and plan from one call constrained to COMBINED_ANALYSIS_SCHEMA."""
+        messages = [
+            {"role": "system", "content": COMBINED_ANALYSIS_PROMPT},
+            {"role": "user", "content": f"Analyze this ticket:\n\n{ticket_text}"}
+        ]
+        try:
+            response = self.llm.chat_completion(
+                model="o3",
+                messages=messages,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "telemetry_intent_analysis", "strict": True, "schema": COMBINED_ANALYSIS_SCHEMA}
+                }
+            )
+        except BadRequestError as e:
+            # Deployments without structured outputs still honour JSON mode; the prompt carries the schema
+            logger.warning("Structured output rejected (%s); retrying the combined intent call in JSON mode", e)
+            response = self.llm.chat_completion(model="o3", messages=messages, response_format={"type": "json_object"})
+        
+        analysis = json.loads(response.choices[0].message.content)
+        basic_intent = analysis.get("intent", {})
+        complexity = analysis.get("complexity", {})
+        planning = analysis.get("plan", {})
+        
+        # Same rule as the sequential mode, which skips the planning call for simple changes
+        if complexity.get("complexity_score", 1) <= 3:
+            planning = dict(SIMPLE_PLAN)
+        return basic_intent, complexity, planning
+    
     def _analyze_complexity(self, ticket_text: str, basic_intent: Dict) -> Dict:
         """Analyze the complexity and scope of the required changes."""
         
@@ -165,7 +340,7 @@ Provide complexity analysis in JSON format:
 }}
 """
         
-        response = self.client.chat.completions.create(
+        response = self.llm.chat_completion(
             model="o3",
             messages=[{"role": "user", "content": complexity_prompt}],
             response_format={"type": "json_object"}
@@ -177,7 +352,7 @@ Provide complexity analysis in JSON format:
         """Create a multi-step execution plan for complex changes."""
         
         if complexity.get("complexity_score", 1) <= 3:
-            return {"steps": [{"order": 1, "action": "direct_implementation", "description": "Simple single-step implementation"}]}
+            return dict(SIMPLE_PLAN)
         
         planning_prompt = f"""
 Create a multi-step implementation plan for this telemetry change:
@@ -210,7 +385,7 @@ Provide a step-by-step plan in JSON format:
 }}
 """
         
-        response = self.client.chat.completions.create(
+        response = self.llm.chat_completion(
             model="o3",
             messages=[{"role": "user", "content": planning_prompt}],
             response_format={"type": "json_object"}
@@ -1,18 +1,93 @@
 """
 Intelligent Multi-Modal Search System with domain-specific knowledge and advanced ranking.
 """
+import hashlib
 import json
+import logging
 import os
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any, Set
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Any, Set
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
 from enum import Enum
+from functools import lru_cache
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import subprocess
 import re
 from .code_graph_manager import code_graph_manager
+from .log_config import EventSampler
+from .pipeline_orchestrator import SharedArray, share_array
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+@lru_cache(maxsize=1)
+def _load_embedding_model() -> SentenceTransformer:
+    # Loaded once per process (the main process or a pipeline worker)
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def build_file_index(repo_path: Path, contents_path: str) -> Dict[str, Any]:
+    """
+    Build the search file index for a repository, for load_file_index to map.
+    
+    Module-level so the pipeline can run it in a worker process, off the main process's GIL.
+    File contents are concatenated into one byte array stored at `contents_path`; only the
+    SharedArray handle and per-file metadata with (offset, length) into it are pickled back.
+    """
+    index = IntelligentSearchEngine(repo_path).file_index
+    blobs = [info["content"].encode("utf-8") for info in index.values()]
+    entries = {}
+    offset = 0
+    for (path, info), blob in zip(index.items(), blobs):
+        entry = {key: value for key, value in info.items() if key != "content"}
+        entry["offset"], entry["length"] = offset, len(blob)
+        entries[path] = entry
+        offset += len(blob)
+    contents = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    return {"contents": share_array(contents, contents_path), "entries": entries}
+
+class MappedFileInfo(dict):
+    """
+    File index entry whose "content" is not held in memory: each access decodes the file's bytes
+    from the memory-mapped contents array, so the process keeps only the metadata and the page
+    cache holds the text.
+    """
+    
+    def __init__(self, entry: Dict[str, Any], contents):
+        super().__init__(entry)
+        self._contents = contents
+    
+    def __missing__(self, key):
+        if key != "content":
+            raise KeyError(key)
+        offset, length = self["offset"], self["length"]
+        return self._contents[offset:offset + length].tobytes().decode("utf-8")
+    
+    def get(self, key, default=None):
+        return self[key] if key == "content" else super().get(key, default)
+
+def load_file_index(shared_index: Dict[str, Any]) -> Dict[str, Dict]:
+    """The file index built by build_file_index over the memory-mapped contents array (file
+    contents are decoded on access, see MappedFileInfo); pass it to
+    IntelligentSearchEngine(file_index=...)."""
+    contents = shared_index["contents"].load()
+    return {path: MappedFileInfo(entry, contents) for path, entry in shared_index["entries"].items()}
+
+def compute_file_embeddings(job: Dict[str, Any]) -> SharedArray:
+    """
+    Embed the given files and store the matrix at job["output_path"].
+    
+    Runs in a pipeline worker process. The worker reads the files itself, so only paths are
+    pickled in, and only a SharedArray handle comes back; the caller maps the .npy file.
+    """
+    file_contents = [Path(path).read_text(encoding="utf-8", errors="ignore") for path in job["paths"]]
+    embeddings = _load_embedding_model().encode(file_contents) if file_contents else np.zeros((0, 0), dtype=np.float32)
+    return share_array(embeddings, job["output_path"])
 
 @dataclass
 class TelemetryInfrastructure:
@@ -58,6 +133,18 @@ class SearchResult:
     context_snippets: List[str]
     confidence: float
 
+@dataclass
+class StrategyMetrics:
+    """Cost and yield of one search strategy (or analysis phase) in a multi_modal_search call."""
+    strategy: str
+    wall_time: float = 0.0
+    files_scanned: int = 0       # file visits; a file scanned once per target counts once per target
+    bytes_read: int = 0          # bytes of file content examined
+    regex_evaluations: int = 0
+    candidates: int = 0          # results the strategy produced
+    surviving: int = 0           # of those files, how many remain after _consolidate_results
+    returned: int = 0            # of those files, how many made the final top_k
+
 @dataclass
 class DomainKnowledge:
     """Domain-specific knowledge for C# and OpenTelemetry."""
@@ -69,29 +156,42 @@ class DomainKnowledge:
 class IntelligentSearchEngine:
     """Advanced search engine with domain knowledge and multi-modal search."""
     
-    def __init__(self, repo_path: Path, code_graph_path: Optional[Path] = None):
+    def __init__(self, repo_path: Path, code_graph_path: Optional[Path] = None,
+                 file_index: Optional[Dict[str, Dict]] = None):
         # Ensure repo_path is a Path object
         self.repo_path = Path(repo_path) if isinstance(repo_path, str) else repo_path
         self.code_graph_path = code_graph_path
-        print(f"[DEBUG] IntelligentSearchEngine.__init__: Initializing with repo_path={self.repo_path}, code_graph_path={code_graph_path}")
+        logger.debug("IntelligentSearchEngine.__init__: Initializing with repo_path=%s, code_graph_path=%s", self.repo_path, code_graph_path)
         
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
         self.domain_knowledge = self._load_domain_knowledge()  # Load domain knowledge first
         self.telemetry_configs = self._load_telemetry_configuration_knowledge()
-        self.file_index = self._build_file_index()  # Then build file index (needs domain knowledge)
+        # Then build file index (needs domain knowledge), unless it was built in a worker process
+        self.file_index = file_index if file_index is not None else self._build_file_index()
+        
+        # Per-strategy cost accounting for the most recent multi_modal_search
+        self.last_search_metrics: Dict[str, Any] = {}
+        self._active_metrics: Optional[StrategyMetrics] = None
+        self._strategy_metrics: Dict[str, StrategyMetrics] = {}
+        self._strategy_candidates: Dict[str, Set[str]] = {}
+        
+        # Precomputed file embeddings (memory-mapped), see set_file_embeddings and
+        # set_file_embedding_provider
+        self.file_embeddings = None
+        self.file_embedding_paths: List[str] = []
+        self._embedding_provider: Optional[Callable[[List[str]], SharedArray]] = None
         
         # Use shared code graph manager
         self.code_graph_data = None
         if code_graph_path:
-            print(f"[DEBUG] IntelligentSearchEngine.__init__: Loading code graph data from {code_graph_path}")
+            logger.debug("IntelligentSearchEngine.__init__: Loading code graph data from %s", code_graph_path)
             self.code_graph_data = code_graph_manager.get_graph_data(str(code_graph_path))
             self.code_graph = self.code_graph_data.raw_data if self.code_graph_data else None
             if self.code_graph_data:
-                print(f"[DEBUG] IntelligentSearchEngine.__init__: Code graph loaded successfully")
+                logger.debug("IntelligentSearchEngine.__init__: Code graph loaded successfully")
             else:
-                print(f"[DEBUG] IntelligentSearchEngine.__init__: Failed to load code graph")
+                logger.debug("IntelligentSearchEngine.__init__: Failed to load code graph")
         else:
-            print(f"[DEBUG] IntelligentSearchEngine.__init__: No code graph path provided")
+            logger.debug("IntelligentSearchEngine.__init__: No code graph path provided")
             self.code_graph = None
         # --- domain-aware booster knobs (safe defaults) ---
         self.signal_boost_enabled = True
@@ -100,6 +200,21 @@ class IntelligentSearchEngine:
         self.signal_boost_log = False                  # set True to print per-file boosts
 
         
+    @property
+    def model(self) -> SentenceTransformer:
+        """Embedding model, loaded on first use (indexing alone does not need it)."""
+        return _load_embedding_model()
+    
+    def set_file_embeddings(self, paths: List[str], embeddings: SharedArray) -> None:
+        """Use embeddings computed by compute_file_embeddings instead of encoding files at search time."""
+        self.file_embedding_paths = list(paths)
+        self.file_embeddings = embeddings.load()
+    
+    def set_file_embedding_provider(self, provider: Callable[[List[str]], SharedArray]) -> None:
+        """Compute file embeddings with `provider` (e.g. compute_file_embeddings in a worker process),
+        called only when semantic search actually runs."""
+        self._embedding_provider = provider
+        
     def _load_domain_knowledge(self) -> DomainKnowledge:
         """Load domain-specific knowledge patterns."""
         return DomainKnowledge(
@@ -484,6 +599,7 @@ class IntelligentSearchEngine:
         # Find telemetry configuration files
         for file_path, file_info in self.file_index.items():
             content = file_info["content"]
+            self._record_scan(content)
             
             # Check if this file configures telemetry
             if any(pattern in content for pattern in self.domain_knowledge.telemetry_patterns["configuration"]):
@@ -638,6 +754,7 @@ options.{method_name}(o =>
         spans = []
         for file_path, file_info in self.file_index.items():
             content = file_info["content"]
+            self._record_scan(content, regex_evaluations=1)
             # Look for Activity.StartActivity calls
             import re
             span_matches = re.findall(r'StartActivity\s*\(\s*["\']([^"\']+)["\']', content)
@@ -649,6 +766,7 @@ options.{method_name}(o =>
         attributes = []
         for file_path, file_info in self.file_index.items():
             content = file_info["content"]
+            self._record_scan(content, regex_evaluations=1)
             # Look for SetTag calls
             import re
             attr_matches = re.findall(r'SetTag\s*\(\s*["\']([^"\']+)["\']', content)
@@ -664,7 +782,8 @@ options.{method_name}(o =>
         index = {}
         
         for cs_file in self.repo_path.rglob("*.cs"):
-            if cs_file.stat().st_size == 0:
+            stat = cs_file.stat()
+            if stat.st_size == 0:
                 continue
             
             # UNIVERSAL IMPROVEMENT: Filter out irrelevant files
@@ -677,7 +796,8 @@ options.{method_name}(o =>
                 index[str(cs_file)] = {
                     "path": cs_file,
                     "content": content,
-                    "size": cs_file.stat().st_size,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
                     "keywords": self._extract_keywords(content),
                     "patterns": self._identify_patterns(content),
                     "imports": self._extract_imports(content),
@@ -685,10 +805,20 @@ options.{method_name}(o =>
                     "methods": self._extract_methods(content)
                 }
             except Exception as e:
-                print(f"Warning: Could not index file {cs_file}: {e}")
+                logger.warning("Could not index file %s: %s", cs_file, e)
         
         return index
     
+    def get_index_version(self) -> str:
+        """
+        Cheap version stamp of the file index (paths, sizes and modification times, no content),
+        used to key cached search results.
+        """
+        if getattr(self, "_index_version", None) is None:
+            entries = sorted((path, info["size"], info["mtime"]) for path, info in self.file_index.items())
+            self._index_version = hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+        return self._index_version
+    
     def _should_exclude_file(self, file_path: Path) -> bool:
         """
         UNIVERSAL IMPROVEMENT: Determine if a file should be excluded from search.
@@ -839,15 +969,65 @@ options.{method_name}(o =>
         NEW APPROACH: Configuration-first, then custom code.
         Analyze existing telemetry infrastructure before suggesting custom solutions.
         """
+        with tracer.start_span("search.multi_modal", attributes={
+            "search.files_indexed": len(self.file_index),
+            "search.top_k": top_k,
+            "search.graph_available": bool(self.code_graph)
+        }) as span:
+            ranked_results = self._multi_modal_search(intent, top_k)
+            span.set_attribute("search.results", len(ranked_results))
+            return ranked_results
+    
+    @contextmanager
+    def _measure(self, name: str):
+        """Collect StrategyMetrics for one phase of the search, inside its own trace span."""
+        metrics = StrategyMetrics(strategy=name)
+        self._strategy_metrics[name] = metrics
+        self._active_metrics = metrics
+        start_time = time.perf_counter()
+        try:
+            with tracer.start_span(f"search.strategy.{name}", attributes={"search.strategy": name}) as span:
+                yield metrics
+                span.set_attributes({
+                    "search.files_scanned": metrics.files_scanned,
+                    "search.bytes_read": metrics.bytes_read,
+                    "search.regex_evaluations": metrics.regex_evaluations,
+                    "search.candidates": metrics.candidates
+                })
+        finally:
+            metrics.wall_time = time.perf_counter() - start_time
+            self._active_metrics = None
+    
+    def _record_scan(self, content: str = "", regex_evaluations: int = 0) -> None:
+        """Count one file visit towards the strategy currently being measured."""
+        metrics = self._active_metrics
+        if metrics is not None:
+            metrics.files_scanned += 1
+            metrics.bytes_read += len(content)
+            metrics.regex_evaluations += regex_evaluations
+    
+    def _run_strategy(self, name: str, strategy: Callable[..., List[SearchResult]], *args) -> List[SearchResult]:
+        """Run one search strategy and record its cost and the files it proposed."""
+        with self._measure(name) as metrics:
+            results = strategy(*args)
+            metrics.candidates = len(results)
+        self._strategy_candidates[name] = {str(result.file_path) for result in results}
+        return results
+    
+    def _multi_modal_search(self, intent: Dict, top_k: int) -> List[SearchResult]:
         all_results = []
+        self._strategy_metrics = {}
+        self._strategy_candidates = {}
+        search_start = time.perf_counter()
         
         # UNIVERSAL IMPROVEMENT 1: Infrastructure Analysis First
-        infrastructure = self.analyze_telemetry_infrastructure()
-        config_solution = self.suggest_configuration_solution(intent.get("description", ""), infrastructure)
+        with self._measure("infrastructure_analysis"):
+            infrastructure = self.analyze_telemetry_infrastructure()
+            config_solution = self.suggest_configuration_solution(intent.get("description", ""), infrastructure)
         
         if config_solution:
             # If we have a configuration solution, prioritize telemetry config files
-            all_results.extend(self._find_telemetry_configuration_files(top_k // 2))
+            all_results.extend(self._run_strategy("configuration", self._find_telemetry_configuration_files, top_k // 2))
             
             # Add metadata about the suggested solution
             for result in all_results[:5]:  # Top 3 results get the config suggestion
@@ -855,43 +1035,62 @@ options.{method_name}(o =>
                 result.relevance_score += 20  # Boost relevance
         
         # Strategy 1: Direct Method/Class Search (HIGHEST PRIORITY)
-        direct_results = self._direct_code_search(intent, top_k // 3)
+        direct_results = self._run_strategy("direct_code", self._direct_code_search, intent, top_k // 3)
         all_results.extend(direct_results)
         
         # Strategy 2: Telemetry Infrastructure Discovery (HIGH PRIORITY)
-        infrastructure_results = self._telemetry_infrastructure_search(intent, top_k // 4)
+        infrastructure_results = self._run_strategy("telemetry_infrastructure", self._telemetry_infrastructure_search, intent, top_k // 4)
         all_results.extend(infrastructure_results)
         
         # Strategy 3: Structural Search (based on static analysis query)
         if intent.get("static_analysis_query"):
-            structural_results = self._structural_search(intent, top_k // 4)
+            structural_results = self._run_strategy("structural", self._structural_search, intent, top_k // 4)
             all_results.extend(structural_results)
         
         # Strategy 4: Pattern-Based Search
-        pattern_results = self._pattern_search(intent, top_k // 4)
+        pattern_results = self._run_strategy("pattern", self._pattern_search, intent, top_k // 4)
         all_results.extend(pattern_results)
         
         # Strategy 5: Keyword Search
-        keyword_results = self._keyword_search(intent, top_k // 4)
+        keyword_results = self._run_strategy("keyword", self._keyword_search, intent, top_k // 4)
         all_results.extend(keyword_results)
         
         # Strategy 6: Semantic Search (FALLBACK ONLY)
         if len(all_results) < top_k // 2:
-            semantic_results = self._semantic_search(intent, top_k // 2)
+            semantic_results = self._run_strategy("semantic", self._semantic_search, intent, top_k // 2)
             all_results.extend(semantic_results)
         
         # Strategy 7: Graph-Based Search (if code graph available)
         if self.code_graph:
-            graph_results = self._graph_based_search(intent, top_k // 4)
+            graph_results = self._run_strategy("graph", self._graph_based_search, intent, top_k // 4)
             all_results.extend(graph_results)
         
         # Consolidate and rank results
+        consolidation_start = time.perf_counter()
         consolidated_results = self._consolidate_results(all_results)
         
         # Apply domain-specific ranking
-        ranked_results = self._apply_domain_ranking(consolidated_results, intent)
+        ranked_results = self._apply_domain_ranking(consolidated_results, intent)[:top_k]
+        consolidation_time = time.perf_counter() - consolidation_start
+        
+        surviving_files = {str(result.file_path) for result in consolidated_results}
+        returned_files = {str(result.file_path) for result in ranked_results}
+        for name, candidate_files in self._strategy_candidates.items():
+            self._strategy_metrics[name].surviving = len(candidate_files & surviving_files)
+            self._strategy_metrics[name].returned = len(candidate_files & returned_files)
+        
+        self.last_search_metrics = {
+            "files_indexed": len(self.file_index),
+            "top_k": top_k,
+            "total_wall_time": time.perf_counter() - search_start,
+            "consolidation_wall_time": consolidation_time,
+            "candidates": len(all_results),
+            "consolidated": len(consolidated_results),
+            "returned": len(ranked_results),
+            "strategies": [asdict(metrics) for metrics in self._strategy_metrics.values()]
+        }
         
-        return ranked_results[:top_k]
+        return ranked_results
 
     
     def _semantic_search(self, intent: Dict, top_k: int) -> List[SearchResult]:
@@ -912,7 +1111,14 @@ options.{method_name}(o =>
         
         # Generate embeddings
         query_embedding = self.model.encode([enhanced_query])
-        file_embeddings = self.model.encode(file_contents)
+        if self._embedding_provider is not None and self.file_embedding_paths != file_paths:
+            self.set_file_embeddings(file_paths, self._embedding_provider(file_paths))
+        if self.file_embeddings is not None and self.file_embedding_paths == file_paths:
+            file_embeddings = self.file_embeddings
+        else:
+            file_embeddings = self.model.encode(file_contents)
+            for content in file_contents:
+                self._record_scan(content)
         
         # Calculate similarities
         similarities = cosine_similarity(query_embedding, file_embeddings)[0]
@@ -1009,6 +1215,7 @@ options.{method_name}(o =>
                 
             for file_path, file_data in self.file_index.items():
                 content = file_data["content"]
+                self._record_scan(content, regex_evaluations=1)
                 
                 # Count exact matches
                 exact_matches = len(re.findall(re.escape(target), content, re.IGNORECASE))
@@ -1070,6 +1277,7 @@ options.{method_name}(o =>
         
         for file_path, file_data in self.file_index.items():
             content = file_data["content"]
+            self._record_scan(content)
             imports = file_data.get("imports", [])
             patterns = file_data.get("patterns", [])
             
@@ -1130,6 +1338,7 @@ options.{method_name}(o =>
         if search_method:
             for file_path, file_data in self.file_index.items():
                 content = file_data["content"]
+                self._record_scan(content)
                 
                 # Search for method calls
                 if search_method in content:
@@ -1176,6 +1385,7 @@ options.{method_name}(o =>
         
         # Search for patterns in files
         for file_path, file_data in self.file_index.items():
+            self._record_scan()
             patterns_found = file_data.get("patterns", [])
             matching_patterns = []
             
@@ -1209,13 +1419,15 @@ options.{method_name}(o =>
         
         for file_path, file_data in self.file_index.items():
             content = file_data["content"]
+            self._record_scan(content)
+            content_lower = content.lower()
             file_keywords = file_data.get("keywords", [])
             
             matches = 0
             matched_keywords = []
             
             for keyword in keywords:
-                if keyword.lower() in content.lower() or keyword in file_keywords:
+                if keyword.lower() in content_lower or keyword in file_keywords:
                     matches += 1
                     matched_keywords.append(keyword)
             
@@ -1237,24 +1449,27 @@ options.{method_name}(o =>
     
     def _graph_based_search(self, intent: Dict, top_k: int) -> List[SearchResult]:
         """Search using code graph relationships."""
-        print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Starting graph-based search with top_k={top_k}")
+        logger.debug("IntelligentSearchEngine._graph_based_search: Starting graph-based search with top_k=%s", top_k)
         if not self.code_graph_data:
-            print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: No code graph data available")
+            logger.debug("IntelligentSearchEngine._graph_based_search: No code graph data available")
             return []
         
-        print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Code graph data available, processing {len(self.code_graph_data.symbols_by_file)} files")
+        logger.debug("IntelligentSearchEngine._graph_based_search: Code graph data available, processing %s files", len(self.code_graph_data.symbols_by_file))
         results = []
         
         # Extract telemetry-related terms from intent
         telemetry_terms = self._extract_telemetry_terms(intent)
-        print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Extracted telemetry terms: {telemetry_terms}")
+        logger.debug("IntelligentSearchEngine._graph_based_search: Extracted telemetry terms: %s", telemetry_terms)
+        
+        # Per-file events are sampled: a few examples of each, then counts at the end
+        events = EventSampler(logger, "IntelligentSearchEngine._graph_based_search")
         
         # Use cached symbols_by_file for efficient iteration
         for file_path, symbols in self.code_graph_data.symbols_by_file.items():
-            print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Processing file: {file_path}")
+            self._record_scan()
             # Skip if no file path
             if not file_path:
-                print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Skipping file with empty path")
+                events.log("empty_path", "IntelligentSearchEngine._graph_based_search: Skipping file with empty path")
                 continue
                 
             # Convert to Path object
@@ -1263,7 +1478,7 @@ options.{method_name}(o =>
             if not path_obj.is_absolute():
                path_obj = (self.repo_path / file_path).resolve()
             if not path_obj.exists():
-               print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: File does not exist (after resolve): {path_obj}")
+               events.log("missing_file", "IntelligentSearchEngine._graph_based_search: File does not exist (after resolve): %s", path_obj)
                continue
             
             # Calculate relevance based on multiple factors for this file
@@ -1276,7 +1491,7 @@ options.{method_name}(o =>
                 relevance_score += 30
                 matching_patterns.append("telemetry_file_pattern")
                 reasoning_parts.append("file path indicates telemetry functionality")
-                print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Found telemetry pattern in file path: {file_path}")
+                events.log("telemetry_path", "IntelligentSearchEngine._graph_based_search: Found telemetry pattern in file path: %s", file_path)
             
             # 2. Check for HTTP/Web application patterns (key for ScmHttpApplication.cs)
             if any(term.lower() in file_path.lower() for term in ["http", "web", "application", "middleware", "startup"]):
@@ -1295,7 +1510,7 @@ options.{method_name}(o =>
                 relevance_score += 35
                 matching_patterns.append("semantic_conventions_pattern")
                 reasoning_parts.append("file contains semantic conventions for telemetry attributes")
-                print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Found semantic conventions file: {file_path}")
+                events.log("semantic_conventions", "IntelligentSearchEngine._graph_based_search: Found semantic conventions file: %s", file_path)
             
             # 4. Analyze symbols in this file for telemetry connections
             file_symbol_score = 0
@@ -1316,7 +1531,7 @@ options.{method_name}(o =>
                     file_symbol_score += 15
                     file_symbol_patterns.append(f"http_constant_{symbol_name}")
                     file_symbol_reasoning.append(f"contains HTTP-related constant: {symbol_name}")
-                    print(f"[DEBUG] IntelligentSearchEngine._graph_based_search: Found HTTP constant: {symbol_name} in {file_path}")
+                    events.log("http_constant", "IntelligentSearchEngine._graph_based_search: Found HTTP constant: %s in %s", symbol_name, file_path)
                 
                 # Check symbol relationships for telemetry connections
                 relationships = symbol.get("Relationships", [])
@@ -1350,56 +1565,55 @@ options.{method_name}(o =>
                     context_snippets=[]  # Graph-based search doesn't provide snippets
                 ))
         
+        events.summary()
+        
         # Sort by relevance and return top_k
         results.sort(key=lambda x: x.relevance_score, reverse=True)
         return results[:top_k]
     
     def _extract_telemetry_terms(self, intent: Dict) -> List[str]:
         """Extract telemetry-related terms from intent."""
-        print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Extracting terms from intent: {intent}")
         terms = ["telemetry", "tracing", "span", "otel", "opentelemetry", "diagnostic"]
         
         # Add terms from intent
         if "static_analysis_query" in intent:
             static_query = intent["static_analysis_query"]
-            print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Processing static_analysis_query: {static_query}")
+            logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Processing static_analysis_query: %s", static_query)
             
             # Handle both string and dictionary formats
             if isinstance(static_query, dict):
                 # Extract text from dictionary values
                 query_text = " ".join(str(v).lower() for v in static_query.values())
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Converted dict to text: {query_text}")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Converted dict to text: %s", query_text)
             else:
                 # Handle string format
                 query_text = str(static_query).lower()
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Using string format: {query_text}")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Using string format: %s", query_text)
             
             if "span" in query_text:
                 terms.extend(["span", "activity", "StartActivity"])
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Added span-related terms")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Added span-related terms")
             if "attribute" in query_text or "tag" in query_text or "settag" in query_text:
                 terms.extend(["attribute", "tag", "SetAttribute", "SetTag"])
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Added attribute-related terms")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Added attribute-related terms")
             if "trace" in query_text:
                 terms.extend(["trace", "tracing"])
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Added trace-related terms")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Added trace-related terms")
             if "http" in query_text:
                 terms.extend(["http", "web", "request", "response", "redirect"])
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Added HTTP-related terms")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Added HTTP-related terms")
             if "referer" in query_text or "referrer" in query_text:
                 terms.extend(["referer", "referrer", "HTTP_REFERER"])
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Added referer-related terms")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Added referer-related terms")
             if "redirect" in query_text:
                 terms.extend(["redirect", "location", "HTTP_RESPONSE_REDIRECT_LOCATION"])
-                print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Added redirect-related terms")
+                logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Added redirect-related terms")
         
-        print(f"[DEBUG] IntelligentSearchEngine._extract_telemetry_terms: Final terms: {terms}")
+        logger.debug("IntelligentSearchEngine._extract_telemetry_terms: Final terms: %s", terms)
         return terms
     
     def _is_semantic_conventions_file(self, file_path: str, symbols: List[Dict]) -> bool:
         """Detect if this file contains semantic conventions or constants for telemetry."""
-        print(f"[DEBUG] IntelligentSearchEngine._is_semantic_conventions_file: Checking {file_path}")
-        
         # Check file name patterns
         file_name = file_path.lower()
         is_conventions_file = any(term in file_name for term in [
@@ -1419,10 +1633,7 @@ options.{method_name}(o =>
             for name in symbol_names
         )
         
-        result = is_conventions_file and has_constants and has_relevant_constants
-        print(f"[DEBUG] IntelligentSearchEngine._is_semantic_conventions_file: conventions_file={is_conventions_file}, has_constants={has_constants}, relevant_constants={has_relevant_constants}, result={result}")
-        
-        return result
+        return is_conventions_file and has_constants and has_relevant_constants
     
     def _consolidate_results(self, all_results: List[SearchResult]) -> List[SearchResult]:
         """
@@ -1437,7 +1648,7 @@ options.{method_name}(o =>
             
             # UNIVERSAL IMPROVEMENT: Reality check - does the file actually exist?
             if not result.file_path.exists():
-                print(f"Warning: Search result points to non-existent file: {file_path}")
+                logger.warning("Search result points to non-existent file: %s", file_path)
                 continue
             
             # UNIVERSAL IMPROVEMENT: Additional quality checks
@@ -1559,6 +1770,7 @@ options.{method_name}(o =>
         
         for file_path, file_info in self.file_index.items():
             content = file_info["content"]
+            self._record_scan(content)
             
             # Look for telemetry configuration patterns
             telemetry_score = 0
@@ -1,7 +1,10 @@
+import logging
 import os
 from jira import JIRA
 import re
 
+logger = logging.getLogger(__name__)
+
 def get_formatted_ticket_text(ticket_key: str) -> str:
     """
     Connects to Jira, fetches a ticket, and formats the key fields
@@ -35,10 +38,10 @@ def get_formatted_ticket_text(ticket_key: str) -> str:
         return formatted_text
         
     except KeyError:
-        print("Error: Please set JIRA_SERVER, JIRA_USER_EMAIL, and JIRA_API_TOKEN environment variables.")
+        logger.error("Error: Please set JIRA_SERVER, JIRA_USER_EMAIL, and JIRA_API_TOKEN environment variables.")
         return ""
     except Exception as e:
-        print(f"An error occurred while fetching the Jira ticket '{ticket_key}': {e}")
+        logger.error("An error occurred while fetching the Jira ticket '%s': %s", ticket_key, e)
         return ""
     
 
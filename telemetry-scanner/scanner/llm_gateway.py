@@ -0,0 +1,466 @@
+"""
+Shared LLM gateway for the scanner.
+
+Every module sends its chat completions through one `LLMGateway` (see `get_llm_gateway`):
+
+- one sync and one async Azure OpenAI client per process, each over a pooled keep-alive HTTP
+  connection pool, instead of a client (and connection pool) per module or per call;
+- a global cap on requests in flight, shared by threads and coroutines;
+- an optional token-bucket limit on requests per minute;
+- retries on rate limits, server errors and connection failures that honour the server's
+  `Retry-After` / `retry-after-ms` headers, falling back to exponential backoff with jitter. A
+  `Retry-After` pauses every caller, not only the one that was throttled;
+- an optional disk-backed response cache keyed by the request (model, messages and parameters), so
+  re-running a ticket does not pay for identical prompts again. In replay mode the cache is
+  read-only and a miss raises `LLMReplayMiss` instead of calling the model;
+- an optional recorder that writes every request/response pair to a fixture directory, for the
+  offline stand-in server in `llm_standin`.
+
+Each call is traced as one `llm.chat_completion` span covering all of its attempts.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from openai import (
+    APIConnectionError, APIStatusError, AsyncAzureOpenAI, AzureOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+)
+from openai.types.chat import ChatCompletion
+
+from .pipeline_orchestrator import (
+    CACHE_SCHEMA_VERSION, PipelineCache, TokenBucket, atomic_write_bytes, default_cache_root
+)
+from .tracing import SpanKind, llm_span_attributes, record_llm_usage, tracer
+
+try:
+    import httpx
+except ImportError:  # Optional: without it the clients keep openai's default pool limits
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "2024-12-01-preview"
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 4
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# Longer Retry-After values are capped; the retry budget still bounds the total wait
+MAX_RETRY_AFTER = 120.0
+KEEPALIVE_EXPIRY = 60.0
+# Bump when the cached response format changes
+RESPONSE_CACHE_VERSION = 1
+# Sent with every request so recordings and the stand-in server know the call site
+OPERATION_HEADER = "X-Agent-Operation"
+
+class LLMCacheMode(Enum):
+    OFF = "off"
+    ON = "on"  # serve hits, call the model and store on a miss
+    REPLAY = "replay"  # serve hits only; a miss raises LLMReplayMiss
+
+class LLMReplayMiss(LookupError):
+    """Raised in replay mode for a request that has no cached response."""
+
+def request_fingerprint(request: Dict[str, Any]) -> str:
+    """Stable hash of a chat completion request body (model, messages and parameters)."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+class FixtureRecorder:
+    """
+    Writes request/response pairs as JSON fixtures (`<operation>-<fingerprint>.json`) with the
+    observed latency; identical requests overwrite each other.
+    """
+
+    def __init__(self, fixture_dir: Path):
+        self.fixture_dir = Path(fixture_dir)
+        self.fixture_dir.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+
+    def record(self, operation: str, request: Dict[str, Any], response: ChatCompletion,
+               latency: Optional[float]) -> None:
+        fingerprint = request_fingerprint(request)
+        fixture = {
+            "operation": operation,
+            "fingerprint": fingerprint,
+            "recorded_at": time.time(),
+            # None for responses served from the response cache
+            "latency": latency,
+            "request": request,
+            "response": response.model_dump()
+        }
+        try:
+            atomic_write_bytes(self.fixture_dir / f"{operation}-{fingerprint[:16]}.json",
+                               json.dumps(fixture, indent=2, default=str).encode("utf-8"))
+            self.recorded += 1
+        except OSError as e:
+            logger.warning("Could not record LLM fixture for %s: %s", operation, e)
+
+def default_llm_cache_dir() -> Path:
+    """Response cache next to the pipeline cache (shared by all runs)."""
+    return default_cache_root().parent / "llm"
+
+class LLMResponseCache(PipelineCache):
+    """
+    PipelineCache for chat completions. Entries are keyed by the request alone (model, messages and
+    parameters), not by the scanner code version, so editing search or ranking code keeps them valid;
+    a prompt that changes is a different key.
+    """
+
+    def make_key(self, stage_name: str, fingerprint: Dict[str, Any], version: int = RESPONSE_CACHE_VERSION) -> str:
+        key_material = json.dumps({
+            "kind": "chat_completion",
+            "version": version,
+            "schema": CACHE_SCHEMA_VERSION,
+            "request": fingerprint
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(key_material.encode()).hexdigest()
+
+    def get_response(self, operation: str, request: Dict[str, Any]) -> Optional[ChatCompletion]:
+        data = self.get(operation, request, RESPONSE_CACHE_VERSION)
+        return ChatCompletion.model_validate(data) if data is not None else None
+
+    def set_response(self, operation: str, request: Dict[str, Any], response: ChatCompletion) -> None:
+        self.set(operation, request, response.model_dump(), RESPONSE_CACHE_VERSION)
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds requested by `retry-after-ms` or `retry-after` (delta-seconds or HTTP date), if any."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class LLMGateway:
+    """
+    Process-wide entry point for chat completions with pooled clients, global limits and retries.
+
+    `chat_completion(**kwargs)` and `achat_completion(**kwargs)` take the same arguments as
+    `client.chat.completions.create`. Clients are created on first use, so the gateway can be
+    configured before the Azure settings are needed.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, requests_per_minute: float = 0,
+                 max_retries: int = DEFAULT_MAX_RETRIES, timeout: Optional[float] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = TokenBucket.per_minute(requests_per_minute, burst=self.max_concurrency) \
+            if requests_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.stats = {"requests": 0, "cache_hits": 0, "attempts": 0, "retries": 0, "throttled": 0, "failed": 0,
+                      "retry_wait_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._slot_released = threading.Condition(self._lock)
+        self._paused_until = 0.0
+        self.response_cache: Optional[LLMResponseCache] = None
+        self.cache_mode = LLMCacheMode.OFF
+        self.cache_skip_operations: set = set()
+        self.recorder: Optional[FixtureRecorder] = None
+        self._client: Optional[AzureOpenAI] = None
+        # Async HTTP pools belong to the event loop they were opened on
+        self._async_clients: Dict[asyncio.AbstractEventLoop, AsyncAzureOpenAI] = {}
+
+    def configure(self, max_concurrency: Optional[int] = None, requests_per_minute: Optional[float] = None,
+                  max_retries: Optional[int] = None, timeout: Optional[float] = None) -> "LLMGateway":
+        """Adjust limits in place; clients already created keep their connection pools."""
+        with self._lock:
+            if max_concurrency is not None:
+                self.max_concurrency = max(1, max_concurrency)
+                self._slot_released.notify_all()
+            if requests_per_minute is not None:
+                self.rate_limiter = TokenBucket.per_minute(requests_per_minute, burst=self.max_concurrency) \
+                    if requests_per_minute > 0 else None
+            if max_retries is not None:
+                self.max_retries = max_retries
+            if timeout is not None:
+                self.timeout = timeout
+        return self
+
+    def configure_cache(self, mode: LLMCacheMode, cache_dir: Optional[Path] = None,
+                        ttl_seconds: Optional[float] = 7 * 24 * 3600, max_bytes: int = 512 * 1024 * 1024,
+                        skip_operations: Iterable[str] = ()) -> "LLMGateway":
+        """
+        Enable the response cache (`on` or `replay`) or turn it off. `skip_operations` names call
+        sites (the calling function, e.g. `enhanced_patch_generation`) that always go to the model.
+        """
+        self.cache_mode = LLMCacheMode(mode)
+        self.cache_skip_operations = set(skip_operations)
+        if self.cache_mode is LLMCacheMode.OFF:
+            self.response_cache = None
+        else:
+            self.response_cache = LLMResponseCache(cache_dir or default_llm_cache_dir(),
+                                                   max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        return self
+
+    def configure_recording(self, fixture_dir: Optional[Path]) -> "LLMGateway":
+        """Record every completion (live or cached) to `fixture_dir`; None stops recording."""
+        self.recorder = FixtureRecorder(fixture_dir) if fixture_dir is not None else None
+        return self
+
+    def _request_options(self, operation: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        headers = dict(kwargs.get("extra_headers") or {})
+        headers[OPERATION_HEADER] = operation
+        return dict(kwargs, extra_headers=headers)
+
+    def _completed(self, operation: str, request: Dict[str, Any], response: ChatCompletion,
+                   latency: Optional[float], store: bool) -> None:
+        """Cache and record a completion (blocking file I/O)."""
+        if store:
+            self.response_cache.set_response(operation, request, response)
+        if self.recorder is not None:
+            self.recorder.record(operation, request, response, latency)
+
+    def _uses_cache(self, operation: str, cache: bool) -> bool:
+        return cache and self.response_cache is not None and operation not in self.cache_skip_operations
+
+    def _cache_miss(self, operation: str) -> None:
+        if self.cache_mode is LLMCacheMode.REPLAY:
+            self._bump("failed")
+            raise LLMReplayMiss(f"No cached LLM response for {operation} (replay mode)")
+
+    # ------------------------------------------------------------------
+    # Clients
+    # ------------------------------------------------------------------
+    def _client_options(self) -> Dict[str, Any]:
+        options = {
+            "api_key": os.environ.get("AZURE_OPENAI_API_KEY"),
+            "api_version": API_VERSION,
+            "azure_endpoint": os.environ.get("AZURE_OPENAI_ENDPOINT"),
+            # Retries are handled here so they share the global limits
+            "max_retries": 0
+        }
+        if self.timeout is not None:
+            options["timeout"] = self.timeout
+        return options
+
+    def _pool_options(self) -> Dict[str, Any]:
+        if httpx is None:
+            return {}
+        return {"limits": httpx.Limits(max_connections=self.max_concurrency * 2,
+                                       max_keepalive_connections=self.max_concurrency,
+                                       keepalive_expiry=KEEPALIVE_EXPIRY)}
+
+    @property
+    def client(self) -> AzureOpenAI:
+        with self._lock:
+            if self._client is None:
+                self._client = AzureOpenAI(http_client=DefaultHttpxClient(**self._pool_options()),
+                                           **self._client_options())
+            return self._client
+
+    @property
+    def async_client(self) -> AsyncAzureOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for other in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[other]
+            if loop not in self._async_clients:
+                self._async_clients[loop] = AsyncAzureOpenAI(http_client=DefaultAsyncHttpxClient(**self._pool_options()),
+                                                             **self._client_options())
+            return self._async_clients[loop]
+
+    # ------------------------------------------------------------------
+    # Limits and retries
+    # ------------------------------------------------------------------
+    def _try_acquire_slot(self) -> bool:
+        # Called with the lock held
+        if self._in_flight < self.max_concurrency:
+            self._in_flight += 1
+            return True
+        return False
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._slot_released.notify()
+
+    def _pause_remaining(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after `error`, or None if it should not be retried."""
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, APIStatusError):
+            if error.status_code not in RETRY_STATUS_CODES:
+                return None
+            retry_after = parse_retry_after(getattr(error.response, "headers", None))
+            if retry_after is not None:
+                delay = min(retry_after, MAX_RETRY_AFTER)
+                with self._lock:
+                    self.stats["throttled"] += 1
+                    # The deployment is throttled for everyone: hold back all callers
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                return delay
+        elif not isinstance(error, APIConnectionError):
+            return None
+        return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * (0.5 + random.random() / 2)
+
+    def _record_retry(self, operation: str, error: Exception, attempt: int, delay: float) -> None:
+        self._bump("retries")
+        self._bump("retry_wait_seconds", delay)
+        logger.warning("%s: LLM request failed (%s); retry %s/%s in %.1fs",
+                       operation, error, attempt + 1, self.max_retries, delay)
+
+    def _bump(self, stat: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
+
+    # ------------------------------------------------------------------
+    # Entry points
+    # ------------------------------------------------------------------
+    def chat_completion(self, operation: Optional[str] = None, cache: bool = True, **kwargs):
+        """
+        Blocking chat completion. `operation` names the call site in traces and cache settings
+        (default: the calling function); `cache=False` bypasses the response cache for this call.
+        """
+        operation = operation or sys._getframe(1).f_code.co_name
+        self._bump("requests")
+        with tracer.start_span("llm.chat_completion", kind=SpanKind.CLIENT,
+                               attributes=llm_span_attributes(operation, kwargs)) as span:
+            use_cache = self._uses_cache(operation, cache)
+            if use_cache:
+                cached = self.response_cache.get_response(operation, kwargs)
+                span.set_attributes({"llm.cache_hit": cached is not None})
+                if cached is not None:
+                    self._bump("cache_hits")
+                    self._completed(operation, kwargs, cached, None, store=False)
+                    return cached
+                self._cache_miss(operation)
+
+            request = self._request_options(operation, kwargs)
+            for attempt in range(self.max_retries + 1):
+                time.sleep(self._pause_remaining())
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire_sync()
+                with self._lock:
+                    while not self._try_acquire_slot():
+                        self._slot_released.wait()
+                self._bump("attempts")
+                started = time.perf_counter()
+                try:
+                    response = self.client.chat.completions.create(**request)
+                    error = None
+                except Exception as e:
+                    error = e
+                finally:
+                    self._release_slot()
+                span.set_attributes({"llm.attempts": attempt + 1})
+
+                if error is None:
+                    record_llm_usage(span, response)
+                    self._completed(operation, kwargs, response, time.perf_counter() - started, store=use_cache)
+                    return response
+                delay = self._retry_delay(error, attempt)
+                if delay is None:
+                    self._bump("failed")
+                    raise error
+                self._record_retry(operation, error, attempt, delay)
+                time.sleep(delay)
+
+    async def achat_completion(self, operation: Optional[str] = None, cache: bool = True, **kwargs):
+        """Async chat completion on the event loop's pooled client; same limits and cache as `chat_completion`."""
+        operation = operation or sys._getframe(1).f_code.co_name
+        self._bump("requests")
+        with tracer.start_span("llm.chat_completion", kind=SpanKind.CLIENT,
+                               attributes=llm_span_attributes(operation, kwargs)) as span:
+            use_cache = self._uses_cache(operation, cache)
+            if use_cache:
+                cached = await asyncio.to_thread(self.response_cache.get_response, operation, kwargs)
+                span.set_attributes({"llm.cache_hit": cached is not None})
+                if cached is not None:
+                    self._bump("cache_hits")
+                    if self.recorder is not None:
+                        await asyncio.to_thread(self._completed, operation, kwargs, cached, None, False)
+                    return cached
+                self._cache_miss(operation)
+
+            request = self._request_options(operation, kwargs)
+            for attempt in range(self.max_retries + 1):
+                await asyncio.sleep(self._pause_remaining())
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                await self._acquire_slot_async()
+                self._bump("attempts")
+                started = time.perf_counter()
+                try:
+                    response = await self.async_client.chat.completions.create(**request)
+                    error = None
+                except Exception as e:
+                    error = e
+                finally:
+                    self._release_slot()
+                span.set_attributes({"llm.attempts": attempt + 1})
+
+                if error is None:
+                    record_llm_usage(span, response)
+                    latency = time.perf_counter() - started
+                    if use_cache or self.recorder is not None:
+                        await asyncio.to_thread(self._completed, operation, kwargs, response, latency, use_cache)
+                    return response
+                delay = self._retry_delay(error, attempt)
+                if delay is None:
+                    self._bump("failed")
+                    raise error
+                self._record_retry(operation, error, attempt, delay)
+                await asyncio.sleep(delay)
+
+    async def _acquire_slot_async(self) -> None:
+        # Slots are shared with blocking callers in other threads, so poll instead of awaiting a
+        # loop-bound primitive; cancellation while waiting leaves nothing acquired
+        delay = 0.005
+        while True:
+            with self._lock:
+                if self._try_acquire_slot():
+                    return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, max_concurrency=self.max_concurrency,
+                         requests_per_minute=self.rate_limiter.rate * 60 if self.rate_limiter else None,
+                         cache_mode=self.cache_mode.value,
+                         recorded=self.recorder.recorded if self.recorder is not None else None)
+        if self.response_cache is not None:
+            stats["cache"] = self.response_cache.get_stats()
+        return stats
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway() -> LLMGateway:
+    """The process-wide gateway, created with default limits on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+def configure_llm_gateway(**limits) -> LLMGateway:
+    """Set the process-wide gateway's limits (see `LLMGateway.configure`)."""
+    return get_llm_gateway().configure(**limits)
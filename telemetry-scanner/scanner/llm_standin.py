@@ -0,0 +1,248 @@
+"""
+Offline stand-in for the Azure OpenAI chat completions API.
+
+Serves the request/response pairs recorded by the LLM gateway (`enhanced_cli.py --llm-record DIR`),
+so the full pipeline can be run, benchmarked and load-tested without network access:
+
+    python -m scanner.llm_standin --fixtures runs/llm-fixtures --port 8089 --jitter 2
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=offline \\
+        python enhanced_cli.py <ticket> ... --llm-cache off
+
+Requests are matched on the fingerprint of their body (model, messages and parameters). A prompt
+that changed since it was recorded falls back to the recordings of the same call site (sent by the
+gateway in the X-Agent-Operation header), taken in turn; anything else gets a 404 unless
+`--default-response` is set. Each answer is delayed by the recorded latency (times
+`--latency-scale`) or a fixed `--latency`, plus uniform `--jitter`.
+
+`GET /stats` reports exact matches, fallbacks, misses and the peak number of requests in flight,
+i.e. the concurrency the pipeline actually achieved against the stand-in.
+
+Benchmarks embed the server (`start_background()`) with a `responder` that computes the answer to
+requests no fixture matches, so they need no recordings at all.
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm_gateway import OPERATION_HEADER, request_fingerprint
+from .log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8089
+# Used for fixtures without a recorded latency (recorded from the response cache)
+DEFAULT_LATENCY = 1.0
+
+# Answers a request body with the completion text and, optionally, its own latency in seconds;
+# None leaves the request unanswered
+Responder = Callable[[Dict[str, Any]], Optional[Tuple[str, Optional[float]]]]
+
+class FixtureStore:
+    """Recorded fixtures indexed by request fingerprint and by call site (empty without a directory)."""
+
+    def __init__(self, fixture_dir: Optional[Path] = None):
+        self.fixture_dir = Path(fixture_dir) if fixture_dir is not None else None
+        self.by_fingerprint: Dict[str, Dict[str, Any]] = {}
+        self.by_operation: Dict[str, List[Dict[str, Any]]] = {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        for path in sorted(self.fixture_dir.glob("*.json")) if self.fixture_dir is not None else []:
+            try:
+                fixture = json.loads(path.read_text(encoding="utf-8"))
+                fingerprint = fixture.get("fingerprint") or request_fingerprint(fixture["request"])
+                fixture["response"]["choices"]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("Skipping unreadable fixture %s: %s", path.name, e)
+                continue
+            self.by_fingerprint[fingerprint] = fixture
+            self.by_operation.setdefault(fixture.get("operation") or "unknown", []).append(fixture)
+
+    def __len__(self) -> int:
+        return len(self.by_fingerprint)
+
+    def match(self, request: Dict[str, Any], operation: Optional[str]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """The fixture for `request` and how it was found: "exact", "fallback" or "miss"."""
+        fixture = self.by_fingerprint.get(request_fingerprint(request))
+        if fixture is not None:
+            return fixture, "exact"
+        candidates = self.by_operation.get(operation or "")
+        if not candidates:
+            return None, "miss"
+        with self._lock:
+            index = self._next.get(operation, 0)
+            self._next[operation] = index + 1
+        return candidates[index % len(candidates)], "fallback"
+
+@dataclass
+class StandInStats:
+    requests: int = 0
+    exact: int = 0
+    fallback: int = 0
+    generated: int = 0
+    miss: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    delay_seconds: float = 0.0
+
+class StandInServer(ThreadingHTTPServer):
+    """OpenAI-compatible chat completions server answering from a FixtureStore."""
+
+    daemon_threads = True
+    # The default backlog of 5 would queue (and delay) concurrent clients beyond the fifth
+    request_queue_size = 128
+
+    def __init__(self, store: FixtureStore, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 latency: Optional[float] = None, latency_scale: float = 1.0, jitter: float = 0.0,
+                 default_response: Optional[str] = None, seed: Optional[int] = None,
+                 responder: Optional[Responder] = None):
+        super().__init__((host, port), _StandInHandler)
+        self.store = store
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.default_response = default_response
+        self.responder = responder
+        self.stats = StandInStats()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay_for(self, fixture: Optional[Dict[str, Any]], latency: Optional[float] = None) -> float:
+        if latency is not None:
+            base = latency
+        elif self.latency is not None:
+            base = self.latency
+        else:
+            recorded = fixture.get("latency") if fixture else None
+            base = (recorded if recorded is not None else DEFAULT_LATENCY) * self.latency_scale
+        with self._lock:
+            offset = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, base + offset)
+
+    def begin(self, outcome: str) -> None:
+        with self._lock:
+            self.stats.requests += 1
+            setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+            self.stats.in_flight += 1
+            self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+
+    def end(self, delay: float) -> None:
+        with self._lock:
+            self.stats.in_flight -= 1
+            self.stats.delay_seconds += delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(asdict(self.stats), fixtures=len(self.store))
+
+    def start_background(self) -> "StandInServer":
+        """Serve from a daemon thread (for benchmarks); stop with `shutdown()`."""
+        threading.Thread(target=self.serve_forever, name="llm-standin", daemon=True).start()
+        return self
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+
+    def do_POST(self):
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unsupported path {self.path}", "code": "not_found"}})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Request body is not JSON", "code": "bad_request"}})
+            return
+
+        operation = self.headers.get(OPERATION_HEADER)
+        fixture, outcome = self.server.store.match(request, operation)
+        reply = None
+        if fixture is None and self.server.responder is not None:
+            reply = self.server.responder(request)
+            if reply is not None:
+                outcome = "generated"
+        self.server.begin(outcome)
+        delay = self.server.delay_for(fixture, reply[1] if reply is not None else None)
+        try:
+            time.sleep(delay)
+            if fixture is not None:
+                self._send_json(200, fixture["response"])
+            elif reply is not None:
+                self._send_json(200, _completion(request.get("model"), reply[0]))
+            elif self.server.default_response is not None:
+                self._send_json(200, _completion(request.get("model"), self.server.default_response))
+            else:
+                self._send_json(404, {"error": {
+                    "message": f"No recorded response for {operation or 'this request'}",
+                    "code": "fixture_not_found"
+                }})
+        finally:
+            self.server.end(delay)
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/stats":
+            self._send_json(200, self.server.get_stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Unsupported path {self.path}", "code": "not_found"}})
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def _completion(model: Optional[str], content: str) -> Dict[str, Any]:
+    return {
+        "id": "standin", "object": "chat.completion", "created": int(time.time()), "model": model or "o3",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for Azure OpenAI chat completions, "
+                                                 "replaying fixtures recorded with --llm-record")
+    parser.add_argument("--fixtures", required=True, help="Fixture directory written by --llm-record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=None,
+                       help="Fixed response latency in seconds (default: each fixture's recorded latency)")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                       help="Multiply recorded latencies, e.g. 0.1 for a quick run")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                       help="Add uniform noise of +/- this many seconds to every response")
+    parser.add_argument("--default-response",
+                       help="Answer unmatched requests with this text instead of a 404")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the jitter, for repeatable runs")
+    args = parser.parse_args()
+
+    configure_logging()
+    store = FixtureStore(Path(args.fixtures))
+    server = StandInServer(store, args.host, args.port, latency=args.latency, latency_scale=args.latency_scale,
+                           jitter=args.jitter, default_response=args.default_response, seed=args.seed)
+    print(f"Serving {len(store)} recorded completions ({len(store.by_operation)} call sites) at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.get_stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
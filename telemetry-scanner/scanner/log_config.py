@@ -0,0 +1,112 @@
+"""
+Logging setup for the scanner package.
+
+Modules log through `logging.getLogger(__name__)` with lazy %-style arguments, so messages below the
+configured level cost neither I/O nor string formatting. Events that fire once per file or symbol in
+hot loops go through `EventSampler`, which logs the first few occurrences of each event and a count
+summary at the end instead of one line per item.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_LEVEL_ENV = "TELEMETRY_AGENT_LOG_LEVEL"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+PACKAGE_LOGGER = "scanner"
+
+# Per-event occurrences logged before an EventSampler only counts (-1 logs every event)
+DEFAULT_SAMPLE_SIZE = 5
+
+_sample_size = DEFAULT_SAMPLE_SIZE
+_console_handler: Optional[logging.Handler] = None
+
+def resolve_log_level(level: Union[str, int, None] = None) -> int:
+    """Numeric level from an explicit value, else $TELEMETRY_AGENT_LOG_LEVEL, else INFO."""
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV) or "INFO"
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level: {level}")
+    return value
+
+def configure_logging(level: Union[str, int, None] = None, sample_size: Optional[int] = None) -> int:
+    """
+    Install the console handler (once) and set the scanner package's level.
+
+    Calling it again without a level keeps the level already configured, so library entry points can
+    call it unconditionally without overriding the CLI. Third-party loggers stay at INFO or above even
+    when the scanner runs at DEBUG. Returns the effective scanner level.
+    """
+    global _console_handler, _sample_size
+
+    root = logging.getLogger()
+    package_logger = logging.getLogger(PACKAGE_LOGGER)
+
+    if _console_handler is None:
+        _console_handler = logging.StreamHandler()
+        _console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(_console_handler)
+        if level is None:
+            level = resolve_log_level()
+
+    if level is not None:
+        numeric = resolve_log_level(level)
+        package_logger.setLevel(numeric)
+        root.setLevel(max(numeric, logging.INFO))
+
+    if sample_size is not None:
+        _sample_size = sample_size
+
+    return package_logger.getEffectiveLevel()
+
+def add_log_file(path: Path) -> None:
+    """Also write log records to `path`; adding the same file twice is a no-op."""
+    path = Path(path).resolve()
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, logging.FileHandler) and Path(handler.baseFilename) == path:
+            return
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+
+def get_sample_size() -> int:
+    return _sample_size
+
+class EventSampler:
+    """
+    Sampled, aggregated logging for per-item events.
+
+    `log(event, msg, *args)` counts every occurrence of `event` but only emits the first
+    `sample_size` of them; `summary()` then emits one line with the count of each event. When the
+    level is disabled, `log` is a counter increment.
+    """
+
+    def __init__(self, logger: logging.Logger, scope: str, level: int = logging.DEBUG,
+                 sample_size: Optional[int] = None):
+        self.logger = logger
+        self.scope = scope
+        self.level = level
+        self.sample_size = _sample_size if sample_size is None else sample_size
+        self.counts: Dict[str, int] = {}
+        self._enabled = logger.isEnabledFor(level)
+
+    def log(self, event: str, msg: str, *args) -> None:
+        count = self.counts.get(event, 0) + 1
+        self.counts[event] = count
+        if self._enabled and (self.sample_size < 0 or count <= self.sample_size):
+            self.logger.log(self.level, msg, *args)
+            if count == self.sample_size:
+                self.logger.log(self.level, "%s: further '%s' events are counted only", self.scope, event)
+
+    def count(self, event: str) -> None:
+        self.counts[event] = self.counts.get(event, 0) + 1
+
+    def summary(self) -> None:
+        if self._enabled and self.counts:
+            self.logger.log(self.level, "%s: %s", self.scope,
+                            ", ".join(f"{event}={count}" for event, count in self.counts.items()))
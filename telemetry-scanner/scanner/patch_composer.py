@@ -4,34 +4,74 @@ Ask the LLM for the full, remediated code file plus an explanation.
 """
 from __future__ import annotations
 import json
-import os
-from typing import Tuple, List, Dict, Optional
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Dict
 from pathlib import Path
-from openai import AzureOpenAI
-
-# Lazy initialization of OpenAI client
-_client: Optional[AzureOpenAI] = None
-
-def get_openai_client() -> AzureOpenAI:
-    """Get or create the OpenAI client."""
-    global _client
-    if _client is None:
-        _client = AzureOpenAI(
-            api_version="2024-12-01-preview",
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        )
-    return _client
+from .context_packer import ContextPacker, estimate_tokens
+from .llm_gateway import get_llm_gateway
+from .source_compactor import compact_source, record_prompt_compaction, translate_diff
+from .token_counter import get_token_counter, prompt_budget, split_for_prompt
+
+logger = logging.getLogger(__name__)
 
 def compose_patch(intent: dict, file_contexts: List[Dict], model: str = "o3") -> Tuple[str, str]:
     """
     Asks the LLM to generate a single unified diff to fix a telemetry gap
     across multiple files.
+
+    The model sees compacted sources; its diff is translated back to the
+    original lines. One diff needs every file in one prompt, so files that do
+    not fit the prompt's token budget are packed tighter rather than split
+    across calls.
     """
+    sources = {context['path'].name: compact_source(context['content'], context['path'].name)
+               for context in file_contexts}
+    files = {name: view.text for name, view in sources.items()}
+    messages = _compose_patch_messages(intent, files)
+
+    budget = prompt_budget("compose_patch")
+    prompt_tokens = get_token_counter().count_messages(messages)
+    if budget <= 0 or prompt_tokens <= budget:
+        # Compaction savings are counted for views sent whole; a packed prompt carries only parts of them
+        for view in sources.values():
+            record_prompt_compaction(view)
+    else:
+        context_tokens = sum(estimate_tokens(text) for text in files.values())
+        context_budget = max(1, context_tokens - (prompt_tokens - budget))
+        logger.info("Patch prompt is %s tokens, over its %s-token budget; packing the files into %s tokens",
+                    prompt_tokens, budget, context_budget)
+        packed = ContextPacker().pack(files, intent, token_budget=context_budget)
+        messages = _compose_patch_messages(intent, packed.files, complete=packed.complete)
+        prompt_tokens = get_token_counter().count_messages(messages)
+        if prompt_tokens > budget:
+            logger.warning("Patch prompt is still %s tokens (budget %s): the file headers alone exceed it",
+                           prompt_tokens, budget)
+
+    response = get_llm_gateway().chat_completion(
+        model=model,
+        messages=messages
+    )
+    resp = response.choices[0].message.content.strip()
+
+    # Parsing logic for a diff block
+    diff_text, md_text = "", resp
+    if "```diff" in resp:
+        _before, after = resp.split("```diff", 1)
+        diff_block, remainder = after.split("```", 1)
+        diff_text = diff_block.strip()
+        md_text = remainder.strip() if remainder.strip() else _before.strip()
+
+    return translate_diff(diff_text, sources), md_text
+
+def _compose_patch_messages(intent: dict, files: Dict[str, str], complete: bool = True) -> List[Dict[str, str]]:
     code_context_str = ""
-    for context in file_contexts:
-        code_context_str += f"--- FILE: {context['path'].name} ---\n"
-        code_context_str += f"```csharp\n{context['content']}\n```\n\n"
+    for name, text in files.items():
+        code_context_str += f"--- FILE: {name} ---\n"
+        code_context_str += f"```csharp\n{text}\n```\n\n"
+    omitted_note = "" if complete else (
+        " Code outside the prompt budget is replaced by '... lines A-B omitted ...' markers; do not edit omitted lines."
+    )
 
     system_prompt = (
         "You are an expert .NET developer specializing in OpenTelemetry. "
@@ -52,27 +92,13 @@ def compose_patch(intent: dict, file_contexts: List[Dict], model: str = "o3") ->
         "## Intent\n"
         f"```json\n{json.dumps(intent, indent=2)}\n```\n\n"
         "## Full Code of Affected Files\n"
+        f"(Comments, #region markers, common usings and repeated blank lines are omitted; do not re-add them.{omitted_note})\n\n"
         f"{code_context_str}\n\n"
     )
-    
-    response = get_openai_client().chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    )
-    resp = response.choices[0].message.content.strip()
-
-    # Parsing logic for a diff block
-    diff_text, md_text = "", resp
-    if "```diff" in resp:
-        _before, after = resp.split("```diff", 1)
-        diff_block, remainder = after.split("```", 1)
-        diff_text = diff_block.strip()
-        md_text = remainder.strip() if remainder.strip() else _before.strip()
-
-    return diff_text, md_text
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
 
 def select_files_for_edit(intent: dict, candidate_contexts: List[Dict], model: str = "o3") -> List[Path]:
     """
@@ -81,41 +107,20 @@ def select_files_for_edit(intent: dict, candidate_contexts: List[Dict], model: s
     if not candidate_contexts:
         return []
 
-    code_context_str = ""
+    # Candidates that do not fit one prompt's token budget are judged in concurrent sub-batches
+    parts = split_for_prompt("select_files_for_edit", candidate_contexts,
+                             lambda contexts: _select_files_messages(intent, contexts))
+    if len(parts) > 1:
+        with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+            results = list(pool.map(lambda contexts: select_files_for_edit(intent, contexts, model), parts))
+        return list(dict.fromkeys(path for selected in results for path in selected))
+
     candidate_paths = {context['path'].name: context['path'] for context in candidate_contexts}
     for context in candidate_contexts:
-        code_context_str += f"--- CANDIDATE FILE: {context['path'].name} ---\n"
-        code_context_str += f"```csharp\n{context['content']}\n```\n\n"
-
-    # New Chain-of-Thought Prompt
-    prompt = (
-        "You are an expert software engineer analyzing a codebase to find all locations for a required change.\n\n"
-        "## Intent\n"
-        f"A user wants to make a change related to this topic: '{intent['semantic_description']}'\n\n"
-        "## Candidate Files and Their Full Code\n"
-        f"Here are the candidate files and their complete source code:\n\n{code_context_str}"
-        "## Your Task\n"
-        "Follow these steps to determine the correct files to modify:\n"
-        "1.  **Analysis:** For each candidate file, write a one-sentence analysis of its relevance to the user's intent.\n"
-        "2.  **Reasoning:** Based on your analysis, provide a step-by-step explanation for which file(s), if any, should be modified.\n"
-        "3.  **Final Answer:** Based on your reasoning, provide a final answer in a JSON block. The JSON should contain a single key, \"files\", with a list of the full names of the files you are highly confident should be changed. If none are correct, the list should be empty."
-        "\n\nRespond using the following markdown format:\n\n"
-        "### Analysis\n"
-        "- `FileA.cs`: [Your one-sentence analysis here.]\n"
-        "- `FileB.cs`: [Your one-sentence analysis here.]\n\n"
-        "### Reasoning\n"
-        "[Your step-by-step reasoning here.]\n\n"
-        "### Final Answer\n"
-        "```json\n"
-        "{\n"
-        "  \"files\": [\"FileB.cs\"]\n"
-        "}\n"
-        "```"
-    )
-
-    response = get_openai_client().chat.completions.create(
+        record_prompt_compaction(compact_source(context['content'], context['path'].name))
+    response = get_llm_gateway().chat_completion(
         model=model,
-        messages=[{"role": "user", "content": prompt}]
+        messages=_select_files_messages(intent, candidate_contexts)
         # We remove response_format because we now expect a markdown response, not just JSON.
     )
     
@@ -124,13 +129,13 @@ def select_files_for_edit(intent: dict, candidate_contexts: List[Dict], model: s
         if response_text is None:
             # Handle empty response due to content filters, etc.
             finish_reason = response.choices[0].finish_reason
-            print(f"Warning: LLM response was empty. Finish Reason: '{finish_reason}'. Rejecting batch.")
+            logger.warning("LLM response was empty. Finish Reason: '%s'. Rejecting batch.", finish_reason)
             return []
 
         # New parsing logic to find the JSON block within the markdown
         json_block_start = response_text.find("```json")
         if json_block_start == -1:
-            print("Warning: LLM did not return a JSON block. Rejecting batch.")
+            logger.warning("LLM did not return a JSON block. Rejecting batch.")
             return []
         
         json_str = response_text[json_block_start + 7:] # Move past "```json"
@@ -145,11 +150,44 @@ def select_files_for_edit(intent: dict, candidate_contexts: List[Dict], model: s
         selected_paths = [candidate_paths[name] for name in selected_names if name in candidate_paths]
         
         if selected_paths:
-            print(f"LLM selected {len(selected_paths)} file(s) for editing: {[p.name for p in selected_paths]}")
+            logger.info("LLM selected %s file(s) for editing: %s", len(selected_paths), [p.name for p in selected_paths])
         else:
-            print("LLM indicated no files in this batch need to be changed.")
+            logger.info("LLM indicated no files in this batch need to be changed.")
             
         return selected_paths
     except (json.JSONDecodeError, KeyError, IndexError, AttributeError):
-        print("Warning: LLM returned a malformed response. Rejecting batch.")
-        return []
\ No newline at end of file
+        logger.warning("LLM returned a malformed response. Rejecting batch.")
+        return []
+
+def _select_files_messages(intent: dict, candidate_contexts: List[Dict]) -> List[Dict[str, str]]:
+    code_context_str = ""
+    for context in candidate_contexts:
+        code_context_str += f"--- CANDIDATE FILE: {context['path'].name} ---\n"
+        code_context_str += f"```csharp\n{compact_source(context['content'], context['path'].name).text}\n```\n\n"
+
+    # New Chain-of-Thought Prompt
+    prompt = (
+        "You are an expert software engineer analyzing a codebase to find all locations for a required change.\n\n"
+        "## Intent\n"
+        f"A user wants to make a change related to this topic: '{intent['semantic_description']}'\n\n"
+        "## Candidate Files and Their Full Code\n"
+        f"Here are the candidate files and their complete source code:\n\n{code_context_str}"
+        "## Your Task\n"
+        "Follow these steps to determine the correct files to modify:\n"
+        "1.  **Analysis:** For each candidate file, write a one-sentence analysis of its relevance to the user's intent.\n"
+        "2.  **Reasoning:** Based on your analysis, provide a step-by-step explanation for which file(s), if any, should be modified.\n"
+        "3.  **Final Answer:** Based on your reasoning, provide a final answer in a JSON block. The JSON should contain a single key, \"files\", with a list of the full names of the files you are highly confident should be changed. If none are correct, the list should be empty."
+        "\n\nRespond using the following markdown format:\n\n"
+        "### Analysis\n"
+        "- `FileA.cs`: [Your one-sentence analysis here.]\n"
+        "- `FileB.cs`: [Your one-sentence analysis here.]\n\n"
+        "### Reasoning\n"
+        "[Your step-by-step reasoning here.]\n\n"
+        "### Final Answer\n"
+        "```json\n"
+        "{\n"
+        "  \"files\": [\"FileB.cs\"]\n"
+        "}\n"
+        "```"
+    )
+    return [{"role": "user", "content": prompt}]
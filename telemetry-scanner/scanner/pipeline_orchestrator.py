@@ -1,19 +1,63 @@
 """
 Enhanced Pipeline Orchestrator with fault tolerance, caching, and parallel execution.
 """
+import abc
 import asyncio
+import io
 import json
 import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
 import time
-from dataclasses import dataclass, asdict
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable, TypeVar, Generic
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any, AsyncIterator, Callable, Iterable, Tuple, TypeVar, Generic
 import hashlib
 from enum import Enum
+from functools import lru_cache
+
+from .log_config import PACKAGE_LOGGER, add_log_file, configure_logging, get_sample_size
+from .profiling import ProfileMode, StageProfiler
+from .tracing import tracer
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed for stages that opt into the msgpack serializer
+    msgpack = None
+
+try:
+    import numpy as np
+except ImportError:  # Optional: only needed to share arrays between worker processes
+    np = None
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
 
 T = TypeVar('T')
 
+# Bump whenever the on-disk cache entry layout changes; older entries are then treated as misses.
+CACHE_SCHEMA_VERSION = 2
+
+class ExecutorKind(Enum):
+    THREAD = "thread"    # I/O-bound work: LLM calls, subprocesses, file reads
+    PROCESS = "process"  # CPU-bound work, off the GIL; function and inputs must be picklable
+    INLINE = "inline"    # Trivial work run directly on the event loop
+
 class StageStatus(Enum):
     PENDING = "pending"
     RUNNING = "running"
@@ -29,46 +73,622 @@ class StageResult(Generic[T]):
     error: Optional[str] = None
     execution_time: float = 0.0
     cache_hit: bool = False
+    resumed: bool = False
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+@dataclass
+class StageSpec:
+    """
+    A node in the stage dependency graph executed by EnhancedOrchestrator.run_graph.
+    
+    `inputs` and `outputs` name the values a stage consumes and produces. The stage function
+    receives the single input value, a dict of values when it has several inputs, or None when
+    it has none. A stage with several outputs must return a dict keyed by output name.
+    `fingerprint` is called with the same argument to build the cache key.
+    """
+    name: str
+    func: Callable
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    # Returns a small dict identifying the stage input (hashes/versions); None means never cached
+    fingerprint: Optional[Callable[[Any], Dict[str, Any]]] = None
+    # Bump when the shape of the stage's result changes
+    version: int = 1
+    serializer: str = "pickle"
+    executor: ExecutorKind = ExecutorKind.THREAD
+    # False for stages whose real product is live state on the caller (e.g. a loaded search engine);
+    # they always re-run on resume
+    checkpoint: bool = True
+    # Identifies initial inputs that are not plain values (e.g. parsed CLI arguments) in the
+    # checkpoint key, whether or not the stage is cached; without it such a stage is never resumed
+    checkpoint_fingerprint: Optional[Callable[[Any], Dict[str, Any]]] = None
     
+# ------------------------------------------------------------------
+# Cache fingerprints: cheap stand-ins for stage inputs
+# ------------------------------------------------------------------
+
+def hash_text(text: str) -> str:
+    """Content hash of a string (e.g. the ticket text)."""
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+def hash_values(*values: Any) -> str:
+    """Hash a small set of plain values (paths, scores, names) without serialising large inputs."""
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+def file_fingerprint(path: Any) -> str:
+    """Version of a file from its path, size and modification time; no content is read."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return f"missing:{path}"
+    return hash_values(str(path), stat.st_size, stat.st_mtime_ns)
+
+def tree_fingerprint(root: Any, pattern: str = "*") -> str:
+    """Version of the files under `root` matching `pattern`, from their paths, sizes and
+    modification times; no content is read."""
+    root = Path(root)
+    entries = []
+    for path in sorted(root.rglob(pattern)):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if not path.is_dir():
+            entries.append((path.relative_to(root).as_posix(), stat.st_size, stat.st_mtime_ns))
+    return hash_values(str(root), *entries)
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """Version of the scanner package itself, so editing the agent invalidates cached stage results."""
+    package_dir = Path(__file__).parent
+    return hash_values(*[
+        (source.name, source.stat().st_size, source.stat().st_mtime_ns)
+        for source in sorted(package_dir.glob("*.py"))
+    ])
+
+
+# ------------------------------------------------------------------
+# Cache serializers
+# ------------------------------------------------------------------
+
+class CacheSerializer(abc.ABC):
+    """Converts stage results to and from bytes for the pipeline cache."""
+    name = "base"
+    
+    @abc.abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        ...
+    
+    @abc.abstractmethod
+    def loads(self, data: bytes) -> Any:
+        ...
+
+class PickleSerializer(CacheSerializer):
+    """Round-trips arbitrary Python objects (dataclasses, enums, tuples, Paths)."""
+    name = "pickle"
+    
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+class MsgpackSerializer(CacheSerializer):
+    """Compact, language-neutral encoding for stages whose results are plain data (str, list, dict)."""
+    name = "msgpack"
+    
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+    
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+SERIALIZERS: Dict[str, CacheSerializer] = {"pickle": PickleSerializer()}
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = MsgpackSerializer()
+
+def get_serializer(name: Optional[str]) -> CacheSerializer:
+    """Look up a serializer by name, falling back to pickle when it is unknown or not installed."""
+    return SERIALIZERS.get(name or "pickle", SERIALIZERS["pickle"])
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Write to a temp file in the same directory, then atomically move it into place,
+    so concurrent readers only ever see complete files.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=Path(path).parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+def default_cache_root() -> Path:
+    """Cache directory shared by all runs: $TELEMETRY_AGENT_CACHE_DIR, else the user cache directory."""
+    configured = os.environ.get("TELEMETRY_AGENT_CACHE_DIR")
+    if configured:
+        return Path(configured).expanduser() / "pipeline"
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") or Path.home() / ".cache"
+    return Path(base) / "telemetry-agent" / "pipeline"
+
+@contextmanager
+def _exclusive_lock(lock_path: Path):
+    """Inter-process lock on a sidecar file; writes stay atomic (os.replace) even where no lock is available."""
+    with open(lock_path, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    expired: int = 0
+    evictions: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
 class PipelineCache:
-    """Intelligent caching system for pipeline stages."""
+    """
+    Two-tier, content-addressed cache for pipeline stages.
     
-    def __init__(self, cache_dir: Path):
-        self.cache_dir = cache_dir
+    Entries are keyed by the stage name, the stage's result version, the scanner code version and a
+    small fingerprint dict supplied by the caller (ticket hash, index version, graph version, ...),
+    never by the full stage inputs.
+    
+    A bounded in-process LRU of serialized payloads sits in front of a disk tier that is shared
+    between runs. Disk entries are a JSON header line followed by the zlib-compressed payload, are
+    written atomically (temp file + os.replace), expire after `ttl_seconds` and are evicted least
+    recently used first once the directory exceeds `max_bytes`.
+    """
+    
+    def __init__(self,
+                 cache_dir: Optional[Path] = None,
+                 max_bytes: int = 1024 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 memory_max_bytes: int = 64 * 1024 * 1024,
+                 compress_level: int = 6):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_root()
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.memory_max_bytes = memory_max_bytes
+        self.compress_level = compress_level
+        self.stats = CacheStats()
+        self._lock_path = self.cache_dir / ".lock"
+        self._memory: "OrderedDict[str, Tuple[str, bytes, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._mutex = threading.Lock()
+        self._disk_bytes = self._evict()
+        
+    def make_key(self, stage_name: str, fingerprint: Dict[str, Any], version: int = 1) -> str:
+        """Generate a cache key from the stage name and its input fingerprint."""
+        key_material = json.dumps({
+            "stage": stage_name,
+            "stage_version": version,
+            "schema": CACHE_SCHEMA_VERSION,
+            "code": code_version(),
+            "fingerprint": fingerprint
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(key_material.encode()).hexdigest()
+    
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+    
+    def get(self, stage_name: str, fingerprint: Dict[str, Any], version: int = 1) -> Optional[Any]:
+        """Retrieve a cached result from memory, then disk; None on a miss."""
+        key = self.make_key(stage_name, fingerprint, version)
         
-    def _get_cache_key(self, stage_name: str, inputs: Any) -> str:
-        """Generate cache key from stage name and inputs."""
+        with self._mutex:
+            entry = self._memory.get(key)
+            if entry is not None:
+                serializer, payload, created_at = entry
+                if self._is_expired(created_at):
+                    self._drop_from_memory(key)
+                    self.stats.expired += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    return get_serializer(serializer).loads(payload)
+        
+        cache_file = self.cache_dir / f"{key}.cache"
         try:
-            input_str = json.dumps(inputs, sort_keys=True, default=str)
-        except (TypeError, ValueError):
-            # If serialization fails, use a simple hash of the stage name and input type
-            input_str = f"{stage_name}_{type(inputs).__name__}_{str(hash(str(inputs)))}"
-        return hashlib.sha256(f"{stage_name}:{input_str}".encode()).hexdigest()
-    
-    def get(self, stage_name: str, inputs: Any) -> Optional[Any]:
-        """Retrieve cached result."""
-        cache_key = self._get_cache_key(stage_name, inputs)
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
-            except Exception:
+            with open(cache_file, 'rb') as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except FileNotFoundError:
+            with self._mutex:
+                self.stats.misses += 1
+            return None
+        
+        try:
+            if header.get("schema") != CACHE_SCHEMA_VERSION:
+                raise ValueError(f"schema {header.get('schema')} != {CACHE_SCHEMA_VERSION}")
+            if self._is_expired(header.get("created_at", 0)):
+                with self._mutex:
+                    self.stats.expired += 1
+                    self.stats.misses += 1
                 cache_file.unlink(missing_ok=True)
-        return None
+                return None
+            payload = zlib.decompress(data) if header.get("compression") == "zlib" else data
+            result = get_serializer(header.get("serializer")).loads(payload)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable cache entry for {stage_name}: {e}")
+            cache_file.unlink(missing_ok=True)
+            with self._mutex:
+                self.stats.misses += 1
+            return None
+        
+        # Record the access time for LRU eviction; mtime stays the write time
+        try:
+            os.utime(cache_file, (time.time(), cache_file.stat().st_mtime))
+        except OSError:
+            pass
+        
+        with self._mutex:
+            self.stats.disk_hits += 1
+            self.stats.bytes_read += len(data)
+            self._remember(key, header.get("serializer"), payload, header.get("created_at", time.time()))
+        return result
     
-    def set(self, stage_name: str, inputs: Any, result: Any) -> None:
-        """Cache result."""
-        cache_key = self._get_cache_key(stage_name, inputs)
-        cache_file = self.cache_dir / f"{cache_key}.json"
+    def set(self, stage_name: str, fingerprint: Dict[str, Any], result: Any,
+            version: int = 1, serializer: Optional[str] = None) -> None:
+        """Cache a result in both tiers."""
+        codec = get_serializer(serializer)
+        key = self.make_key(stage_name, fingerprint, version)
+        created_at = time.time()
+        header = {
+            "schema": CACHE_SCHEMA_VERSION,
+            "serializer": codec.name,
+            "compression": "zlib",
+            "stage": stage_name,
+            "stage_version": version,
+            "created_at": created_at
+        }
         
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(result, f, default=str, indent=2)
+            payload = codec.dumps(result)
+            data = json.dumps(header).encode() + b"\n" + zlib.compress(payload, self.compress_level)
+            atomic_write_bytes(self.cache_dir / f"{key}.cache", data)
         except Exception as e:
             logging.warning(f"Failed to cache result for {stage_name}: {e}")
+            return
+        
+        with self._mutex:
+            self.stats.writes += 1
+            self.stats.bytes_written += len(data)
+            self._remember(key, codec.name, payload, created_at)
+            self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.max_bytes
+        
+        if over_budget:
+            self._disk_bytes = self._evict()
+    
+    def _remember(self, key: str, serializer: str, payload: bytes, created_at: float) -> None:
+        """Add a payload to the memory tier, evicting least recently used entries. Caller holds the mutex."""
+        if len(payload) > self.memory_max_bytes:
+            return
+        self._drop_from_memory(key)
+        self._memory[key] = (serializer, payload, created_at)
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self.memory_max_bytes:
+            self._drop_from_memory(next(iter(self._memory)))
+    
+    def _drop_from_memory(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[1])
+    
+    def _evict(self) -> int:
+        """
+        Remove expired entries, then least recently used ones until the disk tier fits `max_bytes`.
+        
+        Runs under an inter-process lock so concurrent runs do not evict the same entries twice.
+        Returns the disk usage afterwards.
+        """
+        expired = evicted = 0
+        with _exclusive_lock(self._lock_path):
+            now = time.time()
+            entries = []
+            for cache_file in self.cache_dir.glob("*.cache"):
+                try:
+                    stat = cache_file.stat()
+                except OSError:
+                    continue
+                if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+                    cache_file.unlink(missing_ok=True)
+                    expired += 1
+                    continue
+                entries.append((stat.st_atime, stat.st_size, cache_file))
+            
+            # Leftovers from writers that died between mkstemp and os.replace
+            for tmp_file in self.cache_dir.glob("*.tmp"):
+                try:
+                    if now - tmp_file.stat().st_mtime > 3600:
+                        tmp_file.unlink(missing_ok=True)
+                except OSError:
+                    continue
+            
+            total = sum(size for _, size, _ in entries)
+            entries.sort(key=lambda entry: entry[0])
+            for _, size, cache_file in entries:
+                if total <= self.max_bytes:
+                    break
+                cache_file.unlink(missing_ok=True)
+                total -= size
+                evicted += 1
+        
+        with self._mutex:
+            self.stats.expired += expired
+            self.stats.evictions += evicted
+        return total
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes, for the pipeline report."""
+        with self._mutex:
+            stats = asdict(self.stats)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats.update({
+                "hit_rate": (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "cache_dir": str(self.cache_dir)
+            })
+        return stats
+
+class CheckpointStore:
+    """
+    Per-run record of completed stages, used by `--resume`.
+    
+    Each completed stage's result is written to `<run dir>/checkpoints/<stage>.ckpt` (same entry
+    layout as the pipeline cache) and listed in `manifest.json` with its checkpoint key. The key
+    chains the stage's own input fingerprint with the keys of the stages it depends on, so a
+    changed input invalidates the stage and everything downstream of it.
+    """
+    
+    MANIFEST_VERSION = 1
+    
+    def __init__(self, checkpoint_dir: Path, resume: bool = False, compress_level: int = 6):
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.checkpoint_dir / "manifest.json"
+        self.resume = resume
+        self.compress_level = compress_level
+        self._mutex = threading.Lock()
+        self.manifest: Dict[str, Any] = {"version": self.MANIFEST_VERSION, "stages": {}}
+        
+        if resume and self.manifest_path.exists():
+            try:
+                manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+                if manifest.get("version") == self.MANIFEST_VERSION:
+                    self.manifest = manifest
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable checkpoint manifest: {e}")
+        
+        # Without resume, the previous run's checkpoints no longer apply and the manifest starts empty
+        self._write_manifest()
+    
+    def load(self, stage_name: str, key: str) -> Tuple[bool, Any]:
+        """Return (True, result) if the stage completed with the same checkpoint key, else (False, None)."""
+        entry = self.manifest["stages"].get(stage_name)
+        if not self.resume or entry is None or entry.get("key") != key:
+            return False, None
+        
+        try:
+            with open(self.checkpoint_dir / entry["file"], 'rb') as f:
+                header = json.loads(f.readline())
+                payload = zlib.decompress(f.read())
+            return True, get_serializer(header.get("serializer")).loads(payload)
+        except Exception as e:
+            logging.warning(f"Could not restore checkpoint for {stage_name}, re-running it: {e}")
+            return False, None
+    
+    def save(self, stage_name: str, key: str, result: Any,
+             serializer: Optional[str] = None, execution_time: float = 0.0) -> None:
+        """Persist a completed stage's result and record it in the manifest."""
+        codec = get_serializer(serializer)
+        file_name = f"{stage_name}.ckpt"
+        header = {"schema": CACHE_SCHEMA_VERSION, "serializer": codec.name, "stage": stage_name, "key": key}
+        
+        try:
+            data = json.dumps(header).encode() + b"\n" + zlib.compress(codec.dumps(result), self.compress_level)
+            atomic_write_bytes(self.checkpoint_dir / file_name, data)
+        except Exception as e:
+            logging.warning(f"Failed to checkpoint {stage_name}: {e}")
+            return
+        
+        with self._mutex:
+            self.manifest["stages"][stage_name] = {
+                "key": key,
+                "file": file_name,
+                "serializer": codec.name,
+                "bytes": len(data),
+                "execution_time": execution_time,
+                "completed_at": time.time()
+            }
+            self._write_manifest()
+    
+    def invalidate(self, stage_name: str) -> None:
+        """Forget a stage, e.g. when it fails after a previous run had completed it."""
+        with self._mutex:
+            if self.manifest["stages"].pop(stage_name, None) is not None:
+                self._write_manifest()
+    
+    def _write_manifest(self) -> None:
+        atomic_write_bytes(self.manifest_path, json.dumps(self.manifest, indent=2).encode())
+
+
+@dataclass
+class BatchItemResult:
+    """Outcome of one item run by SlidingWindowExecutor."""
+    index: int
+    item: Any
+    result: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter usable from threads and coroutines.
+    
+    Refills at `rate` tokens per second up to `capacity` (the burst size). A caller takes its
+    tokens immediately and is told how long to wait for them, so waiters are served in arrival
+    order and the lock is never held while sleeping.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(requests_per_minute / 60.0, burst)
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take `tokens` and return the number of seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    async def acquire(self, tokens: float = 1.0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def acquire_sync(self, tokens: float = 1.0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+class SlidingWindowExecutor:
+    """
+    Bounded-concurrency fan-out on the event loop.
+    
+    Keeps up to `max_concurrency` items in flight and starts the next item as soon as any one
+    finishes, so a slow item only occupies its own slot. Each item gets its own deadline; a failed
+    or timed-out item is reported in its BatchItemResult instead of failing the whole batch.
+    Coroutine functions are awaited directly, plain functions run in a worker thread (a timed-out
+    thread cannot be interrupted, its result is simply discarded). Cancelling the caller cancels
+    every item still in flight. An optional `rate_limiter` paces item starts; time spent waiting
+    for it does not count against the item deadline.
+    """
+    
+    def __init__(self, max_concurrency: int = 4, item_timeout: Optional[float] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.item_timeout = item_timeout
+        self.rate_limiter = rate_limiter
+    
+    async def _run_item(self, func: Callable, index: int, item: Any) -> BatchItemResult:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        start_time = time.time()
+        work = func(item) if asyncio.iscoroutinefunction(func) else asyncio.to_thread(func, item)
+        try:
+            result = await asyncio.wait_for(work, timeout=self.item_timeout)
+            return BatchItemResult(index, item, result=result, elapsed=time.time() - start_time)
+        except asyncio.TimeoutError:
+            return BatchItemResult(index, item, error=f"timed out after {self.item_timeout}s",
+                                   elapsed=time.time() - start_time)
+        except Exception as e:
+            return BatchItemResult(index, item, error=str(e) or type(e).__name__, elapsed=time.time() - start_time)
+    
+    async def stream(self, func: Callable, items: Iterable[Any]) -> AsyncIterator[BatchItemResult]:
+        """Yield results in completion order while keeping the window full."""
+        pending = set()
+        next_items = enumerate(items)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.max_concurrency:
+                    try:
+                        index, item = next(next_items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._run_item(func, index, item)))
+                
+                if not pending:
+                    return
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def map(self, func: Callable, items: Iterable[Any]) -> List[BatchItemResult]:
+        """Run every item and return the results in input order."""
+        results = [outcome async for outcome in self.stream(func, items)]
+        results.sort(key=lambda outcome: outcome.index)
+        return results
+
+# ------------------------------------------------------------------
+# Read-only arrays shared with worker processes
+# ------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SharedArray:
+    """
+    Handle to a numpy array stored in a .npy file.
+    
+    Only the handle crosses process boundaries; each process that calls load() maps the same file
+    read-only, so large arrays (embeddings, graph edge lists) are neither pickled nor copied.
+    """
+    path: str
+    shape: Tuple[int, ...]
+    dtype: str
+    
+    def load(self):
+        if np is None:
+            raise RuntimeError("numpy is required to load shared arrays")
+        return np.load(self.path, mmap_mode="r")
+
+def share_array(array, path: Path) -> SharedArray:
+    """Write an array to `path` atomically and return a handle that other processes can map."""
+    if np is None:
+        raise RuntimeError("numpy is required to share arrays")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    array = np.ascontiguousarray(array)
+    
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    atomic_write_bytes(path, buffer.getbuffer())
+    return SharedArray(str(path), tuple(array.shape), str(array.dtype))
+
 
 class EnhancedOrchestrator:
     """Enhanced pipeline orchestrator with fault tolerance and performance optimizations."""
@@ -77,43 +697,116 @@ class EnhancedOrchestrator:
                  output_dir: Path,
                  max_retries: int = 3,
                  enable_cache: bool = True,
-                 parallel_workers: int = 4):
+                 parallel_workers: int = 4,
+                 max_concurrent_stages: int = 4,
+                 process_workers: Optional[int] = None,
+                 cache_dir: Optional[Path] = None,
+                 cache_max_bytes: int = 1024 * 1024 * 1024,
+                 cache_ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 enable_checkpoints: bool = True,
+                 resume: bool = False,
+                 profile: Optional[str] = None):
         self.output_dir = output_dir
         self.max_retries = max_retries
         self.parallel_workers = parallel_workers
-        self.cache = PipelineCache(output_dir / ".cache") if enable_cache else None
+        self.max_concurrent_stages = max_concurrent_stages
+        self.process_workers = process_workers or min(parallel_workers, os.cpu_count() or 1)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_pool_lock = threading.Lock()
+        self.cache = PipelineCache(cache_dir, max_bytes=cache_max_bytes, ttl_seconds=cache_ttl_seconds) if enable_cache else None
+        self.checkpoints = CheckpointStore(output_dir / "checkpoints", resume=resume) if enable_checkpoints else None
+        self.checkpoint_keys: Dict[str, Optional[str]] = {}
         self.stage_results: Dict[str, StageResult] = {}
+        self.stage_dependencies: Dict[str, List[str]] = {}
+        self.stage_metrics: Dict[str, Dict[str, Any]] = {}
+        self._initial_value_names: set = set()
+        # Optional per-stage CPU/memory profiling ("cpu", "memory" or "both"). Samples and the
+        # tracemalloc peak cannot be attributed to one of several overlapping stages, so profiled
+        # stages run one at a time
+        self.profiler = StageProfiler(ProfileMode(profile), output_dir / "profiles") if profile else None
+        self._profile_lock = asyncio.Lock() if profile else None
         
-        # Setup logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(output_dir / "pipeline.log"),
-                logging.StreamHandler()
-            ]
-        )
+        # Setup logging (keeps the level if the CLI already configured it)
+        configure_logging()
+        add_log_file(output_dir / "pipeline.log")
         self.logger = logging.getLogger(__name__)
+        if self.profiler is not None and max_concurrent_stages > 1:
+            self.logger.info(f"Profiling: stages run one at a time (stage concurrency {max_concurrent_stages} ignored)")
     
     async def execute_stage(self, 
                            stage_name: str, 
                            stage_func: Callable,
                            inputs: Any,
-                           dependencies: List[str] = None) -> StageResult:
-        """Execute a pipeline stage with retry logic and caching."""
+                           dependencies: List[str] = None,
+                           cache_fingerprint: Optional[Dict[str, Any]] = None,
+                           cache_version: int = 1,
+                           serializer: Optional[str] = None,
+                           executor: ExecutorKind = ExecutorKind.THREAD,
+                           checkpoint_key: Optional[str] = None) -> StageResult:
+        """
+        Execute a pipeline stage with retry logic and caching.
+        
+        Only stages given a `cache_fingerprint` are cached; the fingerprint should identify the
+        inputs cheaply (see hash_text, file_fingerprint) rather than contain them. Stages given a
+        `checkpoint_key` are checkpointed, and restored instead of executed when resuming.
+        """
+        with tracer.start_span(f"stage.{stage_name}", attributes={
+            "stage.name": stage_name,
+            "stage.executor": executor.value,
+            "stage.cacheable": cache_fingerprint is not None
+        }) as span:
+            stage_result = await self._execute_stage(stage_name, stage_func, inputs, dependencies,
+                                                     cache_fingerprint, cache_version, serializer,
+                                                     executor, checkpoint_key)
+            span.set_attributes({
+                "stage.status": stage_result.status.value,
+                "stage.execution_time": stage_result.execution_time,
+                "cache.hit": stage_result.cache_hit,
+                "stage.resumed": stage_result.resumed
+            })
+            if stage_result.status != StageStatus.COMPLETED:
+                span.set_error(stage_result.error or stage_result.status.value)
+            return stage_result
+    
+    async def _execute_stage(self, stage_name: str, stage_func: Callable, inputs: Any,
+                             dependencies: Optional[List[str]], cache_fingerprint: Optional[Dict[str, Any]],
+                             cache_version: int, serializer: Optional[str], executor: ExecutorKind,
+                             checkpoint_key: Optional[str]) -> StageResult:
+        self.stage_dependencies[stage_name] = list(dependencies or [])
         
         # Check dependencies
         if dependencies:
             for dep in dependencies:
                 if dep not in self.stage_results or self.stage_results[dep].status != StageStatus.COMPLETED:
-                    return StageResult(stage_name, StageStatus.SKIPPED, error=f"Dependency {dep} not completed")
+                    stage_result = StageResult(stage_name, StageStatus.SKIPPED, error=f"Dependency {dep} not completed")
+                    self.stage_results[stage_name] = stage_result
+                    return stage_result
+        
+        started_at = time.time()
+        use_checkpoint = self.checkpoints is not None and checkpoint_key is not None
+        
+        if use_checkpoint:
+            restored, checkpoint_result = await asyncio.to_thread(self.checkpoints.load, stage_name, checkpoint_key)
+            if restored:
+                self.logger.info(f"Stage {stage_name}: Resumed from checkpoint")
+                stage_result = StageResult(stage_name, StageStatus.COMPLETED, checkpoint_result, resumed=True,
+                                           started_at=started_at, finished_at=time.time())
+                self.stage_results[stage_name] = stage_result
+                return stage_result
+        
+        use_cache = self.cache is not None and cache_fingerprint is not None
         
         # Check cache
-        if self.cache:
-            cached_result = self.cache.get(stage_name, inputs)
+        if use_cache:
+            cached_result = await asyncio.to_thread(self.cache.get, stage_name, cache_fingerprint, cache_version)
             if cached_result is not None:
                 self.logger.info(f"Stage {stage_name}: Cache hit")
-                return StageResult(stage_name, StageStatus.COMPLETED, cached_result, cache_hit=True)
+                if use_checkpoint:
+                    await asyncio.to_thread(self.checkpoints.save, stage_name, checkpoint_key, cached_result, serializer)
+                stage_result = StageResult(stage_name, StageStatus.COMPLETED, cached_result, cache_hit=True,
+                                           started_at=started_at, finished_at=time.time())
+                self.stage_results[stage_name] = stage_result
+                return stage_result
         
         # Execute stage with retry logic
         for attempt in range(self.max_retries + 1):
@@ -121,14 +814,18 @@ class EnhancedOrchestrator:
                 self.logger.info(f"Stage {stage_name}: Starting (attempt {attempt + 1})")
                 start_time = time.time()
                 
-                result = await asyncio.to_thread(stage_func, inputs)
+                result = await self._call_stage(stage_name, stage_func, inputs, executor)
                 execution_time = time.time() - start_time
                 
                 # Cache successful result
-                if self.cache and result is not None:
-                    self.cache.set(stage_name, inputs, result)
+                if use_cache and result is not None:
+                    await asyncio.to_thread(self.cache.set, stage_name, cache_fingerprint, result, cache_version, serializer)
+                if use_checkpoint:
+                    await asyncio.to_thread(self.checkpoints.save, stage_name, checkpoint_key, result,
+                                            serializer, execution_time)
                 
-                stage_result = StageResult(stage_name, StageStatus.COMPLETED, result, execution_time=execution_time)
+                stage_result = StageResult(stage_name, StageStatus.COMPLETED, result, execution_time=execution_time,
+                                           started_at=started_at, finished_at=time.time())
                 self.stage_results[stage_name] = stage_result
                 self.logger.info(f"Stage {stage_name}: Completed in {execution_time:.2f}s")
                 return stage_result
@@ -136,48 +833,362 @@ class EnhancedOrchestrator:
             except Exception as e:
                 self.logger.warning(f"Stage {stage_name}: Attempt {attempt + 1} failed: {e}")
                 if attempt == self.max_retries:
-                    stage_result = StageResult(stage_name, StageStatus.FAILED, error=str(e))
+                    if use_checkpoint:
+                        self.checkpoints.invalidate(stage_name)
+                    stage_result = StageResult(stage_name, StageStatus.FAILED, error=str(e),
+                                               started_at=started_at, finished_at=time.time())
                     self.stage_results[stage_name] = stage_result
                     return stage_result
                 await asyncio.sleep(2 ** attempt)  # Exponential backoff
     
-    def execute_parallel_batch(self, 
-                              stage_name: str,
-                              batch_func: Callable,
-                              items: List[Any],
-                              batch_size: int = 10) -> List[Any]:
-        """Execute a batch of items in parallel."""
+    async def _call_stage(self, stage_name: str, stage_func: Callable, inputs: Any, executor: ExecutorKind) -> Any:
+        """Run a stage function, one stage at a time while profiling, and record its profile."""
+        if self._profile_lock is None:
+            return await self._dispatch_stage(stage_name, stage_func, inputs, executor)
+        async with self._profile_lock:
+            try:
+                return await self._dispatch_stage(stage_name, stage_func, inputs, executor)
+            finally:
+                if stage_name in self.profiler.profiles:
+                    self.record_stage_metrics(stage_name, {"profile": self.profiler.profiles[stage_name].to_report()})
+    
+    async def _dispatch_stage(self, stage_name: str, stage_func: Callable, inputs: Any, executor: ExecutorKind) -> Any:
+        """Run a stage function on the requested executor; coroutine functions are always awaited directly."""
+        if asyncio.iscoroutinefunction(stage_func):
+            with self._profile_stage(stage_name, event_loop=True):
+                return await stage_func(inputs)
+        if executor == ExecutorKind.INLINE:
+            with self._profile_stage(stage_name):
+                return stage_func(inputs)
+        if executor == ExecutorKind.PROCESS:
+            return await self._call_in_process(stage_name, stage_func, inputs)
         
-        results = []
-        with ThreadPoolExecutor(max_workers=self.parallel_workers) as executor:
-            # Process in batches
-            for i in range(0, len(items), batch_size):
-                batch = items[i:i + batch_size]
-                
-                # Submit batch to thread pool
-                futures = [executor.submit(batch_func, item) for item in batch]
+        def run_in_thread(value):
+            with self._profile_stage(stage_name):
+                return stage_func(value)
+        
+        return await asyncio.to_thread(run_in_thread, inputs)
+    
+    def _profile_stage(self, stage_name: str, event_loop: bool = False):
+        return self.profiler.stage(stage_name, event_loop) if self.profiler is not None else nullcontext()
+    
+    async def _call_in_process(self, stage_name: str, stage_func: Callable, inputs: Any) -> Any:
+        pool = self._get_process_pool()
+        try:
+            if self.profiler is None:
+                return await asyncio.get_running_loop().run_in_executor(pool, stage_func, inputs)
+            # The worker profiles itself and sends the profile back with the result
+            result, profile = await asyncio.get_running_loop().run_in_executor(
+                pool, self.profiler.wrap_for_process(stage_name, stage_func), inputs
+            )
+            self.profiler.add(profile)
+            return result
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the retry
+            self.shutdown_process_pool()
+            raise
+    
+    def run_in_process(self, func: Callable, inputs: Any) -> Any:
+        """
+        Run `func(inputs)` in the stage worker pool and wait for the result.
+        
+        For CPU-bound work a stage only sometimes needs (e.g. embeddings for a fallback search);
+        call it from a stage running on a thread, never from the event loop.
+        """
+        try:
+            return self._get_process_pool().submit(func, inputs).result()
+        except BrokenProcessPool:
+            self.shutdown_process_pool()
+            raise
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                # spawn, not fork: the parent has live threads (asyncio.to_thread, HTTP clients)
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    # Workers start with no logging setup; give them the parent's level
+                    initializer=configure_logging,
+                    initargs=(logging.getLogger(PACKAGE_LOGGER).getEffectiveLevel(), get_sample_size())
+                )
+            return self._process_pool
+    
+    def shutdown_process_pool(self) -> None:
+        with self._process_pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+    
+    async def run_graph(self,
+                        specs: List[StageSpec],
+                        initial_values: Optional[Dict[str, Any]] = None,
+                        max_concurrency: Optional[int] = None,
+                        on_output: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Run stages as a dependency graph: every stage whose inputs are available starts
+        immediately, with at most `max_concurrency` stages executing at once.
+        
+        Args:
+            specs: Stages to run; each value name may be produced by only one stage
+            initial_values: Values available before any stage runs (e.g. CLI arguments)
+            max_concurrency: Overrides the orchestrator's max_concurrent_stages
+            on_output: Called with (name, value) for every produced value, cache hits included,
+                before any dependent stage starts
+            
+        Returns:
+            All values, initial and produced, keyed by name
+            
+        Raises:
+            ValueError: If the graph is malformed (missing producer, duplicate output, cycle)
+            RuntimeError: If a stage fails; stages that depend on it are marked SKIPPED
+        """
+        values = dict(initial_values or {})
+        self._initial_value_names = set(values)
+        dependencies = self._resolve_stage_dependencies(specs, values)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrent_stages))
+        
+        try:
+            await self._schedule_graph(specs, values, dependencies, semaphore, on_output)
+        finally:
+            self.shutdown_process_pool()
+        
+        return values
+    
+    async def _schedule_graph(self, specs: List[StageSpec], values: Dict[str, Any],
+                              dependencies: Dict[str, List[str]], semaphore: asyncio.Semaphore,
+                              on_output: Optional[Callable[[str, Any], None]]) -> None:
+        """Start stages as soon as their inputs are available, until all finish or one fails."""
+        pending = {spec.name: spec for spec in specs}
+        running: Dict[asyncio.Task, StageSpec] = {}
+        completed = set()
+        failure: Optional[StageResult] = None
+        
+        try:
+            while pending or running:
+                # Stop scheduling new work once something has failed, but let running stages finish
+                if failure is None:
+                    for name, spec in list(pending.items()):
+                        if all(dep in completed for dep in dependencies[name]):
+                            del pending[name]
+                            task = asyncio.create_task(
+                                self._run_stage_spec(spec, values, dependencies[name], semaphore, on_output)
+                            )
+                            running[task] = spec
+                if not running:
+                    break
                 
-                # Collect results as they complete
-                for future in as_completed(futures):
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    spec = running.pop(task)
                     try:
-                        result = future.result(timeout=300)  # 5 minute timeout
-                        if result:
-                            results.extend(result if isinstance(result, list) else [result])
+                        stage_result = task.result()
                     except Exception as e:
-                        self.logger.warning(f"Batch item failed: {e}")
+                        # The stage ran but publishing its outputs failed (missing output key,
+                        # on_output error): fail it like any other stage
+                        self.logger.error(f"Stage {spec.name}: Could not publish outputs: {e}")
+                        stage_result = StageResult(spec.name, StageStatus.FAILED, error=str(e))
+                        self.stage_results[spec.name] = stage_result
+                    if stage_result.status == StageStatus.COMPLETED:
+                        completed.add(spec.name)
+                    elif failure is None:
+                        failure = stage_result
+        finally:
+            # Only reached with tasks still running if the graph run itself was cancelled
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        
+        if failure is not None:
+            for name in pending:
+                self.stage_results[name] = StageResult(name, StageStatus.SKIPPED,
+                                                       error=f"Upstream stage {failure.stage_name} failed")
+            raise RuntimeError(f"Stage {failure.stage_name} failed: {failure.error}")
+    
+    async def _run_stage_spec(self, spec: StageSpec, values: Dict[str, Any],
+                              dependencies: List[str], semaphore: asyncio.Semaphore,
+                              on_output: Optional[Callable[[str, Any], None]] = None) -> StageResult:
+        """Run one graph node under the concurrency limit and publish its outputs."""
+        async with semaphore:
+            if not spec.inputs:
+                stage_input = None
+            elif len(spec.inputs) == 1:
+                stage_input = values[spec.inputs[0]]
+            else:
+                stage_input = {name: values[name] for name in spec.inputs}
+            
+            cache_fingerprint = None
+            if (self.cache is not None or self.checkpoints is not None) and spec.fingerprint is not None:
+                try:
+                    cache_fingerprint = spec.fingerprint(stage_input)
+                except Exception as e:
+                    self.logger.warning(f"Stage {spec.name}: Could not fingerprint inputs, running uncached: {e}")
+            
+            checkpoint_key = self._checkpoint_key(spec, stage_input, cache_fingerprint, dependencies, values)
+            
+            stage_result = await self.execute_stage(
+                spec.name, spec.func, stage_input,
+                dependencies=dependencies,
+                cache_fingerprint=cache_fingerprint,
+                cache_version=spec.version,
+                serializer=spec.serializer,
+                executor=spec.executor,
+                checkpoint_key=checkpoint_key if spec.checkpoint else None
+            )
+        
+        if stage_result.status == StageStatus.COMPLETED:
+            if len(spec.outputs) == 1:
+                produced = {spec.outputs[0]: stage_result.result}
+            else:
+                produced = {name: stage_result.result[name] for name in spec.outputs}
+            values.update(produced)
+            if on_output:
+                for name, value in produced.items():
+                    on_output(name, value)
+        return stage_result
+    
+    def _checkpoint_key(self, spec: StageSpec, stage_input: Any, input_fingerprint: Optional[Dict[str, Any]],
+                        dependencies: List[str], values: Dict[str, Any]) -> Optional[str]:
+        """
+        Chain the stage's own input fingerprint with the checkpoint keys of its upstream stages,
+        so that resuming re-runs a stage whenever anything it (transitively) depends on changed.
+        
+        Plain initial values (paths, names) are included; the scanner code version deliberately
+        is not, so a fix to a failing stage can be resumed without redoing the earlier stages.
+        Fails closed: a stage whose inputs cannot be identified (an initial value that is not plain
+        and has no checkpoint fingerprint, or an upstream stage without a key) gets no key, so it
+        is neither restored nor saved.
+        """
+        if self.checkpoints is None:
+            return None
+        
+        checkpoint_key = None
+        plain_types = (str, int, float, bool, Path, type(None))
+        initial_names = [name for name in spec.inputs if name in self._initial_value_names]
+        upstream_keys = [self.checkpoint_keys.get(dep) for dep in sorted(dependencies)]
+        if None in upstream_keys:
+            self.logger.info(f"Stage {spec.name}: Upstream stage has no checkpoint key, not checkpointing")
+        elif spec.checkpoint_fingerprint is not None:
+            try:
+                checkpoint_key = hash_values(spec.name, spec.version, input_fingerprint,
+                                             spec.checkpoint_fingerprint(stage_input), upstream_keys)
+            except Exception as e:
+                self.logger.warning(f"Stage {spec.name}: Could not fingerprint inputs for its checkpoint: {e}")
+        elif all(isinstance(values[name], plain_types) for name in initial_names):
+            initial_inputs = {name: values[name] for name in initial_names}
+            checkpoint_key = hash_values(spec.name, spec.version, input_fingerprint, initial_inputs, upstream_keys)
+        else:
+            self.logger.warning(f"Stage {spec.name}: Inputs cannot be identified for a checkpoint "
+                                f"(no checkpoint_fingerprint), not checkpointing")
+        
+        self.checkpoint_keys[spec.name] = checkpoint_key
+        return checkpoint_key
+    
+    @staticmethod
+    def _resolve_stage_dependencies(specs: List[StageSpec], values: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Map each stage to the stages producing its inputs, validating the graph."""
+        producers = {}
+        for spec in specs:
+            for output in spec.outputs:
+                if output in producers or output in values:
+                    raise ValueError(f"Value '{output}' is produced by more than one stage")
+                producers[output] = spec.name
+        
+        dependencies = {}
+        for spec in specs:
+            missing = [name for name in spec.inputs if name not in producers and name not in values]
+            if missing:
+                raise ValueError(f"Stage {spec.name} needs {missing}, which no stage produces")
+            dependencies[spec.name] = sorted({producers[name] for name in spec.inputs if name in producers})
+        
+        # Kahn's algorithm: anything left unvisited sits on a cycle
+        remaining = {name: set(deps) for name, deps in dependencies.items()}
+        ready = [name for name, deps in remaining.items() if not deps]
+        while ready:
+            name = ready.pop()
+            del remaining[name]
+            for other, deps in remaining.items():
+                if name in deps:
+                    deps.discard(name)
+                    if not deps:
+                        ready.append(other)
+        if remaining:
+            raise ValueError(f"Stage graph has a cycle involving: {sorted(remaining)}")
+        
+        return dependencies
+    
+    async def execute_parallel_batch(self,
+                                     stage_name: str,
+                                     batch_func: Callable,
+                                     items: List[Any],
+                                     max_concurrency: Optional[int] = None,
+                                     item_timeout: Optional[float] = 300.0) -> List[Any]:
+        """Run `batch_func` over the items with a sliding window and flatten the successful results in input order."""
+        executor = SlidingWindowExecutor(max_concurrency or self.parallel_workers, item_timeout)
+        
+        results = []
+        for outcome in await executor.map(batch_func, items):
+            if not outcome.ok:
+                self.logger.warning(f"{stage_name}: Batch item {outcome.index} failed: {outcome.error}")
+            elif outcome.result:
+                results.extend(outcome.result if isinstance(outcome.result, list) else [outcome.result])
         
         return results
     
+    def record_stage_metrics(self, stage_name: str, metrics: Dict[str, Any]) -> None:
+        """Attach stage-specific measurements (e.g. per-strategy search costs) to the pipeline report."""
+        self.stage_metrics.setdefault(stage_name, {}).update(metrics)
+    
+    def get_critical_path(self) -> Dict[str, Any]:
+        """
+        Walk back from the last stage to finish, each time following the dependency that
+        finished last (the one that actually held the stage up).
+        """
+        timed = {name: r for name, r in self.stage_results.items() if r.finished_at is not None}
+        if not timed:
+            return {"stages": [], "duration": 0.0}
+        
+        current = max(timed.values(), key=lambda r: r.finished_at)
+        path = [current]
+        while True:
+            upstream = [timed[dep] for dep in self.stage_dependencies.get(current.stage_name, []) if dep in timed]
+            if not upstream:
+                break
+            current = max(upstream, key=lambda r: r.finished_at)
+            path.append(current)
+        path.reverse()
+        
+        return {
+            "stages": [r.stage_name for r in path],
+            "duration": path[-1].finished_at - path[0].started_at,
+            "stage_durations": {r.stage_name: r.finished_at - r.started_at for r in path}
+        }
+    
+    def _profile_summary(self) -> Optional[Dict[str, Any]]:
+        if self.profiler is None:
+            return None
+        combined = self.profiler.write_combined()
+        return {**self.profiler.get_summary(), "combined_stacks": str(combined) if combined else None}
+    
     def save_stage_report(self) -> None:
         """Save detailed stage execution report."""
+        timed = [r for r in self.stage_results.values() if r.finished_at is not None]
+        wall_clock_time = (max(r.finished_at for r in timed) - min(r.started_at for r in timed)) if timed else 0.0
         report = {
             "execution_summary": {
                 "total_stages": len(self.stage_results),
                 "completed": sum(1 for r in self.stage_results.values() if r.status == StageStatus.COMPLETED),
                 "failed": sum(1 for r in self.stage_results.values() if r.status == StageStatus.FAILED),
                 "cache_hits": sum(1 for r in self.stage_results.values() if r.cache_hit),
-                "total_execution_time": sum(r.execution_time for r in self.stage_results.values())
+                "resumed": sum(1 for r in self.stage_results.values() if r.resumed),
+                "total_execution_time": sum(r.execution_time for r in self.stage_results.values()),
+                "wall_clock_time": wall_clock_time
             },
+            "critical_path": self.get_critical_path(),
+            "cache": self.cache.get_stats() if self.cache else None,
+            "stage_metrics": self.stage_metrics,
+            "profile": self._profile_summary(),
             "stage_details": {name: asdict(result) for name, result in self.stage_results.items()}
         }
         
@@ -0,0 +1,375 @@
+"""
+Built-in profiling for pipeline stages (`--profile cpu|memory|both`).
+
+- cpu: a background thread samples the stacks of the threads running each stage (every 10 ms by
+  default) and writes them as collapsed stacks (`profiles/<stage>.collapsed`, plus `all.collapsed`
+  with the stage as root frame), ready for flamegraph.pl, speedscope or inferno.
+- memory: tracemalloc snapshots before and after each stage give the top allocating lines and the
+  traced peak; the sampler thread also tracks resident set size for the peak RSS.
+
+Coroutine stages run on the event-loop thread: its samples count only while a task is running
+(time the loop spends waiting in select() is reported as `idle_samples`), and work the stage hands
+to `asyncio.to_thread` is sampled on the loop's default executor threads. Neither the samples nor
+tracemalloc's peak can be told apart between overlapping stages, so the orchestrator runs profiled
+stages one at a time. Stages executed in worker processes are profiled inside the worker and the
+profile is sent back with the result.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+except ImportError:  # Optional: RSS is read from /proc or getrusage without it
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_INTERVAL = 0.01
+DEFAULT_TOP_N = 15
+MAX_STACK_DEPTH = 128
+# Allocators are grouped by line, so one frame per trace is enough and keeps snapshots cheap
+TRACEMALLOC_FRAMES = 1
+# asyncio's default executor (used by asyncio.to_thread) names its threads asyncio_0, asyncio_1, ...
+EXECUTOR_THREAD_PREFIX = "asyncio_"
+
+class ProfileMode(Enum):
+    CPU = "cpu"
+    MEMORY = "memory"
+    BOTH = "both"
+
+    @property
+    def cpu(self) -> bool:
+        return self in (ProfileMode.CPU, ProfileMode.BOTH)
+
+    @property
+    def memory(self) -> bool:
+        return self in (ProfileMode.MEMORY, ProfileMode.BOTH)
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        # Only the high-water mark is available here (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":")
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+def _loop_is_idle(frame) -> bool:
+    """True if the event loop on this stack is between callbacks (usually blocked in select())."""
+    child = None
+    while frame is not None:
+        if frame.f_code.co_name == "_run_once":
+            # Callbacks, task steps included, run through Handle._run
+            return child is None or child.f_code.co_name != "_run"
+        child, frame = frame, frame.f_back
+    return False
+
+def _executor_thread_ids() -> set:
+    return {thread.ident for thread in threading.enumerate() if thread.name.startswith(EXECUTOR_THREAD_PREFIX)}
+
+@dataclass
+class StageProfile:
+    """Profile of one stage run. `stacks` holds the raw collapsed stacks and is not reported."""
+    stage: str
+    mode: str
+    wall_time: float = 0.0
+    samples: int = 0
+    idle_samples: int = 0
+    peak_rss_bytes: Optional[int] = None
+    rss_delta_bytes: Optional[int] = None
+    peak_traced_bytes: Optional[int] = None
+    hottest_functions: List[Dict[str, Any]] = field(default_factory=list)
+    top_allocators: List[Dict[str, Any]] = field(default_factory=list)
+    stacks: Dict[str, int] = field(default_factory=dict)
+    collapsed_path: Optional[str] = None
+
+    def to_report(self) -> Dict[str, Any]:
+        report = {
+            "mode": self.mode,
+            "wall_time": self.wall_time,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes
+        }
+        if self.stacks or self.samples:
+            report.update({
+                "samples": self.samples,
+                "idle_samples": self.idle_samples,
+                "hottest_functions": self.hottest_functions,
+                "collapsed_stacks": self.collapsed_path
+            })
+        if self.peak_traced_bytes is not None:
+            report.update({
+                "peak_traced_bytes": self.peak_traced_bytes,
+                "top_allocators": self.top_allocators
+            })
+        return report
+
+def hottest_functions(stacks: Dict[str, int], top_n: int = DEFAULT_TOP_N) -> List[Dict[str, Any]]:
+    """Functions by self samples (leaf frame), with inclusive samples alongside."""
+    total = sum(stacks.values()) or 1
+    self_samples: Counter = Counter()
+    total_samples: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_samples[frames[-1]] += count
+        for name in set(frames):
+            total_samples[name] += count
+    return [
+        {
+            "function": name,
+            "self_samples": count,
+            "self_percent": round(100.0 * count / total, 1),
+            "total_samples": total_samples[name],
+            "total_percent": round(100.0 * total_samples[name] / total, 1)
+        }
+        for name, count in self_samples.most_common(top_n)
+    ]
+
+class _StageRecorder:
+    """Samples collected for one running stage."""
+
+    def __init__(self, thread_id: int, event_loop: bool = False):
+        self.thread_id = thread_id
+        # A coroutine stage: the thread runs an event loop, and to_thread work belongs to the stage
+        self.event_loop = event_loop
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.peak_rss: Optional[int] = None
+
+    def collect(self, frames: Dict[int, Any], executor_threads: set) -> List[Optional[str]]:
+        """Collapsed stacks of this stage's threads in one sample; None marks an idle event loop."""
+        frame = frames.get(self.thread_id)
+        if not self.event_loop:
+            return [_collapse(frame)] if frame is not None else []
+        stacks: List[Optional[str]] = []
+        if frame is not None:
+            stacks.append(None if _loop_is_idle(frame) else _collapse(frame))
+        for thread_id in executor_threads:
+            frame = frames.get(thread_id)
+            # Idle pool threads wait for work in the executor's _worker loop
+            if thread_id != self.thread_id and frame is not None and frame.f_code.co_name != "_worker":
+                stacks.append(_collapse(frame))
+        return stacks
+
+    def observe_rss(self, rss: Optional[int]) -> None:
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+class StageProfiler:
+    """
+    Profiles pipeline stages. `stage(name)` profiles the calling thread for the duration of the
+    block; `wrap_for_process` returns a picklable callable that profiles inside a worker process.
+    """
+
+    def __init__(self, mode: ProfileMode, output_dir: Optional[Path] = None,
+                 interval: float = DEFAULT_INTERVAL, top_n: int = DEFAULT_TOP_N):
+        self.mode = mode
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.interval = interval
+        self.top_n = top_n
+        self.profiles: Dict[str, StageProfile] = {}
+        self._active: List[_StageRecorder] = []
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._started_tracemalloc = False
+
+        if self.mode.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        if self.output_dir is not None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def _ensure_sampler(self) -> None:
+        # Called with the lock held; the sampler exits by itself once no stage is running
+        if self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="stage-profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                recorders = list(self._active)
+                if not recorders:
+                    self._sampler = None
+                    return
+            rss = current_rss_bytes()
+            frames = sys._current_frames() if self.mode.cpu else {}
+            executor_threads = _executor_thread_ids() if frames and any(r.event_loop for r in recorders) else set()
+            stacks = {id(recorder): recorder.collect(frames, executor_threads) for recorder in recorders}
+            del frames
+            with self._lock:
+                # Skip stages that finished while the stacks were being walked
+                for recorder in self._active:
+                    recorder.observe_rss(rss)
+                    for stack in stacks.get(id(recorder), ()):
+                        if stack is None:
+                            recorder.idle_samples += 1
+                        else:
+                            recorder.stacks[stack] += 1
+                            recorder.samples += 1
+
+    @contextmanager
+    def stage(self, stage_name: str, event_loop: bool = False) -> Iterator[None]:
+        """
+        Profile the calling thread while the block runs and record a StageProfile. With
+        `event_loop`, the block awaits a coroutine stage: idle loop samples are left out and the
+        loop's to_thread workers are sampled too. Stages must not overlap (see module docstring).
+        """
+        recorder = _StageRecorder(threading.get_ident(), event_loop)
+        rss_before = current_rss_bytes()
+        recorder.observe_rss(rss_before)
+        snapshot_before = None
+        if self.mode.memory:
+            tracemalloc.reset_peak()
+            snapshot_before = tracemalloc.take_snapshot()
+
+        with self._lock:
+            self._active.append(recorder)
+            self._ensure_sampler()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - started
+            with self._lock:
+                self._active.remove(recorder)
+
+            rss_after = current_rss_bytes()
+            recorder.observe_rss(rss_after)
+            profile = StageProfile(
+                stage=stage_name,
+                mode=self.mode.value,
+                wall_time=wall_time,
+                samples=recorder.samples,
+                idle_samples=recorder.idle_samples,
+                peak_rss_bytes=recorder.peak_rss,
+                rss_delta_bytes=(rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+                hottest_functions=hottest_functions(recorder.stacks, self.top_n),
+                stacks=dict(recorder.stacks)
+            )
+            if snapshot_before is not None:
+                profile.peak_traced_bytes = tracemalloc.get_traced_memory()[1]
+                profile.top_allocators = self._top_allocators(snapshot_before, tracemalloc.take_snapshot())
+            self.add(profile)
+
+    def _top_allocators(self, before, after) -> List[Dict[str, Any]]:
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, __file__)
+        ]
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        growth = [stat for stat in diff if stat.size_diff > 0]
+        growth.sort(key=lambda stat: stat.size_diff, reverse=True)
+        return [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size_bytes": stat.size
+            }
+            for stat in growth[:self.top_n]
+        ]
+
+    def add(self, profile: StageProfile) -> StageProfile:
+        """Record a profile (also used for profiles returned by worker processes)."""
+        if self.output_dir is not None and profile.stacks:
+            path = self.output_dir / f"{profile.stage}.collapsed"
+            _write_collapsed(path, profile.stacks)
+            profile.collapsed_path = str(path)
+        with self._lock:
+            self.profiles[profile.stage] = profile
+        return profile
+
+    def wrap_for_process(self, stage_name: str, func: Callable) -> "ProfiledCall":
+        return ProfiledCall(stage_name, func, self.mode.value, self.interval, self.top_n)
+
+    def write_combined(self) -> Optional[Path]:
+        """Write all stages' stacks into one file, each rooted at a `stage:<name>` frame."""
+        if self.output_dir is None:
+            return None
+        combined: Counter = Counter()
+        with self._lock:
+            profiles = list(self.profiles.values())
+        for profile in profiles:
+            for stack, count in profile.stacks.items():
+                combined[f"stage:{profile.stage};{stack}"] += count
+        if not combined:
+            return None
+        path = self.output_dir / "all.collapsed"
+        _write_collapsed(path, combined)
+        return path
+
+    def get_summary(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode.value,
+            "directory": str(self.output_dir) if self.output_dir is not None else None,
+            "interval": self.interval,
+            "stages": sorted(self.profiles)
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            sampler, self._sampler = self._sampler, None
+        if sampler is not None:
+            sampler.join(timeout=1.0)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+class ProfiledCall:
+    """Picklable stage wrapper for worker processes; returns `(result, StageProfile)`."""
+
+    def __init__(self, stage_name: str, func: Callable, mode: str, interval: float, top_n: int):
+        self.stage_name = stage_name
+        self.func = func
+        self.mode = mode
+        self.interval = interval
+        self.top_n = top_n
+
+    def __call__(self, inputs: Any):
+        profiler = StageProfiler(ProfileMode(self.mode), interval=self.interval, top_n=self.top_n)
+        try:
+            with profiler.stage(self.stage_name):
+                result = self.func(inputs)
+        finally:
+            profiler.close()
+        return result, profiler.profiles[self.stage_name]
+
+def _write_collapsed(path: Path, stacks: Dict[str, int]) -> None:
+    lines = [f"{stack} {count}" for stack, count in sorted(stacks.items())]
+    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
@@ -0,0 +1,387 @@
+"""
+Reversible compaction of C# sources for LLM prompts.
+
+`compact_source` drops whole lines that cost prompt tokens without helping the model: XML doc
+comments, other full-line and block comments (including license headers), `#region` markers,
+boilerplate `using` directives and runs of blank lines. Lines are dropped, never edited, so every
+line of the compacted view is identical to a line of the original, and `CompactedSource.line_map`
+records which one.
+
+`translate_diff` turns a unified diff written against compacted views back into one against the
+original files: each hunk is located in the compacted view by its context and removed lines (near
+the line the model stated, as `git apply` does), that position is mapped through the line map, and
+dropped lines that fall inside the hunk are restored as context, so the result applies to the files
+on disk.
+
+Counts of what was dropped and the prompt tokens saved are kept per process (`get_compaction_stats`).
+They are recorded by `record_prompt_compaction` when a view is actually sent, against the text that
+went into the prompt (a preview only saves tokens on its own characters), not when a view is built.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+
+from .token_counter import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+COMPACTABLE_SUFFIXES = {".cs"}
+# Namespaces whose `using` tells the model nothing about telemetry; a duplicate added back by a
+# patch is only a compiler warning
+BOILERPLATE_USINGS = {
+    "System", "System.Collections", "System.Collections.Generic", "System.Linq", "System.Text",
+    "System.Threading", "System.Threading.Tasks", "System.IO", "System.Globalization",
+}
+USING_DIRECTIVE = re.compile(r"^\s*(?:global\s+)?using\s+([\w.]+)\s*;\s*$")
+REGION_DIRECTIVE = re.compile(r"^\s*#\s*(?:region|endregion)\b")
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+DEFAULT_CACHE_ENTRIES = 512
+
+@dataclass
+class CompactedSource:
+    """A compacted view of a file; `line_map[i]` is the original line number (1-based) of line i + 1."""
+    text: str
+    line_map: List[int]
+    original_lines: List[str]
+    dropped: Dict[str, int] = field(default_factory=dict)
+    compactable: bool = True  # False for views returned unchanged (non-C# files, compaction off)
+
+    @property
+    def compacted(self) -> bool:
+        return len(self.line_map) < len(self.original_lines)
+
+    def original_line(self, line: int) -> int:
+        """Original line number of a (1-based) line of the compacted view."""
+        if line <= 0:
+            return 0
+        if line > len(self.line_map):
+            # Past the end of the view (appending to the file)
+            return len(self.original_lines) + line - len(self.line_map)
+        return self.line_map[line - 1]
+
+class _CompactionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.lines_dropped = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.dropped: Dict[str, int] = {}
+
+    def add(self, lines_dropped: int, dropped: Dict[str, int], tokens_before: int, tokens_after: int) -> None:
+        with self._lock:
+            self.files += 1
+            self.lines_dropped += lines_dropped
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            for kind, count in dropped.items():
+                self.dropped[kind] = self.dropped.get(kind, 0) + count
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "files": self.files,
+                "lines_dropped": self.lines_dropped,
+                "dropped_by_kind": dict(self.dropped),
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": saved,
+                "saved_ratio": round(saved / self.tokens_before, 3) if self.tokens_before else 0.0
+            }
+
+_enabled = True
+_stats = _CompactionStats()
+_cache: "OrderedDict[Tuple[str, bytes], CompactedSource]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def configure_source_compaction(enabled: bool) -> None:
+    """Turn compaction on or off for the process (off: `compact_source` returns files unchanged)."""
+    global _enabled
+    _enabled = enabled
+
+def get_compaction_stats() -> Dict[str, Any]:
+    """Compacted files sent to the model so far and the prompt tokens that saved (a file is counted
+    each time it is sent; `dropped_by_kind` only covers files sent whole)."""
+    return _stats.snapshot()
+
+def compaction_summary() -> Optional[str]:
+    """One line on the prompt tokens compaction saved, or None if no compacted file was sent."""
+    stats = _stats.snapshot()
+    if not stats["files"]:
+        return None
+    return (f"Source compaction: {stats['tokens_saved']:,} of {stats['tokens_before']:,} prompt tokens "
+            f"saved ({stats['saved_ratio']:.0%}) over {stats['files']} files sent")
+
+def record_prompt_compaction(view: CompactedSource, limit: Optional[int] = None) -> None:
+    """Record the tokens compaction saved on `view.text[:limit]`, the text a prompt that is about to
+    be sent carries, against `limit` characters of the original it replaces."""
+    if not view.compactable:
+        return
+    original = "\n".join(view.original_lines)
+    sent, replaced = view.text[:limit], original[:limit]
+    if limit is None or len(view.text) <= limit:
+        lines_dropped, dropped = len(view.original_lines) - len(view.line_map), view.dropped
+    else:
+        # Only the original lines the preview reaches count; what was dropped further on was never sent
+        shown = sent.count("\n") + 1
+        lines_dropped, dropped = view.original_line(shown) - shown, {}
+    counter = get_token_counter()
+    _stats.add(lines_dropped, dropped, counter.count(replaced), counter.count(sent))
+
+def compact_source(text: str, path: Optional[str] = None) -> CompactedSource:
+    """The compacted view of `text` (unchanged for non-C# paths or when compaction is off)."""
+    suffix = PurePosixPath(str(path)).suffix.lower() if path else ".cs"
+    if not _enabled or suffix not in COMPACTABLE_SUFFIXES:
+        lines = text.splitlines()
+        return CompactedSource(text, list(range(1, len(lines) + 1)), lines, compactable=False)
+
+    # Batches are re-measured and previews rebuilt from the same contents, so compact each once
+    key = (suffix, hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=16).digest())
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    compacted = _compact_lines(text.splitlines())
+    with _cache_lock:
+        _cache[key] = compacted
+        if len(_cache) > DEFAULT_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return compacted
+
+def _compact_lines(lines: List[str]) -> CompactedSource:
+    kinds = _classify_lines(lines)
+    kept: List[str] = []
+    line_map: List[int] = []
+    dropped: Dict[str, int] = {}
+    previous_blank = True  # also drops blank lines at the top of the file
+    for number, (line, kind) in enumerate(zip(lines, kinds), start=1):
+        if kind is None and not line.strip():
+            kind = "blank_line" if previous_blank else None
+            previous_blank = True
+        elif kind is None:
+            previous_blank = False
+        if kind is not None:
+            dropped[kind] = dropped.get(kind, 0) + 1
+            continue
+        kept.append(line)
+        line_map.append(number)
+    return CompactedSource("\n".join(kept), line_map, lines, dropped)
+
+def _classify_lines(lines: List[str]) -> List[Optional[str]]:
+    """Why each line can be dropped ("doc_comment", "comment", "license_header", "region",
+    "using"), or None to keep it. Lines that start inside a multi-line string are always kept."""
+    kinds: List[Optional[str]] = [None] * len(lines)
+    in_string = False    # inside a verbatim (@"...") or raw ("""...""") string literal
+    raw_quotes = ""
+    in_comment = False   # inside a /* ... */ block that started at the beginning of a line
+    seen_code = False
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if in_string:
+            in_string, raw_quotes = _string_continues(line, raw_quotes)
+            seen_code = True
+            continue
+        if in_comment:
+            kinds[i] = "comment" if seen_code else "license_header"
+            in_comment = "*/" not in stripped
+            if not in_comment and stripped.split("*/", 1)[1].strip():
+                kinds[i] = None  # code after the comment closes; keep the line
+            continue
+
+        if stripped.startswith("///"):
+            kinds[i] = "doc_comment"
+        elif stripped.startswith("//"):
+            kinds[i] = "comment" if seen_code else "license_header"
+        elif stripped.startswith("/*"):
+            closes = "*/" in stripped[2:]
+            if not closes or not stripped[2:].split("*/", 1)[1].strip():
+                kinds[i] = "comment" if seen_code else "license_header"
+                in_comment = not closes
+        elif REGION_DIRECTIVE.match(line):
+            kinds[i] = "region"
+        elif USING_DIRECTIVE.match(line) and USING_DIRECTIVE.match(line).group(1) in BOILERPLATE_USINGS:
+            kinds[i] = "using"
+        elif stripped:
+            seen_code = True
+            in_string, raw_quotes = _opens_multiline_string(line)
+    return kinds
+
+def _opens_multiline_string(line: str) -> Tuple[bool, str]:
+    """Whether `line` ends inside a verbatim or raw string literal (and the raw literal's quotes)."""
+    i = 0
+    while i < len(line):
+        if line.startswith("//", i):
+            return False, ""
+        if line.startswith('"""', i):
+            quotes = re.match(r'"{3,}', line[i:]).group(0)
+            end = line.find(quotes, i + len(quotes))
+            if end == -1:
+                return True, quotes
+            i = end + len(quotes)
+            continue
+        ch = line[i]
+        if ch == '"':
+            verbatim = "@" in line[max(0, i - 2):i]
+            i += 1
+            while i < len(line):
+                if verbatim and line.startswith('""', i):
+                    i += 2
+                    continue
+                if not verbatim and line[i] == "\\":
+                    i += 2
+                    continue
+                if line[i] == '"':
+                    break
+                i += 1
+            else:
+                return verbatim, ""
+        elif ch == "'":
+            i += 3 if line.startswith("\\", i + 1) else 2
+        i += 1
+    return False, ""
+
+def _string_continues(line: str, raw_quotes: str) -> Tuple[bool, str]:
+    """Whether a multi-line string literal is still open after `line` (and its raw quotes)."""
+    if raw_quotes:
+        end = line.find(raw_quotes)
+        if end == -1:
+            return True, raw_quotes
+        return _opens_multiline_string(line[end + len(raw_quotes):])
+    i = 0
+    while i < len(line):
+        if line.startswith('""', i):
+            i += 2
+            continue
+        if line[i] == '"':
+            return _opens_multiline_string(line[i + 1:])
+        i += 1
+    return True, ""
+
+def translate_diff(diff_text: str, sources: Dict[str, CompactedSource]) -> str:
+    """Rewrite a unified diff against compacted views into one against the original files.
+
+    `sources` maps paths (or bare file names, as shown to the model) to their compacted views; a
+    diff section whose file has no entry, or was not compacted, is passed through unchanged.
+    """
+    output: List[str] = []
+    source: Optional[CompactedSource] = None
+    offset = 0  # lines added minus removed by earlier hunks of the current file
+    lines = diff_text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _is_file_header(lines, i):
+            source = _source_for(line[4:], sources)
+            offset = 0
+            output.append(line)
+            i += 1
+            continue
+        match = HUNK_HEADER.match(line)
+        if match is None or source is None or not source.compacted:
+            output.append(line)
+            i += 1
+            continue
+
+        old_start, old_count = int(match.group(1)), int(match.group(2) or 1)
+        body = []
+        i += 1
+        # Model-written hunk counts are unreliable, so a hunk runs to the next header
+        while i < len(lines) and not (lines[i].startswith(("@@ ", "diff ")) or _is_file_header(lines, i)):
+            body.append(lines[i])
+            i += 1
+        hunk, start, old_lines, new_lines = _translate_hunk(body, old_start, old_count, source)
+        if old_lines:
+            new_start = start + offset if new_lines else start + offset - 1
+        else:  # a pure insertion after line `start`
+            new_start = start + offset + 1
+        output.append(f"@@ -{start},{old_lines} +{new_start},{new_lines} @@{match.group(5)}")
+        output.extend(hunk)
+        offset += new_lines - old_lines
+    return "\n".join(output) + ("\n" if diff_text.endswith("\n") else "")
+
+def _is_file_header(lines: List[str], i: int) -> bool:
+    return lines[i].startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")
+
+def _source_for(header: str, sources: Dict[str, CompactedSource]) -> Optional[CompactedSource]:
+    path = header.split("\t", 1)[0].strip()
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    if path in sources:
+        return sources[path]
+    name = PurePosixPath(path.replace("\\", "/")).name
+    return sources.get(name)
+
+def _translate_hunk(body: List[str], old_start: int, old_count: int,
+                    source: CompactedSource) -> Tuple[List[str], int, int, int]:
+    """The hunk's lines against the original file, its original start line and its old and new
+    line counts. For a pure insertion the start is the line it follows.
+
+    The model's text is kept; only positions are translated. Model-written line numbers are often
+    off, so like `git apply` the hunk is placed where its context and removed lines match the
+    compacted view, searching outward from the stated start. A hunk that matches nowhere is passed
+    through at its stated position, so it fails to apply instead of changing the wrong lines.
+    """
+    while body and not body[-1]:  # blank lines the model left between sections
+        body = body[:-1]
+    ops = [(line[:1], line[1:]) if line else (" ", "") for line in body]
+    old_texts = [text for op, text in ops if op in (" ", "-")]
+    new_count = sum(1 for op, _ in ops if op in (" ", "+"))
+    if not old_texts:
+        # Nothing to match a pure insertion against; "-N,0" inserts after line N, "-N" at line N
+        return list(body), source.original_line(old_start if not old_count else old_start - 1), 0, new_count
+
+    view = source.text.splitlines()
+    found = _find_hunk(view, old_texts, old_start)
+    if found is None:
+        logger.warning("Hunk at compacted line %s does not match the compacted view; passing it through unchanged",
+                       old_start)
+        return list(body), source.original_line(old_start), len(old_texts), new_count
+
+    original = source.original_lines
+    start = position = source.line_map[found - 1]
+    current = found
+    hunk: List[str] = []
+    old_lines = new_lines = 0
+    for (op, _), line in zip(ops, body):
+        if op in (" ", "-"):
+            target = source.line_map[current - 1]
+            while position < target:  # restore dropped lines inside the hunk as context
+                hunk.append(" " + original[position - 1])
+                position += 1
+                old_lines += 1
+                new_lines += 1
+            hunk.append(op + view[current - 1])  # the model's text, up to trailing whitespace
+            position = target + 1
+            current += 1
+            old_lines += 1
+            new_lines += op == " "
+        elif op == "+":
+            hunk.append(line)
+            new_lines += 1
+        else:  # "\ No newline at end of file"
+            hunk.append(line)
+    return hunk, start, old_lines, new_lines
+
+def _find_hunk(view: List[str], old_texts: List[str], stated: int) -> Optional[int]:
+    """The 1-based line of `view` where `old_texts` match, nearest `stated` (earlier on a tie);
+    trailing whitespace is ignored only if nothing matches exactly."""
+    last_start = len(view) - len(old_texts) + 1
+    if last_start < 1:
+        return None
+    stated = min(max(stated, 1), last_start)
+    for normalize in (lambda text: text, str.rstrip):
+        wanted = [normalize(text) for text in old_texts]
+        for distance in range(max(stated - 1, last_start - stated) + 1):
+            for candidate in (stated - distance, stated + distance):
+                if 1 <= candidate <= last_start and all(
+                        normalize(view[candidate - 1 + k]) == text for k, text in enumerate(wanted)):
+                    return candidate
+    return None
@@ -1,10 +1,17 @@
 import subprocess
 import json
+import logging
+import os
 import tempfile
 import hashlib
 import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Container
+
+from .code_graph_manager import iter_graph_symbols, write_ndjson_graph
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 # IMPORTANT: Update this path to point to your compiled C# tool
 ROSLYN_TOOL_PATH = "~/Documents/TRA/CodeGraphBuilder/bin/Release/net9.0/CodeGraphBuilder.dll"
@@ -12,50 +19,50 @@ ROSLYN_TOOL_PATH = "~/Documents/TRA/CodeGraphBuilder/bin/Release/net9.0/CodeGrap
 # Define a function to get the best available code graph path
 def get_best_code_graph_path() -> str:
     """Find the best available code graph file."""
-    print("[DEBUG] get_best_code_graph_path: Starting search for best code graph...")
+    logger.debug("get_best_code_graph_path: Starting search for best code graph...")
     
     # First try the main codegraph.json
     main_graph = Path("codegraph.json")
-    print(f"[DEBUG] get_best_code_graph_path: Checking main graph: {main_graph}")
+    logger.debug("get_best_code_graph_path: Checking main graph: %s", main_graph)
     if main_graph.exists():
         size = main_graph.stat().st_size
-        print(f"[DEBUG] get_best_code_graph_path: Main graph exists, size: {size} bytes")
+        logger.debug("get_best_code_graph_path: Main graph exists, size: %s bytes", size)
         if size > 100:  # Non-empty file
-            print(f"[DEBUG] get_best_code_graph_path: Using main graph: {main_graph}")
+            logger.debug("get_best_code_graph_path: Using main graph: %s", main_graph)
             return str(main_graph)
         else:
-            print(f"[DEBUG] get_best_code_graph_path: Main graph too small ({size} bytes), looking for cached graphs")
+            logger.debug("get_best_code_graph_path: Main graph too small (%s bytes), looking for cached graphs", size)
     else:
-        print(f"[DEBUG] get_best_code_graph_path: Main graph does not exist")
+        logger.debug("get_best_code_graph_path: Main graph does not exist")
     
     # Look for cached code graphs
     cache_dir = Path(".cache/code-graphs")
-    print(f"[DEBUG] get_best_code_graph_path: Checking cache directory: {cache_dir}")
+    logger.debug("get_best_code_graph_path: Checking cache directory: %s", cache_dir)
     if cache_dir.exists():
-        print(f"[DEBUG] get_best_code_graph_path: Cache directory exists")
+        logger.debug("get_best_code_graph_path: Cache directory exists")
         # Find the most recent atlas-monorepo graph
         atlas_graphs = list(cache_dir.glob("atlas-monorepo-*.json"))
-        print(f"[DEBUG] get_best_code_graph_path: Found {len(atlas_graphs)} atlas graphs: {[g.name for g in atlas_graphs]}")
+        logger.debug("get_best_code_graph_path: Found %s atlas graphs: %s", len(atlas_graphs), [g.name for g in atlas_graphs])
         if atlas_graphs:
             # Use the most recent one (by name, which should be timestamp-based)
             latest_graph = max(atlas_graphs, key=lambda x: x.name)
             size = latest_graph.stat().st_size
-            print(f"[DEBUG] get_best_code_graph_path: Latest graph: {latest_graph}, size: {size} bytes")
+            logger.debug("get_best_code_graph_path: Latest graph: %s, size: %s bytes", latest_graph, size)
             if size > 100:  # Non-empty file
-                print(f"[DEBUG] get_best_code_graph_path: Using cached graph: {latest_graph}")
+                logger.debug("get_best_code_graph_path: Using cached graph: %s", latest_graph)
                 return str(latest_graph)
             else:
-                print(f"[DEBUG] get_best_code_graph_path: Latest graph too small ({size} bytes)")
+                logger.debug("get_best_code_graph_path: Latest graph too small (%s bytes)", size)
         else:
-            print(f"[DEBUG] get_best_code_graph_path: No atlas graphs found in cache")
+            logger.debug("get_best_code_graph_path: No atlas graphs found in cache")
     else:
-        print(f"[DEBUG] get_best_code_graph_path: Cache directory does not exist")
+        logger.debug("get_best_code_graph_path: Cache directory does not exist")
     
-    print(f"[DEBUG] get_best_code_graph_path: Falling back to default: codegraph.json")
+    logger.debug("get_best_code_graph_path: Falling back to default: codegraph.json")
     return "codegraph.json"  # Fallback to default
 
 CODE_GRAPH_PATH = get_best_code_graph_path()
-print(f"[DEBUG] static_analyzer: CODE_GRAPH_PATH set to: {CODE_GRAPH_PATH}")
+logger.debug("static_analyzer: CODE_GRAPH_PATH set to: %s", CODE_GRAPH_PATH)
 # Cache directory
 CACHE_DIR = Path(".cache/code-graphs")
 
@@ -92,15 +99,13 @@ def should_use_cache(project_paths: List[str], cache_file: Path) -> Tuple[bool,
             time_diff = newest_project_time - cache_time
             return False, f"Code has been modified {time_diff:.0f} seconds after cache was created"
         
-        # Quick validation that cache file is valid JSON with symbols
-        with open(cache_file, 'r') as f:
-            data = json.load(f)
-            symbol_count = len(data.get('Symbols', []))
-            if symbol_count == 0:
-                return False, "Cache exists but has no symbols"
-            
-            cache_age_hours = (time.time() - cache_time) / 3600
-            return True, f"Cache valid with {symbol_count} symbols (age: {cache_age_hours:.1f} hours)"
+        # Quick validation that cache file is a readable graph with symbols
+        symbol_count = sum(1 for _ in iter_graph_symbols(cache_file))
+        if symbol_count == 0:
+            return False, "Cache exists but has no symbols"
+        
+        cache_age_hours = (time.time() - cache_time) / 3600
+        return True, f"Cache valid with {symbol_count} symbols (age: {cache_age_hours:.1f} hours)"
             
     except Exception as e:
         return False, f"Cache validation failed: {str(e)}"
@@ -116,7 +121,7 @@ def load_cached_graph(cache_file: Path) -> bool:
         shutil.copy2(cache_file, CODE_GRAPH_PATH)
         return True
     except Exception as e:
-        print(f"Failed to load cached graph: {e}")
+        logger.warning("Failed to load cached graph: %s", e)
         return False
 
 def save_to_cache(cache_file: Path) -> bool:
@@ -131,9 +136,30 @@ def save_to_cache(cache_file: Path) -> bool:
             return True
         return False
     except Exception as e:
-        print(f"Failed to save to cache: {e}")
+        logger.warning("Failed to save to cache: %s", e)
         return False
 
+def _iter_unique_symbols(graph_files: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+    """
+    Stream symbols from several graph files, dropping repeated FullNames.
+    Only the names are kept in memory, never the merged graph itself.
+    """
+    symbol_fullnames = set()
+    for graph_file in graph_files:
+        if not graph_file.exists():
+            continue
+        try:
+            for symbol in iter_graph_symbols(graph_file):
+                # Use FullName as a unique identifier (based on CodeSymbol class in C#)
+                symbol_fullname = symbol.get("FullName")
+                if symbol_fullname and symbol_fullname not in symbol_fullnames:
+                    symbol_fullnames.add(symbol_fullname)
+                    yield symbol
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse JSON from %s", graph_file)
+        except Exception as e:
+            logger.error("Error reading %s: %s", graph_file, e)
+
 def build_monorepo_graph(project_paths: List[str], force_rebuild: bool = False):
     """
     Calls the C# tool's 'index' command to build the code graph.
@@ -155,42 +181,42 @@ def build_monorepo_graph(project_paths: List[str], force_rebuild: bool = False):
         if Path(path).exists():
             normalized_paths.append(path)
         else:
-            print(f"Warning: Project path does not exist: {path}")
+            logger.warning("Project path does not exist: %s", path)
     
-    print(f"Normalized {len(normalized_paths)} valid project paths")
+    logger.info("Normalized %s valid project paths", len(normalized_paths))
     
     # Check cache first (unless force rebuild)
     cache_file = get_cache_file_path(normalized_paths)
     
     if not force_rebuild:
-        print("🔍 Checking for cached code graph...")
+        logger.info("🔍 Checking for cached code graph...")
         use_cache, reason = should_use_cache(normalized_paths, cache_file)
         
         if use_cache:
-            print(f"✅ Using cached code graph: {reason}")
-            print(f"📁 Cache location: {cache_file}")
+            logger.info("✅ Using cached code graph: %s", reason)
+            logger.info("📁 Cache location: %s", cache_file)
             
             if load_cached_graph(cache_file):
-                print("🚀 Code graph loaded from cache successfully!")
+                logger.info("🚀 Code graph loaded from cache successfully!")
                 return
             else:
-                print("⚠️ Failed to load cache, rebuilding...")
+                logger.warning("Failed to load cache, rebuilding...")
         else:
-            print(f"🔄 Cache miss: {reason}")
-            print(f"🏗️ Building fresh code graph...")
+            logger.info("🔄 Cache miss: %s", reason)
+            logger.info("🏗️ Building fresh code graph...")
     else:
-        print("🔄 Force rebuild requested, ignoring cache...")
+        logger.info("🔄 Force rebuild requested, ignoring cache...")
     
     # Build the graph from scratch
-    print(f"Building code graph for {len(normalized_paths)} projects...")
+    logger.info("Building code graph for %s projects...", len(normalized_paths))
     
     # Add debug logging for a few paths to verify format
     if normalized_paths:
-        print(f"First project path: {normalized_paths[0]}")
+        logger.info("First project path: %s", normalized_paths[0])
         if len(normalized_paths) > 1:
-            print(f"Second project path: {normalized_paths[1]}")
+            logger.info("Second project path: %s", normalized_paths[1])
         # Check if the paths actually exist
-        print(f"First project exists: {Path(normalized_paths[0]).exists()}")
+        logger.info("First project exists: %s", Path(normalized_paths[0]).exists())
     
     # Instead of using a single command with all projects, we'll use a multi-step approach:
     # 1. Process each project individually to avoid command line argument issues
@@ -198,7 +224,7 @@ def build_monorepo_graph(project_paths: List[str], force_rebuild: bool = False):
     
     # Create temporary directory for batch results
     batch_dir = Path(tempfile.mkdtemp())
-    print(f"Using temporary directory for batch results: {batch_dir}")
+    logger.info("Using temporary directory for batch results: %s", batch_dir)
     
     # Process projects in batches of 20 for organization
     batch_size = 20
@@ -207,17 +233,17 @@ def build_monorepo_graph(project_paths: List[str], force_rebuild: bool = False):
     try:
         for batch_index in range(0, len(normalized_paths), batch_size):
             batch_paths = normalized_paths[batch_index:batch_index+batch_size]
-            batch_output = batch_dir / f"batch_{batch_index//batch_size}.json"
+            batch_output = batch_dir / f"batch_{batch_index//batch_size}.ndjson"
             batch_graphs.append(batch_output)
             
-            print(f"Processing batch {batch_index//batch_size + 1} with {len(batch_paths)} projects...")
+            logger.info("Processing batch %s with %s projects...", batch_index//batch_size + 1, len(batch_paths))
             
             # Process one project at a time
             all_successful = True
             single_graphs = []
             
             for proj_index, project_path in enumerate(batch_paths):
-                single_output = batch_dir / f"single_{batch_index//batch_size}_{proj_index}.json"
+                single_output = batch_dir / f"single_{batch_index//batch_size}_{proj_index}.ndjson"
                 single_graphs.append(single_output)
                 
                 # Create a temporary file with the single project path
@@ -231,50 +257,35 @@ def build_monorepo_graph(project_paths: List[str], force_rebuild: bool = False):
                     expanded_tool_path,
                     "index",
                     "--projects-file", str(temp_projects_file),  # Use projects-file as expected
-                    "--output-file", str(single_output)
+                    "--output-file", str(single_output),
+                    "--format", "ndjson"  # Compact, line-per-symbol output that can be merged incrementally
                 ]
                 
                 try:
-                    print(f"Processing project {proj_index+1}/{len(batch_paths)}: {project_path}")
-                    result = subprocess.run(command, capture_output=True, text=True, check=True)
+                    logger.info("Processing project %s/%s: %s", proj_index+1, len(batch_paths), project_path)
+                    with tracer.start_span("roslyn.index", attributes={
+                        "roslyn.project": project_path,
+                        "roslyn.batch": batch_index // batch_size
+                    }) as span:
+                        result = subprocess.run(command, capture_output=True, text=True, check=True)
+                        span.set_attribute("roslyn.output_bytes", single_output.stat().st_size if single_output.exists() else 0)
                     
                     if result.stdout:
-                        print(f"STDOUT: {result.stdout}")
+                        logger.debug("STDOUT: %s", result.stdout)
                     if result.stderr:
-                        print(f"STDERR: {result.stderr}")
+                        logger.debug("STDERR: %s", result.stderr)
                         
                 except subprocess.CalledProcessError as e:
-                    print(f"--- Warning: Project {proj_index+1} failed ---")
-                    print(f"Command: {' '.join(command)}")
-                    print(f"STDOUT: {e.stdout}")
-                    print(f"STDERR: {e.stderr}")
+                    logger.warning("Project %s failed", proj_index+1)
+                    logger.warning("Command: %s", ' '.join(command))
+                    logger.warning("STDOUT: %s", e.stdout)
+                    logger.warning("STDERR: %s", e.stderr)
                     all_successful = False
             
             # Create a merged file for this batch
-            batch_symbols = {"Symbols": []}
-            symbol_fullnames = set()
-            
-            for single_graph in single_graphs:
-                if single_graph.exists():
-                    try:
-                        with open(single_graph, 'r') as f:
-                            try:
-                                single_data = json.load(f)
-                                for symbol in single_data.get("Symbols", []):
-                                    symbol_fullname = symbol.get("FullName")
-                                    if symbol_fullname and symbol_fullname not in symbol_fullnames:
-                                        symbol_fullnames.add(symbol_fullname)
-                                        batch_symbols["Symbols"].append(symbol)
-                            except json.JSONDecodeError:
-                                print(f"Warning: Failed to parse JSON from {single_graph}")
-                    except Exception as e:
-                        print(f"Error reading {single_graph}: {str(e)}")
-            
-            # Write the merged batch result
-            with open(batch_output, 'w') as f:
-                json.dump(batch_symbols, f)
+            batch_symbol_count = write_ndjson_graph(_iter_unique_symbols(single_graphs), batch_output)
             
-            print(f"Batch {batch_index//batch_size + 1} combined graph has {len(batch_symbols['Symbols'])} symbols")
+            logger.info("Batch %s combined graph has %s symbols", batch_index//batch_size + 1, batch_symbol_count)
             
             # We no longer need this block as we're processing one project at a time
             # The above batch processing code already handles running the commands and error reporting
@@ -283,152 +294,100 @@ def build_monorepo_graph(project_paths: List[str], force_rebuild: bool = False):
         successful_batches = [bg for bg in batch_graphs if bg.exists()]
         
         if not successful_batches:
-            print("Warning: No batch graphs were created successfully.")
+            logger.warning("No batch graphs were created successfully.")
             # Create an empty graph file to avoid later errors
-            with open(CODE_GRAPH_PATH, 'w') as f:
-                f.write('{"Symbols":[]}')
+            write_ndjson_graph([], CODE_GRAPH_PATH)
             return
             
-        print(f"Merging {len(successful_batches)} batch graphs into a single comprehensive graph...")
+        logger.info("Merging %s batch graphs into a single comprehensive graph...", len(successful_batches))
         
-        # Load and merge all graphs
-        merged_graph = {"Symbols": []}
-        symbol_fullnames = set()  # To track unique symbols by their full name
-        
-        for batch_graph in successful_batches:
-            try:
-                with open(batch_graph, 'r') as f:
-                    batch_data = json.load(f)
-                
-                # Merge symbols, avoiding duplicates
-                # The CodeSymbol class uses FullName as the unique identifier
-                for symbol in batch_data.get("Symbols", []):
-                    # Use FullName as a unique identifier (based on CodeSymbol class in C#)
-                    symbol_fullname = symbol.get("FullName")
-                    if symbol_fullname and symbol_fullname not in symbol_fullnames:
-                        symbol_fullnames.add(symbol_fullname)
-                        merged_graph["Symbols"].append(symbol)
-                
-                print(f"Added symbols from {batch_graph}")
-            except Exception as e:
-                print(f"Error processing batch graph {batch_graph}: {str(e)}")
-        
-        # Write the merged graph to the output file
-        with open(CODE_GRAPH_PATH, 'w') as f:
-            json.dump(merged_graph, f)
-            
-        total_symbols = len(merged_graph['Symbols'])
-        print(f"Code graph built successfully with {total_symbols} total symbols.")
+        # Stream every batch into the final graph, avoiding duplicates
+        total_symbols = write_ndjson_graph(_iter_unique_symbols(successful_batches), CODE_GRAPH_PATH)
+        logger.info("Code graph built successfully with %s total symbols.", total_symbols)
         
         # Save to cache for future use
         if total_symbols > 0:  # Only cache if we actually got symbols
-            print("💾 Saving code graph to cache...")
+            logger.info("💾 Saving code graph to cache...")
             if save_to_cache(cache_file):
-                print(f"✅ Code graph cached at: {cache_file}")
+                logger.info("✅ Code graph cached at: %s", cache_file)
             else:
-                print("⚠️ Failed to save to cache (non-critical)")
+                logger.warning("Failed to save to cache (non-critical)")
         else:
-            print("⚠️ Not caching empty code graph")
+            logger.warning("Not caching empty code graph")
             
     except Exception as e:
-        print(f"Error during batch processing: {str(e)}")
+        logger.error("Error during batch processing: %s", e)
         raise e
     finally:
         # Clean up temporary files
         try:
             import shutil
             shutil.rmtree(batch_dir)
-            print(f"Cleaned up temporary directory: {batch_dir}")
+            logger.info("Cleaned up temporary directory: %s", batch_dir)
         except Exception as e:
-            print(f"Warning: Failed to clean up temporary directory: {str(e)}")
+            logger.warning("Failed to clean up temporary directory: %s", e)
             pass
 
 # (The 'expand_with_code_graph' function also needs this fix)
-def expand_with_code_graph(seed_files: List[Path]) -> List[Path]:
+def expand_with_code_graph(seed_files: List[Path],
+                           max_depth: int = 2,
+                           max_fanout: Optional[int] = 50,
+                           dependents_weight: float = 1.0,
+                           dependencies_weight: float = 1.0,
+                           max_results: Optional[int] = None,
+                           known_files: Optional[Container[str]] = None) -> List[Path]:
     """
     Takes a list of seed files and uses the cached code graph to find all related files efficiently.
+
+    All seeds are expanded together with a multi-source BFS over the file dependency graph
+    (see CodeGraphData.expand_files); results come back best-scored first. The graph may be a
+    cached one that still lists files deleted or renamed since, so graph files must be confirmed:
+    pass the search engine's file index (IntelligentSearchEngine.file_index, keyed by absolute
+    path) as `known_files` to check them in memory; otherwise each result is checked on disk once.
+    Seeds were found on disk and are always kept.
     """
-    print(f"[DEBUG] expand_with_code_graph: Starting expansion with {len(seed_files)} seed files")
-    print(f"[DEBUG] expand_with_code_graph: Seed files: {[str(f) for f in seed_files]}")
+    logger.debug("expand_with_code_graph: Starting expansion with %s seed files", len(seed_files))
     
     if not seed_files:
-        print(f"[DEBUG] expand_with_code_graph: No seed files provided, returning empty list")
+        logger.debug("expand_with_code_graph: No seed files provided, returning empty list")
         return []
         
-    print(f"Expanding {len(seed_files)} seed file(s) with cached Code Graph...")
+    logger.info("Expanding %s seed file(s) with cached Code Graph...", len(seed_files))
     
     # Use the cached code graph manager for efficient expansion
-    print(f"[DEBUG] expand_with_code_graph: Importing code_graph_manager")
     from .code_graph_manager import code_graph_manager
     
-    print(f"[DEBUG] expand_with_code_graph: Loading graph data from: {CODE_GRAPH_PATH}")
+    logger.debug("expand_with_code_graph: Loading graph data from: %s", CODE_GRAPH_PATH)
     graph_data = code_graph_manager.get_graph_data(CODE_GRAPH_PATH)
     if not graph_data:
-        print(f"[DEBUG] expand_with_code_graph: Failed to load graph data, using seed files only")
-        print(f"Warning: Could not load code graph from '{CODE_GRAPH_PATH}'. Using seed files only.")
+        logger.debug("expand_with_code_graph: Failed to load graph data, using seed files only")
+        logger.warning("Could not load code graph from '%s'. Using seed files only.", CODE_GRAPH_PATH)
         return seed_files
     
-    print(f"[DEBUG] expand_with_code_graph: Graph data loaded successfully")
-    print(f"[DEBUG] expand_with_code_graph: Dependency graph has {graph_data.dependency_graph.number_of_nodes()} nodes, {graph_data.dependency_graph.number_of_edges()} edges")
+    logger.debug("expand_with_code_graph: Dependency graph has %s nodes, %s edges", graph_data.dependency_graph.number_of_nodes(), graph_data.dependency_graph.number_of_edges())
     
     # Convert seed files to strings for comparison
     seed_files_str = {str(f.resolve()) for f in seed_files}
-    expanded_files = set(seed_files_str)  # Start with seed files
-    print(f"[DEBUG] expand_with_code_graph: Seed files as strings: {list(seed_files_str)}")
     
-    # Use the dependency graph for efficient expansion
-    dependency_graph = graph_data.dependency_graph
+    expanded = graph_data.expand_files(
+        seed_files_str,
+        max_depth=max_depth,
+        max_fanout=max_fanout,
+        dependents_weight=dependents_weight,
+        dependencies_weight=dependencies_weight
+    )
+    logger.debug("expand_with_code_graph: Total expanded files: %s (depth %s, fan-out cap %s)", len(expanded), max_depth, max_fanout)
     
-    # For each seed file, find all connected files (both predecessors and successors)
-    for seed_file_str in seed_files_str:
-        print(f"[DEBUG] expand_with_code_graph: Processing seed file: {seed_file_str}")
-        if seed_file_str in dependency_graph:
-            print(f"[DEBUG] expand_with_code_graph: Seed file found in dependency graph")
-            
-            # Add files that depend on this seed file (predecessors)
-            predecessors = set(dependency_graph.predecessors(seed_file_str))
-            print(f"[DEBUG] expand_with_code_graph: Found {len(predecessors)} predecessors")
-            expanded_files.update(predecessors)
-            
-            # Add files that this seed file depends on (successors)
-            successors = set(dependency_graph.successors(seed_file_str))
-            print(f"[DEBUG] expand_with_code_graph: Found {len(successors)} successors")
-            expanded_files.update(successors)
-            
-            # Add second-degree connections for better coverage
-            connected_files = list(predecessors) + list(successors)
-            print(f"[DEBUG] expand_with_code_graph: Processing {len(connected_files)} connected files for second-degree connections")
-            second_level_count = 0
-            for connected_file in connected_files:
-                if connected_file in dependency_graph:
-                    # Add one more level of connections
-                    second_level = set(dependency_graph.predecessors(connected_file))
-                    second_level.update(dependency_graph.successors(connected_file))
-                    second_level_count += len(second_level)
-                    expanded_files.update(second_level)
-            print(f"[DEBUG] expand_with_code_graph: Added {second_level_count} second-degree connections")
-        else:
-            print(f"[DEBUG] expand_with_code_graph: Seed file NOT found in dependency graph")
-    
-    print(f"[DEBUG] expand_with_code_graph: Total expanded files before filtering: {len(expanded_files)}")
-    
-    # Convert back to Path objects and filter existing files
-    result_files = []
-    skipped_files = []
-    for file_str in expanded_files:
-        try:
-            path_obj = Path(file_str)
-            if path_obj.exists():
-                result_files.append(path_obj)
-            else:
-                skipped_files.append(file_str)
-        except Exception as e:
-            print(f"[DEBUG] expand_with_code_graph: Error processing file {file_str}: {e}")
-            skipped_files.append(file_str)
+    if known_files is None:
+        # No in-memory index supplied: each distinct candidate is checked on disk exactly once
+        result_files = [Path(f) for f in expanded if f in seed_files_str or os.path.isfile(f)]
+    else:
+        result_files = [Path(f) for f in expanded if f in seed_files_str or f in known_files]
+    if max_results is not None:
+        result_files = result_files[:max_results]
     
-    print(f"[DEBUG] expand_with_code_graph: Final result: {len(result_files)} existing files")
-    print(f"[DEBUG] expand_with_code_graph: Skipped {len(skipped_files)} non-existing files")
-    print(f"✅ Code Graph expanded {len(seed_files)} seed files to {len(result_files)} total files using cached data")
+    logger.debug("expand_with_code_graph: Final result: %s existing files", len(result_files))
+    logger.info("✅ Code Graph expanded %s seed files to %s total files using cached data", len(seed_files), len(result_files))
     return result_files
 
 # (run_static_analysis can be removed as we are using the graph-based approach)
\ No newline at end of file
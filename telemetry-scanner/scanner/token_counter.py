@@ -0,0 +1,172 @@
+"""
+Prompt token counting and per-call-site prompt budgets.
+
+`TokenCounter` counts tokens with tiktoken's local BPE tables when tiktoken is installed (and its
+encoding files are available offline or downloadable once); otherwise it falls back to a
+conservative estimate of one token per three characters, so budgets err on the small side. Counts
+are cached by a digest of the text, as the same file contents and prompt templates are counted
+repeatedly while batches are sized.
+
+Every LLM call site has a prompt budget (`prompt_budget`, keyed by the same operation names the
+LLM gateway uses, e.g. `compose_patch`). Call sites that judge independent items and whose prompt
+is over budget split their batch with `split_for_prompt` and send the parts concurrently instead of
+failing or truncating. Patch generation needs every file in one prompt and packs the files tighter
+(see `context_packer`) instead.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, TypeVar
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The encoding of the o-series and gpt-4o models
+DEFAULT_ENCODING = "o200k_base"
+FALLBACK_CHARS_PER_TOKEN = 3
+DEFAULT_CACHE_ENTRIES = 8192
+# Chat framing per message (role and separators) and for priming the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Prompt budgets per call site, leaving room in o3's 200k context for reasoning and output
+DEFAULT_PROMPT_BUDGET = 100000
+DEFAULT_PROMPT_BUDGETS = {
+    "filter_batch_for_telemetry_enhancement": 16000,
+    "final_telemetry_file_selection": 16000,
+    "enhanced_patch_generation": 120000,
+    "select_files_for_edit": 100000,
+    "compose_patch": 100000,
+}
+
+class TokenCounter:
+    """Counts tokens of texts and chat messages, caching counts by text digest."""
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING, cache_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.encoding_name = encoding_name
+        self.cache_entries = cache_entries
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:  # the BPE file could not be loaded (e.g. offline, nothing cached)
+                logger.warning("Tokenizer %s unavailable (%s); estimating tokens from characters", encoding_name, e)
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"counted": 0, "cache_hits": 0, "splits": 0}
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from the tokenizer rather than the character estimate."""
+        return self._encoding is not None
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached
+
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+        else:
+            tokens = -(-len(text) // FALLBACK_CHARS_PER_TOKEN)
+
+        with self._lock:
+            self.stats["counted"] += 1
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: Iterable[Mapping[str, Any]]) -> int:
+        """Prompt tokens of a chat request's messages, including the chat framing."""
+        total = TOKENS_PER_REPLY
+        for message in messages:
+            total += TOKENS_PER_MESSAGE + self.count(message.get("content") or "")
+        return total
+
+    def record_split(self, operation: str, parts: int) -> None:
+        with self._lock:
+            self.stats["splits"] += 1
+        logger.info("%s: prompt over its %s-token budget, split into %s concurrent calls",
+                    operation, prompt_budget(operation), parts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, exact=self.exact, encoding=self.encoding_name if self.exact else None)
+
+def split_to_budget(items: Sequence[T], item_tokens: Sequence[int], base_tokens: int, budget: int) -> List[List[T]]:
+    """Split `items` into consecutive chunks whose prompts fit `budget`.
+
+    A chunk's prompt is estimated as `base_tokens` (the prompt without any item) plus its items'
+    tokens. An item too large to fit even alone gets a chunk of its own; callers send it anyway
+    rather than drop it. A budget of 0 or less keeps everything in one chunk.
+    """
+    if budget <= 0 or not items:
+        return [list(items)]
+    chunks: List[List[T]] = []
+    current: List[T] = []
+    used = base_tokens
+    for item, tokens in zip(items, item_tokens):
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], base_tokens
+        current.append(item)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def split_for_prompt(operation: str, items: Sequence[T],
+                     build_messages: Callable[[Sequence[T]], List[Dict[str, str]]]) -> List[List[T]]:
+    """`[items]` if the messages built from all of them fit the call site's budget, else the items
+    split into parts that each fit (see `split_to_budget`)."""
+    counter = get_token_counter()
+    budget = prompt_budget(operation)
+    if budget <= 0:
+        return [list(items)]
+    tokens = counter.count_messages(build_messages(items))
+    if tokens <= budget:
+        return [list(items)]
+    if len(items) <= 1:
+        logger.warning("%s: prompt of %s tokens exceeds its %s-token budget and cannot be split; sending it whole",
+                       operation, tokens, budget)
+        return [list(items)]
+
+    base_tokens = counter.count_messages(build_messages([]))
+    item_tokens = [counter.count_messages(build_messages([item])) - base_tokens for item in items]
+    parts = split_to_budget(items, item_tokens, base_tokens, budget)
+    counter.record_split(operation, len(parts))
+    return parts
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+_budgets: Dict[str, int] = dict(DEFAULT_PROMPT_BUDGETS)
+
+def get_token_counter() -> TokenCounter:
+    """The process-wide token counter, created on first use."""
+    global _counter
+    with _counter_lock:
+        if _counter is None:
+            _counter = TokenCounter()
+        return _counter
+
+def prompt_budget(operation: str) -> int:
+    """Prompt token budget of a call site (0 = unlimited)."""
+    return _budgets.get(operation, DEFAULT_PROMPT_BUDGET)
+
+def configure_prompt_budgets(overrides: Mapping[str, int]) -> None:
+    """Override the budgets of some call sites, e.g. {"compose_patch": 60000}."""
+    _budgets.update(overrides)
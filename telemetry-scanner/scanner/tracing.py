@@ -0,0 +1,248 @@
+"""
+Built-in tracing for the agent's own runs.
+
+Lightweight, OpenTelemetry-style spans (trace/span ids, parent links, attributes, status) kept in
+memory and exported at the end of a run to local files, so no collector is needed:
+
+- OTLP/JSON (`trace.otlp.json`), loadable by any OTLP-compatible tool
+- Chrome trace events (`trace.chrome.json`), viewable in chrome://tracing or Perfetto
+
+The current span is tracked in a context variable, so spans nest across asyncio tasks and
+`asyncio.to_thread` calls. Work done in worker processes is covered by the span of the stage
+that submitted it.
+"""
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+SERVICE_NAME = "telemetry-refactoring-agent"
+SCOPE_NAME = "telemetry-scanner"
+
+class SpanKind(Enum):
+    # Values follow the OTLP SpanKind enum
+    INTERNAL = 1
+    CLIENT = 3
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    kind: SpanKind = SpanKind.INTERNAL
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_ns: int = 0
+    end_ns: int = 0
+    status_ok: bool = True
+    status_message: str = ""
+    thread_id: int = 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str) -> None:
+        self.status_ok = False
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status_ok = False
+        self.status_message = str(exc)
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)
+
+class _NoopSpan:
+    """Returned when tracing is disabled, so instrumented code needs no checks."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    """Records spans for one run (one trace id)."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.trace_id = os.urandom(16).hex()
+        self._finished: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   kind: SpanKind = SpanKind.INTERNAL) -> Iterator[Span]:
+        """Open a child of the current span; exceptions mark it failed and propagate."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_span_id=parent.span_id if parent else None,
+            kind=kind,
+            attributes=dict(attributes or {}),
+            start_ns=time.time_ns(),
+            thread_id=threading.get_ident()
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            with self._lock:
+                self._finished.append(span)
+
+    def current_span(self):
+        return _current_span.get() or _NOOP_SPAN
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self._finished, key=lambda span: span.start_ns)
+
+    def reset(self, enabled: Optional[bool] = None) -> None:
+        """Start a new trace, dropping recorded spans."""
+        if enabled is not None:
+            self.enabled = enabled
+        self.trace_id = os.urandom(16).hex()
+        with self._lock:
+            self._finished = []
+
+    # ------------------------------------------------------------------
+    # Exporters
+    # ------------------------------------------------------------------
+
+    def export_otlp_json(self, path: Path) -> int:
+        """Write spans in the OTLP/JSON encoding (ExportTraceServiceRequest). Returns the span count."""
+        spans = self.finished_spans()
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({
+                    "service.name": SERVICE_NAME,
+                    "process.pid": os.getpid(),
+                    "process.runtime.version": sys.version.split()[0]
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": SCOPE_NAME},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            **({"parentSpanId": span.parent_span_id} if span.parent_span_id else {}),
+                            "name": span.name,
+                            "kind": span.kind.value,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": _otlp_attributes(span.attributes),
+                            "status": {"code": 1} if span.status_ok else {"code": 2, "message": span.status_message}
+                        }
+                        for span in spans
+                    ]
+                }]
+            }]
+        }
+        Path(path).write_text(json.dumps(payload), encoding="utf-8")
+        return len(spans)
+
+    def export_chrome_trace(self, path: Path) -> int:
+        """Write spans as Chrome trace-event "complete" events. Returns the span count."""
+        spans = self.finished_spans()
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: _plain_value(value) for key, value in span.attributes.items()}
+            }
+            for span in spans
+        ]
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}), encoding="utf-8")
+        return len(spans)
+
+    def export(self, output_dir: Path) -> Dict[str, str]:
+        """Write both trace files into `output_dir` and return their paths."""
+        if not self.enabled:
+            return {}
+        otlp_path = Path(output_dir) / "trace.otlp.json"
+        chrome_path = Path(output_dir) / "trace.chrome.json"
+        self.export_otlp_json(otlp_path)
+        self.export_chrome_trace(chrome_path)
+        return {"otlp_json": str(otlp_path), "chrome_trace": str(chrome_path)}
+
+def _plain_value(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_plain_value(item) for item in value]
+    return str(value)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    # bool first: bool is a subclass of int
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+# Process-wide tracer used by all instrumented modules
+tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    return tracer
+
+def llm_span_attributes(caller: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Attributes of an `llm.chat_completion` span for a `chat.completions.create(**kwargs)` call."""
+    return {
+        "llm.model": kwargs.get("model"),
+        "llm.operation": caller,
+        "llm.messages": len(kwargs.get("messages") or [])
+    }
+
+def record_llm_usage(span, response) -> None:
+    """Copy the token usage of a chat completion response onto its span."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        span.set_attributes({
+            "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "llm.completion_tokens": getattr(usage, "completion_tokens", None),
+            "llm.total_tokens": getattr(usage, "total_tokens", None)
+        })
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the NDJSON code graph format and seed-file expansion over the file dependency graph.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner import static_analyzer
+from scanner.code_graph_manager import (
+    KIND_CLASS, KIND_METHOD, REL_CALLS, CodeGraphManager, iter_graph_symbols, write_ndjson_graph
+)
+
+def symbol(name, file_path, calls=(), kind=KIND_METHOD, start=0, end=0):
+    return {
+        "FullName": name, "Kind": kind, "FilePath": file_path, "LineNumber": start or 1,
+        "StartLine": start, "EndLine": end,
+        "Relationships": [{"TargetSymbolFullName": target, "Kind": REL_CALLS, "LineNumber": line}
+                          for target, line in calls]
+    }
+
+# a.cs -> b.cs -> c.cs, d.cs -> b.cs, e.cs -> a.cs (edges point from caller file to callee file)
+SYMBOLS = [
+    symbol("A.Run", "/repo/a.cs", calls=[("B.Handle", 12)], start=10, end=14),
+    symbol("B.Handle", "/repo/b.cs", calls=[("C.Store", 7), ("C.Store", 9)], start=5, end=11),
+    symbol("C.Store", "/repo/c.cs", kind=KIND_CLASS),
+    symbol("D.Poll", "/repo/d.cs", calls=[("B.Handle", None)]),
+    symbol("E.Main", "/repo/e.cs", calls=[("A.Run", 3)]),
+]
+
+def load_graph(directory: str):
+    graph_path = Path(directory) / "graph.ndjson"
+    write_ndjson_graph(SYMBOLS, graph_path)
+    return graph_path, CodeGraphManager().get_graph_data(graph_path)
+
+def test_ndjson_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_path = Path(tmp) / "graph.ndjson"
+        assert write_ndjson_graph(SYMBOLS, graph_path) == len(SYMBOLS)
+        assert list(iter_graph_symbols(graph_path)) == SYMBOLS
+
+def test_call_sites_keep_every_line():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, graph = load_graph(tmp)
+        assert graph.get_call_sites("B.Handle") == [("C.Store", 7), ("C.Store", 9)]
+        assert graph.get_symbol_range("A.Run") == ("/repo/a.cs", 10, 14)
+
+def test_expand_files_scores_by_distance_and_direction():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, graph = load_graph(tmp)
+        scores = graph.expand_files(["/repo/a.cs"], max_depth=1)
+        assert scores == {"/repo/a.cs": 1.0, "/repo/b.cs": 0.5, "/repo/e.cs": 0.5}
+
+        scores = graph.expand_files(["/repo/a.cs"], max_depth=2)
+        assert scores["/repo/c.cs"] == 0.25 and scores["/repo/d.cs"] == 0.25
+        assert list(scores)[0] == "/repo/a.cs"
+
+        dependencies_only = graph.expand_files(["/repo/a.cs"], max_depth=3, dependents_weight=0)
+        assert set(dependencies_only) == {"/repo/a.cs", "/repo/b.cs", "/repo/c.cs"}
+
+def test_expand_files_ranks_files_reached_from_several_seeds_higher():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, graph = load_graph(tmp)
+        scores = graph.expand_files(["/repo/a.cs", "/repo/d.cs"], max_depth=1)
+        assert scores["/repo/b.cs"] == 1.0  # 0.5 from each seed
+        assert list(scores).index("/repo/b.cs") < list(scores).index("/repo/e.cs")
+
+def test_expand_files_limits():
+    with tempfile.TemporaryDirectory() as tmp:
+        _, graph = load_graph(tmp)
+        capped = graph.expand_files(["/repo/b.cs"], max_depth=1, max_fanout=1)
+        assert len(capped) == 3  # the seed, one dependency, one dependent
+        assert len(graph.expand_files(["/repo/b.cs"], max_depth=2, max_results=2)) == 2
+        known = graph.expand_files(["/repo/a.cs"], max_depth=2, known_files={"/repo/a.cs", "/repo/c.cs"})
+        assert set(known) == {"/repo/a.cs", "/repo/c.cs"}
+
+def test_expand_with_code_graph_skips_disk_checks_for_known_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_path, graph = load_graph(tmp)
+        original_path, original_isfile = static_analyzer.CODE_GRAPH_PATH, static_analyzer.os.path.isfile
+
+        def isfile(path):
+            raise AssertionError(f"checked {path} on disk")
+
+        static_analyzer.CODE_GRAPH_PATH = str(graph_path)
+        static_analyzer.os.path.isfile = isfile
+        try:
+            result = static_analyzer.expand_with_code_graph(
+                [Path("/repo/a.cs")], max_depth=1, known_files=set(graph.symbols_by_file)
+            )
+        finally:
+            static_analyzer.CODE_GRAPH_PATH = original_path
+            static_analyzer.os.path.isfile = original_isfile
+        assert result[0] == Path("/repo/a.cs")
+        assert set(result) == {Path("/repo/a.cs"), Path("/repo/b.cs"), Path("/repo/e.cs")}
+
+def expand_with_graph(graph_path, seeds, **kwargs):
+    original_path = static_analyzer.CODE_GRAPH_PATH
+    static_analyzer.CODE_GRAPH_PATH = str(graph_path)
+    try:
+        return static_analyzer.expand_with_code_graph(seeds, max_depth=1, **kwargs)
+    finally:
+        static_analyzer.CODE_GRAPH_PATH = original_path
+
+def test_stale_graph_files_missing_from_the_index_are_dropped():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_path, _ = load_graph(tmp)
+        # The cached graph still lists b.cs, which the file index no longer has
+        index = {"/repo/c.cs": {}, "/repo/e.cs": {}}
+        result = expand_with_graph(graph_path, [Path("/repo/a.cs")], known_files=index)
+        assert result == [Path("/repo/a.cs"), Path("/repo/e.cs")]
+
+def test_stale_graph_files_are_checked_on_disk_without_an_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp).resolve()
+        for name in ("a.cs", "b.cs", "e.cs"):
+            (repo / name).write_text("class C { }")
+        graph_path = repo / "graph.ndjson"
+        write_ndjson_graph([dict(s, FilePath=str(repo / Path(s["FilePath"]).name)) for s in SYMBOLS], graph_path)
+        (repo / "b.cs").unlink()  # deleted since the graph was built
+        result = expand_with_graph(graph_path, [repo / "a.cs"])
+        assert result == [repo / "a.cs", repo / "e.cs"]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for packing selected source files into a prompt token budget.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner.context_packer import ContextPacker, estimate_tokens
+
+def method(name: str, body: str) -> str:
+    return f"        public void {name}()\n        {{\n{body}        }}\n"
+
+FILLER = "".join(f"            var value{i} = Compute({i}, \"padding text for the budget\");\n" for i in range(30))
+
+HANDLER = (
+    "using System;\n"
+    "using System.Diagnostics;\n"
+    "\n"
+    "namespace Sample\n"
+    "{\n"
+    "    public class Handler\n"
+    "    {\n"
+    "        private readonly ActivitySource source;\n"
+    "\n"
+    + method("Unrelated", FILLER) +
+    "\n"
+    + method("ProcessOrder", "            using var activity = source.StartActivity(\"order\");\n"
+                             "            activity?.SetTag(\"order.id\", orderId);\n") +
+    "\n"
+    + method("AlsoUnrelated", FILLER) +
+    "    }\n"
+    "}\n"
+)
+
+INTENT = {"search_keywords": ["ProcessOrder"], "telemetry_operation": {"target_name": "ProcessOrder"}}
+
+def test_files_within_budget_are_kept_whole():
+    packed = ContextPacker(token_budget=100000).pack({"Handler.cs": HANDLER}, INTENT)
+    assert packed.files == {"Handler.cs": HANDLER}
+    assert packed.complete
+    assert packed.tokens == estimate_tokens(HANDLER)
+
+def test_zero_budget_disables_packing():
+    packed = ContextPacker(token_budget=0).pack({"Handler.cs": HANDLER}, INTENT)
+    assert packed.files["Handler.cs"] == HANDLER and packed.complete
+
+def test_over_budget_keeps_header_and_telemetry_members():
+    full = ContextPacker().pack({"Handler.cs": HANDLER}, INTENT).tokens
+    packed = ContextPacker().pack({"Handler.cs": HANDLER}, INTENT, token_budget=full // 2)
+    text = packed.files["Handler.cs"]
+    assert not packed.complete
+    assert packed.tokens <= full // 2
+    assert "namespace Sample" in text and "private readonly ActivitySource source;" in text
+    assert 'activity?.SetTag("order.id", orderId);' in text
+    assert "var value0" not in text
+    assert "omitted: Unrelated ..." in text and "omitted: AlsoUnrelated ..." in text
+
+    # The markers name the original line ranges of what was left out
+    lines = HANDLER.splitlines()
+    for omitted in packed.omitted:
+        assert omitted.text == "\n".join(lines[omitted.start_line - 1:omitted.end_line])
+        assert f"lines {omitted.start_line}-" in text or f"-{omitted.end_line} omitted" in text
+
+    report = packed.to_report()
+    assert report["sliced_files"] == 1
+    assert report["members_included"] == 1
+    assert report["members_omitted"] == 2
+    assert report["omitted_tokens"] == sum(s.tokens for s in packed.omitted)
+
+def test_every_line_is_emitted_at_most_once():
+    full = ContextPacker().pack({"Handler.cs": HANDLER}, INTENT).tokens
+    packed = ContextPacker().pack({"Handler.cs": HANDLER}, INTENT, token_budget=full // 2)
+    covered = [n for s in packed.included + packed.omitted for n in range(s.start_line, s.end_line + 1)]
+    assert sorted(covered) == list(range(1, len(HANDLER.splitlines()) + 1))
+
+def test_duplicate_files_become_references():
+    packed = ContextPacker(token_budget=100000).pack({"a/Handler.cs": HANDLER, "b/Handler.cs": HANDLER}, INTENT)
+    assert packed.files["a/Handler.cs"] == HANDLER
+    assert packed.files["b/Handler.cs"] == "(identical to a/Handler.cs)"
+    assert packed.duplicates == {"b/Handler.cs": "a/Handler.cs"}
+    assert packed.tokens == estimate_tokens(HANDLER)
+
+def test_outline_lists_signatures_and_telemetry_calls():
+    outline = ContextPacker().pack({"Handler.cs": HANDLER}, INTENT).outline()["Handler.cs"]
+    assert "public class Handler" in outline
+    assert "public void ProcessOrder()" in outline
+    assert "source.StartActivity" in outline
+    assert "var value0" not in outline
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the Retry-After handling of the shared LLM gateway.
+"""
+
+import sys
+import time
+from email.utils import formatdate
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner.llm_gateway import parse_retry_after
+
+def test_no_headers():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({"content-type": "application/json"}) is None
+
+def test_delta_seconds():
+    assert parse_retry_after({"retry-after": "7"}) == 7.0
+    assert parse_retry_after({"retry-after": "1.5"}) == 1.5
+    assert parse_retry_after({"retry-after": "-3"}) == 0.0
+
+def test_milliseconds_win_over_seconds():
+    assert parse_retry_after({"retry-after-ms": "250", "retry-after": "7"}) == 0.25
+    assert parse_retry_after({"retry-after-ms": "soon", "retry-after": "7"}) == 7.0
+
+def test_http_date():
+    wait = parse_retry_after({"retry-after": formatdate(time.time() + 30, usegmt=True)})
+    assert 25 <= wait <= 31
+    assert parse_retry_after({"retry-after": formatdate(time.time() - 30, usegmt=True)}) == 0.0
+
+def test_invalid_values():
+    assert parse_retry_after({"retry-after": "later"}) is None
+    assert parse_retry_after({"retry-after": ""}) is None
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for log level resolution and sampled per-item logging.
+"""
+
+import logging
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner.log_config import DEFAULT_SAMPLE_SIZE, EventSampler, get_sample_size, resolve_log_level
+
+class Collector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def collecting_logger(name: str, level: int = logging.DEBUG):
+    logger = logging.getLogger(f"test_log_config.{name}")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    collector = Collector()
+    logger.addHandler(collector)
+    return logger, collector.messages
+
+def test_sampler_logs_first_occurrences_and_counts_the_rest():
+    logger, messages = collecting_logger("sampled")
+    sampler = EventSampler(logger, "scan", sample_size=2)
+    for i in range(5):
+        sampler.log("skipped", "skipped file %s", i)
+    sampler.log("parsed", "parsed %s", "a.cs")
+    sampler.summary()
+    assert messages == [
+        "skipped file 0",
+        "skipped file 1",
+        "scan: further 'skipped' events are counted only",
+        "parsed a.cs",
+        "scan: skipped=5, parsed=1",
+    ]
+    assert sampler.counts == {"skipped": 5, "parsed": 1}
+
+def test_negative_sample_size_logs_every_event():
+    logger, messages = collecting_logger("unlimited")
+    sampler = EventSampler(logger, "scan", sample_size=-1)
+    for i in range(DEFAULT_SAMPLE_SIZE + 3):
+        sampler.log("skipped", "skipped file %s", i)
+    assert len(messages) == DEFAULT_SAMPLE_SIZE + 3
+    assert not any("counted only" in message for message in messages)
+
+def test_disabled_level_only_counts():
+    logger, messages = collecting_logger("disabled", level=logging.INFO)
+    sampler = EventSampler(logger, "scan")
+    assert sampler.sample_size == get_sample_size()
+    sampler.log("skipped", "skipped file %s", 1)
+    sampler.count("skipped")
+    sampler.summary()
+    assert messages == []
+    assert sampler.counts == {"skipped": 2}
+
+def test_resolve_log_level():
+    assert resolve_log_level("debug") == logging.DEBUG
+    assert resolve_log_level(" Warning ") == logging.WARNING
+    assert resolve_log_level(logging.ERROR) == logging.ERROR
+    try:
+        resolve_log_level("loud")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown levels must be rejected")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for composing one patch over all selected files within the prompt budget.
+"""
+
+import re
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner import patch_composer, token_counter
+from scanner.token_counter import configure_prompt_budgets
+
+OMITTED_MARKER = re.compile(r"// \.\.\. lines \d+-\d+ omitted")
+
+class RecordingGateway:
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = []
+
+    def chat_completion(self, **kwargs):
+        self.calls.append(kwargs["messages"])
+        message = type("Message", (), {"content": self.reply})()
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})()]})()
+
+def source(name: str, methods: int) -> str:
+    body = "".join(
+        f"        public void Step{i}()\n        {{\n"
+        + "".join(f"            Compute({i}, {j}, \"padding text for the budget\");\n" for j in range(20))
+        + "        }\n\n"
+        for i in range(methods)
+    )
+    return (f"namespace Sample\n{{\n    public class {name}\n    {{\n"
+            f"        private static readonly ActivitySource Source = new(\"{name}\");\n\n{body}    }}\n}}\n")
+
+def compose(files, budget, reply="```diff\n```\n### Explanation\nNothing to do."):
+    gateway = RecordingGateway(reply)
+    original_gateway, original_budgets = patch_composer.get_llm_gateway, dict(token_counter._budgets)
+    patch_composer.get_llm_gateway = lambda: gateway
+    configure_prompt_budgets({"compose_patch": budget})
+    try:
+        contexts = [{"path": Path(f"/repo/{name}.cs"), "content": content} for name, content in files.items()]
+        result = patch_composer.compose_patch({"semantic_description": "Tag Step1"}, contexts)
+    finally:
+        patch_composer.get_llm_gateway = original_gateway
+        token_counter._budgets.clear()
+        token_counter._budgets.update(original_budgets)
+    return gateway.calls, result
+
+def test_files_within_budget_go_into_one_call_whole():
+    files = {"Handler": source("Handler", 2), "Client": source("Client", 2)}
+    calls, _ = compose(files, budget=100000)
+    assert len(calls) == 1
+    prompt = calls[0][1]["content"]
+    assert "--- FILE: Handler.cs ---" in prompt and "--- FILE: Client.cs ---" in prompt
+    assert not OMITTED_MARKER.search(prompt)
+
+def test_oversized_files_are_packed_into_one_call_not_split():
+    files = {"Handler": source("Handler", 12), "Client": source("Client", 12)}
+    calls, _ = compose(files, budget=4000)
+    assert len(calls) == 1
+    prompt = calls[0][1]["content"]
+    # Every file is present, with at least its header, so cross-file changes stay consistent
+    assert "public class Handler" in prompt and "public class Client" in prompt
+    assert 'ActivitySource Source = new("Client")' in prompt
+    assert OMITTED_MARKER.search(prompt)
+    assert token_counter.get_token_counter().count_messages(calls[0]) <= 4000
+
+def test_diff_is_translated_to_the_original_lines():
+    content = "// License header\nusing System;\n" + source("Handler", 1)
+    line = "            Compute(0, 0, \"padding text for the budget\");"
+    reply = ("```diff\n--- a/Handler.cs\n+++ b/Handler.cs\n@@ -1,1 +1,2 @@\n"
+             f"-{line}\n+{line}\n+            Source.StartActivity(\"step\");\n```\n### Explanation\nAdds a span.")
+    _, (diff, explanation) = compose({"Handler": content}, budget=100000, reply=reply)
+    original_line = content.splitlines().index(line) + 1
+    assert f"@@ -{original_line},1 +{original_line},2 @@" in diff
+    assert explanation.startswith("### Explanation")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for stage checkpoint keys and --resume in the pipeline orchestrator.
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner.pipeline_orchestrator import CacheSerializer, EnhancedOrchestrator, StageSpec, get_serializer, tree_fingerprint
+
+def make_orchestrator(output_dir: Path, resume: bool = False) -> EnhancedOrchestrator:
+    return EnhancedOrchestrator(output_dir, max_retries=0, enable_cache=False, resume=resume)
+
+def ticket_stages(fetched, fail_analysis: bool):
+    def fetch_ticket(args):
+        fetched.append(args.ticket_key)
+        return f"text for {args.ticket_key}"
+
+    def analyse(ticket_text):
+        if fail_analysis:
+            raise RuntimeError("analysis failed")
+        return ticket_text.upper()
+
+    return [
+        StageSpec("ticket_processing", fetch_ticket, inputs=["ticket_args"], outputs=["ticket_text"],
+                  checkpoint_fingerprint=lambda args: {"ticket_key": args.ticket_key}),
+        StageSpec("analysis", analyse, inputs=["ticket_text"], outputs=["analysis"]),
+    ]
+
+def run(output_dir: Path, ticket_key: str, fetched, resume: bool, fail_analysis: bool = False,
+        specs=None):
+    orchestrator = make_orchestrator(output_dir, resume=resume)
+    values = {"ticket_args": argparse.Namespace(ticket_key=ticket_key)}
+    return asyncio.run(orchestrator.run_graph(specs or ticket_stages(fetched, fail_analysis), values))
+
+def test_resume_restores_completed_stages_of_the_same_ticket():
+    with tempfile.TemporaryDirectory() as tmp:
+        fetched = []
+        try:
+            run(Path(tmp), "ATL-1", fetched, resume=False, fail_analysis=True)
+        except RuntimeError:
+            pass
+        values = run(Path(tmp), "ATL-1", fetched, resume=True)
+        assert fetched == ["ATL-1"]
+        assert values["analysis"] == "TEXT FOR ATL-1"
+
+def test_resume_with_another_ticket_does_not_restore_its_text():
+    with tempfile.TemporaryDirectory() as tmp:
+        fetched = []
+        try:
+            run(Path(tmp), "ATL-1", fetched, resume=False, fail_analysis=True)
+        except RuntimeError:
+            pass
+        values = run(Path(tmp), "ATL-2", fetched, resume=True)
+        assert fetched == ["ATL-1", "ATL-2"]
+        assert values["analysis"] == "TEXT FOR ATL-2"
+
+def test_unidentifiable_inputs_fail_closed():
+    with tempfile.TemporaryDirectory() as tmp:
+        fetched = []
+
+        def fetch_ticket(args):
+            fetched.append(args.ticket_key)
+            return f"text for {args.ticket_key}"
+
+        specs = [
+            StageSpec("ticket_processing", fetch_ticket, inputs=["ticket_args"], outputs=["ticket_text"]),
+            StageSpec("analysis", str.upper, inputs=["ticket_text"], outputs=["analysis"]),
+        ]
+        run(Path(tmp), "ATL-1", fetched, resume=False, specs=specs)
+        orchestrator = make_orchestrator(Path(tmp), resume=True)
+        values = asyncio.run(orchestrator.run_graph(specs, {"ticket_args": argparse.Namespace(ticket_key="ATL-2")}))
+        assert fetched == ["ATL-1", "ATL-2"]
+        assert values["analysis"] == "TEXT FOR ATL-2"
+        # Neither the stage nor anything downstream of it has a key
+        assert orchestrator.checkpoint_keys == {"ticket_processing": None, "analysis": None}
+
+def test_checkpoint_key_chains_plain_inputs_and_upstream_keys():
+    with tempfile.TemporaryDirectory() as tmp:
+        orchestrator = make_orchestrator(Path(tmp))
+        orchestrator._initial_value_names = {"repo_root"}
+        spec = StageSpec("indexing", len, inputs=["repo_root"], outputs=["index"])
+        first = orchestrator._checkpoint_key(spec, Path("/repo/a"), None, [], {"repo_root": Path("/repo/a")})
+        same = orchestrator._checkpoint_key(spec, Path("/repo/a"), None, [], {"repo_root": Path("/repo/a")})
+        other = orchestrator._checkpoint_key(spec, Path("/repo/b"), None, [], {"repo_root": Path("/repo/b")})
+        assert first == same and first != other
+
+        downstream = StageSpec("search", len, inputs=["index"], outputs=["results"])
+        orchestrator.checkpoint_keys["indexing"] = first
+        key_a = orchestrator._checkpoint_key(downstream, [], {"top_k": 5}, ["indexing"], {})
+        orchestrator.checkpoint_keys["indexing"] = other
+        key_b = orchestrator._checkpoint_key(downstream, [], {"top_k": 5}, ["indexing"], {})
+        assert key_a != key_b
+
+def test_resume_reindexes_a_changed_repository():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo, output_dir = Path(tmp) / "repo", Path(tmp) / "out"
+        repo.mkdir()
+        source = repo / "Handler.cs"
+        source.write_text("class Handler { }")
+        indexed = []
+
+        def index(repo_root):
+            indexed.append(source.read_text())
+            return {str(source): source.read_text()}
+
+        def search(file_index):
+            if fail:
+                raise RuntimeError("search failed")
+            return list(file_index.values())
+
+        specs = [
+            StageSpec("file_indexing", index, inputs=["repo_root"], outputs=["file_index"],
+                      checkpoint_fingerprint=lambda repo_root: {"sources": tree_fingerprint(repo_root, "*.cs")}),
+            StageSpec("search", search, inputs=["file_index"], outputs=["results"]),
+        ]
+        fail = True
+        try:
+            asyncio.run(make_orchestrator(output_dir).run_graph(specs, {"repo_root": repo}))
+        except RuntimeError:
+            pass
+        fail = False
+        source.write_text("class Handler { void Run() { } }")
+        values = asyncio.run(make_orchestrator(output_dir, resume=True).run_graph(specs, {"repo_root": repo}))
+        assert len(indexed) == 2
+        assert values["results"] == ["class Handler { void Run() { } }"]
+
+def test_incomplete_serializer_fails_at_construction():
+    class DumpsOnly(CacheSerializer):
+        name = "dumps-only"
+
+        def dumps(self, value):
+            return b""
+
+    try:
+        DumpsOnly()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a serializer without loads() was constructed")
+    serializer = get_serializer("pickle")
+    assert serializer.loads(serializer.dumps({"a": [1, 2]})) == {"a": [1, 2]}
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
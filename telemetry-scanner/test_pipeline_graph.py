@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for running pipeline stages as a dependency graph.
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner.pipeline_orchestrator import EnhancedOrchestrator, StageSpec, StageStatus
+
+def run_graph(specs, values, on_output=None, profile=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        orchestrator = EnhancedOrchestrator(Path(tmp), max_retries=0, enable_cache=False, profile=profile)
+        try:
+            return orchestrator, asyncio.run(orchestrator.run_graph(specs, values, on_output=on_output))
+        except RuntimeError as e:
+            return orchestrator, e
+
+def test_independent_stages_run_and_publish_outputs():
+    published = []
+    specs = [
+        StageSpec("double", lambda x: x * 2, inputs=["x"], outputs=["doubled"]),
+        StageSpec("square", lambda x: x * x, inputs=["x"], outputs=["squared"]),
+        StageSpec("sum", lambda inputs: inputs["doubled"] + inputs["squared"], inputs=["doubled", "squared"],
+                  outputs=["total"]),
+    ]
+    _, values = run_graph(specs, {"x": 3}, on_output=lambda name, value: published.append(name))
+    assert values["total"] == 15
+    assert published[-1] == "total" and set(published) == {"doubled", "squared", "total"}
+
+def test_missing_output_key_fails_the_stage_and_lets_running_stages_finish():
+    finished = []
+
+    def slow(x):
+        time.sleep(0.2)
+        finished.append("slow")
+        return x
+
+    specs = [
+        StageSpec("broken", lambda x: {"wrong": x}, inputs=["x"], outputs=["a", "b"]),
+        StageSpec("slow", slow, inputs=["x"], outputs=["c"]),
+        StageSpec("after", lambda a: a, inputs=["a"], outputs=["d"]),
+    ]
+    orchestrator, error = run_graph(specs, {"x": 1})
+    assert isinstance(error, RuntimeError) and "broken" in str(error)
+    assert finished == ["slow"]
+    assert orchestrator.stage_results["broken"].status == StageStatus.FAILED
+    assert orchestrator.stage_results["slow"].status == StageStatus.COMPLETED
+    assert orchestrator.stage_results["after"].status == StageStatus.SKIPPED
+
+def test_on_output_errors_fail_the_stage():
+    def on_output(name, value):
+        if name == "a":
+            raise ValueError("cannot save a")
+
+    specs = [
+        StageSpec("first", lambda x: x, inputs=["x"], outputs=["a"]),
+        StageSpec("second", lambda a: a, inputs=["a"], outputs=["b"]),
+    ]
+    orchestrator, error = run_graph(specs, {"x": 1}, on_output=on_output)
+    assert isinstance(error, RuntimeError) and "cannot save a" in str(error)
+    assert orchestrator.stage_results["second"].status == StageStatus.SKIPPED
+
+def test_cancelling_the_graph_cancels_running_stages():
+    started = []
+
+    async def wait_forever(x):
+        started.append(x)
+        await asyncio.sleep(3600)
+
+    async def main(orchestrator):
+        specs = [StageSpec("forever", wait_forever, inputs=["x"], outputs=["y"])]
+        graph = asyncio.create_task(orchestrator.run_graph(specs, {"x": 1}))
+        while not started:
+            await asyncio.sleep(0.01)
+        graph.cancel()
+        try:
+            await graph
+        except asyncio.CancelledError:
+            pass
+        others = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return others
+
+    with tempfile.TemporaryDirectory() as tmp:
+        orchestrator = EnhancedOrchestrator(Path(tmp), max_retries=0, enable_cache=False)
+        assert asyncio.run(main(orchestrator)) == []
+
+def test_profiled_coroutine_stages_run_alone_and_sample_their_own_work():
+    running = []
+    overlaps = []
+
+    def spin(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    async def busy(x):
+        running.append("busy")
+        overlaps.append(len(running))
+        await asyncio.to_thread(spin, 0.3)
+        running.remove("busy")
+        return x
+
+    async def idle(x):
+        running.append("idle")
+        overlaps.append(len(running))
+        await asyncio.sleep(0.3)
+        running.remove("idle")
+        return x
+
+    specs = [
+        StageSpec("busy", busy, inputs=["x"], outputs=["a"]),
+        StageSpec("idle", idle, inputs=["x"], outputs=["b"]),
+    ]
+    orchestrator, values = run_graph(specs, {"x": 1}, profile="cpu")
+    orchestrator.profiler.close()
+    assert values["a"] == values["b"] == 1
+    assert overlaps == [1, 1]
+    busy_profile = orchestrator.profiler.profiles["busy"]
+    idle_profile = orchestrator.profiler.profiles["idle"]
+    # The to_thread worker's samples belong to the stage that started it
+    assert any(stack.endswith("test_pipeline_graph.py:spin") for stack in busy_profile.stacks)
+    assert not any("spin" in stack for stack in idle_profile.stacks)
+    # Waiting on the loop is not counted as the stage's CPU time
+    assert idle_profile.idle_samples > idle_profile.samples
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
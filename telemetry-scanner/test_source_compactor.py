@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Tests for source compaction and the translation of diffs back to the original files.
+"""
+
+import re
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner import source_compactor
+from scanner.source_compactor import (
+    compact_source, configure_source_compaction, get_compaction_stats, record_prompt_compaction, translate_diff,
+    _compact_lines
+)
+from scanner.token_counter import get_token_counter
+
+ORIGINAL = """\
+// Copyright (c) Example Corp.
+// Licensed under the MIT license.
+using System;
+using System.Linq;
+using OpenTelemetry.Trace;
+
+namespace Sample
+{
+    #region Handlers
+    public class Handler
+    {
+        /// <summary>Keeps the request.</summary>
+        void Keep() { Start(); }
+
+        // Legacy path, still called by the importer
+        void Remove() { Old(); }
+
+
+        void Other() { Run(@"first
+// not a comment
+last"); }
+    }
+    #endregion
+}
+"""
+
+def apply_strictly(text: str, diff: str) -> str:
+    """Apply a unified diff exactly at its stated positions (no offset or fuzz), like a strict `git apply`."""
+    lines = text.splitlines()
+    result, consumed = [], 0
+    hunks = re.split(r"^(@@ .*)$", diff, flags=re.M)[1:]
+    for header, body in zip(hunks[::2], hunks[1::2]):
+        old_start, old_count = re.match(r"@@ -(\d+)(?:,(\d+))?", header).groups()
+        old_start, old_count = int(old_start), int(old_count or 1)
+        begin = old_start - 1 if old_count else old_start
+        result += lines[consumed:begin]
+        consumed = begin
+        for line in body.strip("\n").split("\n"):
+            op, content = line[:1], line[1:]
+            if op in (" ", "-"):
+                assert lines[consumed] == content, f"line {consumed + 1}: {lines[consumed]!r} != {content!r}"
+                consumed += 1
+            if op in (" ", "+"):
+                result.append(content)
+    return "\n".join(result + lines[consumed:]) + "\n"
+
+def compacted_view():
+    configure_source_compaction(True)
+    return compact_source(ORIGINAL, "Sample/Handler.cs")
+
+def diff_for(old_start: int, body: str, old_count: int = 3) -> str:
+    return f"--- a/Sample/Handler.cs\n+++ b/Sample/Handler.cs\n@@ -{old_start},{old_count} +{old_start},{old_count} @@\n{body}"
+
+def test_compaction_drops_lines_and_keeps_strings():
+    view = compacted_view()
+    kinds = view.dropped
+    assert kinds["license_header"] == 2
+    assert kinds["using"] == 2
+    assert kinds["doc_comment"] == 1
+    assert kinds["comment"] == 1
+    assert kinds["region"] == 2
+    assert "// not a comment" in view.text  # inside a verbatim string
+    assert "using OpenTelemetry.Trace;" in view.text
+    for number, line in enumerate(view.text.splitlines(), start=1):
+        assert view.original_lines[view.line_map[number - 1] - 1] == line
+
+def test_blank_line_runs_collapse():
+    view = _compact_lines(["", "a", "", "", "", "b"])
+    assert view.text == "a\n\nb"
+    assert view.line_map == [2, 3, 6]
+
+def test_exact_header_translates_to_original_lines():
+    view = compacted_view().text.splitlines()
+    keep = view.index("        void Keep() { Start(); }") + 1
+    diff = diff_for(keep - 1, "     {\n-        void Keep() { Start(); }\n+        void Keep() { Start(); Tag(); }\n"
+                              " \n         void Remove() { Old(); }\n", old_count=4)
+    patched = apply_strictly(ORIGINAL, translate_diff(diff, {"Sample/Handler.cs": compacted_view()}))
+    assert "void Keep() { Start(); Tag(); }" in patched
+    assert "void Remove() { Old(); }" in patched
+    assert "/// <summary>Keeps the request.</summary>" in patched
+    assert "// Legacy path, still called by the importer" in patched
+
+def test_off_by_n_headers_find_the_matching_lines():
+    view = compacted_view().text.splitlines()
+    keep = view.index("        void Keep() { Start(); }") + 1
+    body = "-        void Keep() { Start(); }\n+        void Keep() { Start(); Tag(); }\n \n         void Remove() { Old(); }\n"
+    for error in (-3, -1, 1, 2, 5):
+        translated = translate_diff(diff_for(keep + error, body), {"Handler.cs": compacted_view()})
+        patched = apply_strictly(ORIGINAL, translated)
+        assert "void Keep() { Start(); Tag(); }" in patched, error
+        assert "void Remove() { Old(); }" in patched, error
+
+def test_unmatched_hunk_is_not_applied_to_other_lines():
+    body = "-        void Keep() { Begin(); }\n+        void Keep() { Begin(); Tag(); }\n"
+    translated = translate_diff(diff_for(4, body, old_count=1), {"Handler.cs": compacted_view()})
+    assert "-        void Keep() { Begin(); }" in translated
+    try:
+        apply_strictly(ORIGINAL, translated)
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("a hunk whose lines are not in the file must not apply")
+
+def test_hunk_spanning_dropped_lines_restores_them():
+    view = compacted_view().text.splitlines()
+    keep = view.index("        void Keep() { Start(); }") + 1
+    body = ("         void Keep() { Start(); }\n"
+            "\n"
+            "-        void Remove() { Old(); }\n"
+            "\n"
+            "         void Other() { Run(@\"first\n")
+    translated = translate_diff(diff_for(keep, body, old_count=5), {"Handler.cs": compacted_view()})
+    patched = apply_strictly(ORIGINAL, translated)
+    assert "void Remove()" not in patched
+    assert "// Legacy path, still called by the importer" in patched
+    assert patched.count("\n\n\n") == 1  # the dropped second blank line came back as context
+
+def test_pure_insertion_goes_after_the_stated_line():
+    view = compacted_view().text.splitlines()
+    keep = view.index("        void Keep() { Start(); }") + 1
+    diff = (f"--- a/Sample/Handler.cs\n+++ b/Sample/Handler.cs\n@@ -{keep},0 +{keep + 1},1 @@\n"
+            "+        void Added() { }\n")
+    patched = apply_strictly(ORIGINAL, translate_diff(diff, {"Handler.cs": compacted_view()})).splitlines()
+    added = patched.index("        void Added() { }")
+    assert patched[added - 1] == "        void Keep() { Start(); }"
+
+def test_multiple_hunks_keep_new_line_numbers_consistent():
+    view = compacted_view().text.splitlines()
+    keep = view.index("        void Keep() { Start(); }") + 1
+    other = view.index("        void Other() { Run(@\"first") + 1
+    diff = ("--- a/Sample/Handler.cs\n+++ b/Sample/Handler.cs\n"
+            f"@@ -{keep},1 +{keep},2 @@\n         void Keep() {{ Start(); }}\n+        void KeepToo() {{ }}\n"
+            f"@@ -{other},1 +{other + 1},1 @@\n-        void Other() {{ Run(@\"first\n+        void Other() {{ Run(@\"second\n")
+    translated = translate_diff(diff, {"Handler.cs": compacted_view()})
+    headers = re.findall(r"^@@ -(\d+),(\d+) \+(\d+),(\d+) @@", translated, flags=re.M)
+    assert int(headers[1][2]) == int(headers[1][0]) + 1
+    patched = apply_strictly(ORIGINAL, translated)
+    assert "void KeepToo() { }" in patched and 'Run(@"second' in patched
+
+def test_uncompacted_sources_pass_through():
+    configure_source_compaction(False)
+    try:
+        view = compact_source(ORIGINAL, "Sample/Handler.cs")
+    finally:
+        configure_source_compaction(True)
+    assert not view.compacted
+    diff = diff_for(13, "-        void Keep() { Start(); }\n+        void Keep() { }\n", old_count=1)
+    assert translate_diff(diff, {"Handler.cs": view}) == diff
+
+def with_fresh_stats(action):
+    original = source_compactor._stats
+    source_compactor._stats = source_compactor._CompactionStats()
+    try:
+        action()
+        return get_compaction_stats()
+    finally:
+        source_compactor._stats = original
+
+def test_savings_are_counted_when_sent_not_when_built():
+    stats = with_fresh_stats(lambda: [compacted_view() for _ in range(3)])
+    assert stats["files"] == 0
+
+    view = compacted_view()
+    stats = with_fresh_stats(lambda: record_prompt_compaction(view))
+    counter = get_token_counter()
+    assert stats["files"] == 1
+    assert stats["tokens_before"] == counter.count(ORIGINAL.rstrip("\n"))
+    assert stats["tokens_after"] == counter.count(view.text)
+    assert stats["lines_dropped"] == len(view.original_lines) - len(view.line_map)
+    assert stats["dropped_by_kind"] == view.dropped
+
+def test_preview_savings_cover_only_the_preview():
+    view = compacted_view()
+    stats = with_fresh_stats(lambda: record_prompt_compaction(view, 120))
+    counter = get_token_counter()
+    assert stats["tokens_before"] == counter.count(ORIGINAL[:120])
+    assert stats["tokens_after"] == counter.count(view.text[:120])
+    shown = view.text[:120].count("\n") + 1
+    assert stats["lines_dropped"] == view.original_line(shown) - shown
+    assert stats["dropped_by_kind"] == {}
+
+def test_unchanged_views_are_not_counted():
+    view = compact_source("print('hi')\n", "tool.py")
+    assert with_fresh_stats(lambda: record_prompt_compaction(view))["files"] == 0
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for prompt token counting, per-call-site budgets and splitting oversized batches.
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from scanner import token_counter
+from scanner.advanced_llm_reasoning import AdvancedLLMReasoner
+from scanner.token_counter import (
+    TOKENS_PER_MESSAGE, TOKENS_PER_REPLY, TokenCounter, configure_prompt_budgets, get_token_counter,
+    prompt_budget, split_for_prompt, split_to_budget
+)
+
+def test_split_to_budget_packs_consecutive_items():
+    items = ["a", "b", "c", "d", "e"]
+    assert split_to_budget(items, [3, 3, 3, 3, 3], base_tokens=4, budget=10) == [["a", "b"], ["c", "d"], ["e"]]
+    assert split_to_budget(items, [3, 3, 3, 3, 3], base_tokens=4, budget=100) == [items]
+
+def test_split_to_budget_keeps_oversized_items_alone():
+    chunks = split_to_budget(["small", "huge", "small2"], [2, 50, 2], base_tokens=5, budget=10)
+    assert chunks == [["small"], ["huge"], ["small2"]]
+
+def test_split_to_budget_without_budget_or_items():
+    assert split_to_budget(["a", "b"], [10, 10], base_tokens=0, budget=0) == [["a", "b"]]
+    assert split_to_budget([], [], base_tokens=0, budget=10) == [[]]
+
+def test_count_messages_adds_chat_framing():
+    counter = TokenCounter()
+    messages = [{"role": "system", "content": "abc"}, {"role": "user", "content": None}]
+    expected = TOKENS_PER_REPLY + 2 * TOKENS_PER_MESSAGE + counter.count("abc")
+    assert counter.count_messages(messages) == expected
+
+def test_counts_are_cached_by_text():
+    counter = TokenCounter()
+    first = counter.count("public void Run() { }")
+    assert counter.count("public void Run() { }") == first
+    assert counter.get_stats()["cache_hits"] == 1
+    assert counter.count("") == 0
+
+def test_split_for_prompt_fits_each_part_to_the_budget():
+    counter = get_token_counter()
+    files = [f"file {i}: " + "x" * 300 for i in range(6)]
+
+    def build_messages(batch):
+        return [{"role": "system", "content": "Pick files."}, {"role": "user", "content": "\n".join(batch)}]
+
+    budget = counter.count_messages(build_messages(files[:2])) + 5
+    original = dict(token_counter._budgets)
+    configure_prompt_budgets({"test_operation": budget})
+    try:
+        parts = split_for_prompt("test_operation", files, build_messages)
+        assert [item for part in parts for item in part] == files
+        assert len(parts) == 3
+        assert all(counter.count_messages(build_messages(part)) <= budget for part in parts)
+
+        assert split_for_prompt("test_operation", files[:1], build_messages) == [files[:1]]
+        configure_prompt_budgets({"test_operation": 0})
+        assert split_for_prompt("test_operation", files, build_messages) == [files]
+    finally:
+        token_counter._budgets.clear()
+        token_counter._budgets.update(original)
+
+def test_prompt_budget_defaults():
+    assert prompt_budget("compose_patch") == token_counter.DEFAULT_PROMPT_BUDGETS["compose_patch"]
+    assert prompt_budget("some_new_call_site") == token_counter.DEFAULT_PROMPT_BUDGET
+
+def test_split_final_selection_keeps_the_main_file_in_every_part():
+    files = [{"path": Path(f"/repo/File{i}.cs"), "content": f"class File{i} {{ }}" + "x" * 300} for i in range(5)]
+    batch = {"main_file": "File2.cs", "files": files}
+
+    def build_messages(context):
+        return [{"role": "user", "content": "\n".join(f["content"] for f in context["files"])}]
+
+    budget = get_token_counter().count_messages(build_messages({"files": files[:3]})) + 5
+    original = dict(token_counter._budgets)
+    configure_prompt_budgets({"test_operation": budget})
+    try:
+        parts = AdvancedLLMReasoner._split_batch(
+            "test_operation", batch, build_messages,
+            pinned=lambda f: AdvancedLLMReasoner._is_main_file(batch, f))
+    finally:
+        token_counter._budgets.clear()
+        token_counter._budgets.update(original)
+    assert len(parts) == 2
+    assert all(part["files"][0] is files[2] and part["main_file"] == "File2.cs" for part in parts)
+    related = [f for part in parts for f in part["files"][1:]]
+    assert related == [files[0], files[1], files[3], files[4]]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")